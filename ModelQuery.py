@@ -1,8 +1,17 @@
+import asyncio
+import random
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import time
+import tracing
 
 class ModelQuery:
-    def __init__(self, model_endpoint, model_name, temperature=0.2, max_tokens=-1):
+    RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, model_endpoint, model_name, temperature=0.2, max_tokens=-1, timeout=300,
+                 connect_timeout=5, max_retries=3, backoff_base=0.5, backoff_max=10.0, max_connections=8):
         """
         Initializes the LocalModelQuerier with the model endpoint and parameters.
 
@@ -10,11 +19,64 @@ class ModelQuery:
         :param model_name: Name of the model to query.
         :param temperature: Sampling temperature for the model (default: 0.2).
         :param max_tokens: Maximum number of tokens to generate (default: -1 for no limit).
+        :param timeout: Read timeout in seconds for a completion (default: 300).
+        :param connect_timeout: Timeout in seconds for opening a connection (default: 5).
+        :param max_retries: Retries on connection errors, timeouts and retryable status codes (default: 3).
+        :param backoff_base: Initial backoff delay in seconds, doubled on every retry (default: 0.5).
+        :param backoff_max: Upper bound for a single backoff delay in seconds (default: 10).
+        :param max_connections: Size of the connection pools, i.e. the maximum number of concurrent requests (default: 8).
         """
         self.model_endpoint = model_endpoint
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_connections = max_connections
+
+        # Persistent pool for the blocking calls, so consecutive queries reuse their connections.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # The async client lives on its own event loop thread, started on first use, so its
+        # connection pool is shared by every caller regardless of the caller's event loop.
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._async_session = None
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring a Retry-After header when present."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _post(self, data, headers, stream=False):
+        """POST a request through the pooled session, retrying transient failures before any output is read."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(self.model_endpoint, headers=headers, data=json.dumps(data),
+                                             stream=stream, timeout=(self.connect_timeout, self.timeout))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    return response
+                error = f"{response.status_code} - {response.text}"
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+
+            if attempt == self.max_retries:
+                raise Exception(f"Failed to get response from model after {self.max_retries} retries: {error}")
+            time.sleep(self._backoff_delay(attempt, retry_after))
 
     def query_local_model(self, query, context, prompt):
         """
@@ -27,11 +89,22 @@ class ModelQuery:
         :return: The model's response.
         """
         headers = {"Content-Type": "application/json"}
+        data = self._build_request(query, context, prompt, stream=False)
+        
+        with tracing.span("llm.query", model=self.model_name):
+            response = self._post(data, headers)
+            if response.status_code == 200:
+                result = response.json()
+                return result["choices"][0]["message"]["content"]
+            else:
+                raise Exception(f"Failed to get response from model: {response.status_code} - {response.text}")
+
+    def _build_request(self, query, context, prompt, stream):
         user_message = f"Question: {query}"
         if context is not None:
             user_message += f"\nContext: {context}"
         
-        data = {
+        return {
             "model": self.model_name,
             "messages": [
                 {"role": "system", "content": prompt},
@@ -39,15 +112,200 @@ class ModelQuery:
             ],
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
-            "stream": False
+            "stream": stream
         }
+
+    def stream_local_model(self, query, context, prompt):
+        """
+        Queries the local model with streaming enabled and yields the generated text
+        as it arrives, parsed from the OpenAI-compatible server-sent events.
+        Closing the generator early closes the connection, which stops the generation.
+
+        :param query: The question to be asked.
+        :param context: Additional context to be included in the query.
+        :param prompt: The system prompt for the model.
+        :return: Generator of text deltas.
+        """
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        data = self._build_request(query, context, prompt, stream=True)
         
-        response = requests.post(self.model_endpoint, headers=headers, data=json.dumps(data))
-        if response.status_code == 200:
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"Failed to get response from model: {response.status_code} - {response.text}")
+        response = self._post(data, headers, stream=True)
+        try:
+            if response.status_code != 200:
+                raise Exception(f"Failed to get response from model: {response.status_code} - {response.text}")
+            # text/event-stream is UTF-8, but without a charset requests would decode it as ISO-8859-1.
+            response.encoding = "utf-8"
+            # chunk_size=None yields data as it arrives instead of waiting for full 512-byte reads.
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                # Skip keep-alive blank lines and SSE comments.
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                choices = json.loads(payload).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if not delta:
+                    continue
+                yield delta
+        finally:
+            response.close()
+
+    def stream_query_local_model(self, query, context, prompt, on_text=None, stop_text=None):
+        """
+        Streams an answer from the local model, passing the text generated so far to
+        `on_text` after every chunk.
+
+        If `stop_text` is given, chunks are held back while the answer is still a prefix of it,
+        and the stream is stopped as soon as the answer starts with it, so callers can react
+        to a refusal without waiting for the rest of the completion.
+
+        :param query: The question to be asked.
+        :param context: Additional context to be included in the query.
+        :param prompt: The system prompt for the model.
+        :param on_text: Callback receiving the text generated so far.
+        :param stop_text: Answer prefix that stops the stream, e.g. a refusal message.
+        :return: The model's response, or `stop_text` if the stream was stopped on it.
+        """
+        text = ""
+        checking = stop_text is not None
+        # Timed per call: the client is shared by concurrent requests.
+        ttft = None
+        with tracing.span("llm.stream", model=self.model_name) as span:
+            start = time.perf_counter()
+            stream = self.stream_local_model(query, context, prompt)
+            try:
+                for delta in stream:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    text += delta
+                    if checking:
+                        head = text.lstrip()
+                        if head.startswith(stop_text):
+                            span.set(stopped=True)
+                            return stop_text
+                        if stop_text.startswith(head):
+                            continue
+                        checking = False
+                    if on_text is not None:
+                        on_text(text)
+            finally:
+                stream.close()
+                if ttft is not None:
+                    span.set(ttft=ttft, characters=len(text))
+                    tracing.observe("llm.ttft", ttft)
+                    print(f"Time to first token: {ttft:.2f}s")
+        # The answer ended while still a prefix of stop_text: show what was held back.
+        if checking and on_text is not None:
+            on_text(text)
+        return text
+
+    def _get_loop(self):
+        """Return the event loop of the async client, starting its thread on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ModelQuery-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_async_session(self):
+        # Only called on the client loop, which owns the session and its connection pool.
+        # aiohttp is imported on first use, as most callers only use the blocking client.
+        import aiohttp
+        if self._async_session is None:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.timeout),
+                headers={"Content-Type": "application/json"}
+            )
+        return self._async_session
+
+    async def _aquery(self, query, context, prompt):
+        with tracing.span("llm.query", model=self.model_name):
+            return await self._aquery_with_retries(query, context, prompt)
+
+    async def _aquery_with_retries(self, query, context, prompt):
+        import aiohttp
+        session = self._get_async_session()
+        data = self._build_request(query, context, prompt, stream=False)
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with session.post(self.model_endpoint, data=json.dumps(data)) as response:
+                    if response.status == 200:
+                        result = await response.json(content_type=None)
+                        return result["choices"][0]["message"]["content"]
+                    text = await response.text()
+                    if response.status not in self.RETRY_STATUS_CODES:
+                        raise Exception(f"Failed to get response from model: {response.status} - {text}")
+                    error = f"{response.status} - {text}"
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt == self.max_retries:
+                raise Exception(f"Failed to get response from model after {self.max_retries} retries: {error}")
+            await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+    async def _abatch(self, items, return_exceptions):
+        return await asyncio.gather(
+            *(self._aquery(**item) if isinstance(item, dict) else self._aquery(*item) for item in items),
+            return_exceptions=return_exceptions
+        )
+
+    async def _run_on_client_loop(self, coro):
+        loop = self._get_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def aquery_local_model(self, query, context, prompt):
+        """
+        Async version of query_local_model, sent through the pooled aiohttp client with
+        timeouts and retries. Can be awaited from any event loop.
+
+        :param query: The question to be asked.
+        :param context: Additional context to be included in the query.
+        :param prompt: The system prompt for the model.
+        :return: The model's response.
+        """
+        return await self._run_on_client_loop(self._aquery(query, context, prompt))
+
+    async def aquery_batch(self, items, return_exceptions=False):
+        """
+        Async version of query_batch.
+
+        :param items: (query, context, prompt) tuples or dicts with those keys.
+        :param return_exceptions: Return failed requests' exceptions in place of their responses instead of raising.
+        :return: The model's responses, in the order of `items`.
+        """
+        return await self._run_on_client_loop(self._abatch(list(items), return_exceptions))
+
+    def query_batch(self, items, return_exceptions=False):
+        """
+        Sends many prompts to the model concurrently and waits for all responses, e.g. query
+        rewrites and answers for several users at once. At most `max_connections` requests are
+        in flight; the rest wait for a free pooled connection.
+
+        :param items: (query, context, prompt) tuples or dicts with those keys.
+        :param return_exceptions: Return failed requests' exceptions in place of their responses instead of raising.
+        :return: The model's responses, in the order of `items`.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._abatch(list(items), return_exceptions), self._get_loop())
+        return future.result()
+
+    def close(self):
+        """Closes the connection pools and stops the async client's event loop."""
+        self.session.close()
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            if self._async_session is not None:
+                asyncio.run_coroutine_threadsafe(self._async_session.close(), self._loop).result()
+                self._async_session = None
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
 
 # Example usage:
 # model_querier = LocalModelQuerier("http://127.0.0.1:1234/v1/chat/completions", "meta-llama-3.1-8b-instruct")
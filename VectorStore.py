@@ -1,11 +1,17 @@
-from uuid import uuid4
 import chromadb
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 from tqdm import tqdm
-import pandas as pd
-import openai
 import os
+import time
 from dotenv import load_dotenv
-import os
+from embedding_engine import EmbeddingEngine
+from embedding_cache import EmbeddingCache, CachedEmbeddingFunction
+from index_manifest import content_hash
+from chunk_index import ChunkIndex, chunk_id
+from lexical_index import BM25Index
+from vector_index import MappedCollection, QuantizedVectorIndex, collection_version
+import tracing
 
 # Load environment variables from the .env file
 class VectorStore:
@@ -13,28 +19,62 @@ class VectorStore:
     Class for managing vector stores using ChromaDB.
     Handles both document chunks and keyword-based (title) vector stores.
     """
-    def __init__(self, doc_collection_name, keyword_collection_name, data_path=None, reset=False, openai_api_key=None):
+    def __init__(self, doc_collection_name, keyword_collection_name, data_path=None, reset=False, openai_api_key=None,
+                 embedding_batch_size=256, embedding_max_in_flight=4, chroma_path="./chroma",
+                 embedding_function=None, ingest_batch_size=5000, chunk_index_path=None,
+                 embedding_cache_path=None, embedding_cache_size=1_000_000, lexical_index_path=None,
+                 chroma_client=None):
         """
         Initialize VectorStore with separate collections for documents and keywords.
         
         Args:
             doc_collection_name (str): Name of the document chunks collection.
             keyword_collection_name (str): Name of the keywords collection.
-            data_path (str, optional): Path to the DataFrame file.
+            data_path (str, optional): Path to the DataFrame file or ChunkStore directory, loaded on first use.
             reset (bool): Whether to reset existing collections.
             openai_api_key (str, optional): Your OpenAI API key. If not provided, it will try to use the OPENAI_API_KEY environment variable.
+            embedding_batch_size (int): Number of chunks sent per OpenAI embedding request.
+            embedding_max_in_flight (int): Number of concurrent OpenAI embedding requests.
+            chroma_path (str): Directory of the persistent ChromaDB store.
+            embedding_function (optional): Chroma embedding function for both collections. Defaults to Chroma's built-in embedder.
+            ingest_batch_size (int): Number of records written per bulk add() call, capped at the
+                largest batch the Chroma client accepts.
+            chunk_index_path (str, optional): Path of a ChunkIndex (SQLite) kept in sync with the collections.
+            embedding_cache_path (str, optional): Path of a persistent EmbeddingCache placed in front of both the
+                OpenAI embeddings and the collections' embedding function, for ingestion and queries alike.
+            embedding_cache_size (int): Maximum number of cached embeddings before LRU eviction.
+            lexical_index_path (str, optional): Directory of a BM25Index over the document chunks, kept in
+                sync with the document collection.
+            chroma_client (optional): Existing Chroma client to use instead of opening one on `chroma_path`,
+                so several stores of a process share it.
         """
         load_dotenv()
 
-        self.chroma_client = chromadb.PersistentClient()
+        self.chroma_client = chroma_client or chromadb.PersistentClient(path=chroma_path)
+
+        # Embedding cache shared by ingestion and query-time embedding
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_size)
+            if embedding_function is None:
+                embedding_function = CachedEmbeddingFunction(DefaultEmbeddingFunction(), self.embedding_cache, "all-MiniLM-L6-v2")
+            else:
+                model_name = getattr(embedding_function, "model_name", type(embedding_function).__name__)
+                embedding_function = CachedEmbeddingFunction(embedding_function, self.embedding_cache, model_name)
+        self.embedding_function = embedding_function
+        max_batch_size = self.chroma_client.get_max_batch_size()
+        self.ingest_batch_size = min(ingest_batch_size, max_batch_size)
         
         # Initialize OpenAI
-        if openai_api_key:
-            openai.api_key = openai_api_key
-        else:
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-        if not openai.api_key:
+        self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+        if not self.openai_api_key:
             print("OpenAI API key is not set. Please provide one or set the OPENAI_API_KEY environment variable.")
+        self.embedding_engine = EmbeddingEngine(
+            api_key=self.openai_api_key,
+            batch_size=embedding_batch_size,
+            max_in_flight=embedding_max_in_flight,
+            cache=self.embedding_cache
+        )
 
         # Initialize document collection
         self.doc_collection_name = doc_collection_name
@@ -43,11 +83,38 @@ class VectorStore:
         # Initialize keyword collection
         self.keyword_collection_name = keyword_collection_name
         self.keyword_collection = self.load_vectors_store(keyword_collection_name, reset)
+
+        # Article -> chunk range index
+        self.chunk_index = ChunkIndex(chunk_index_path) if chunk_index_path else None
+        if self.chunk_index is not None and reset:
+            self.chunk_index.clear()
+
+        # Lexical (BM25) index over the document chunks
+        self.lexical_index = BM25Index(lexical_index_path) if lexical_index_path else None
+        if self.lexical_index is not None and reset:
+            self.lexical_index.clear()
         
-        self.df = self.load_dataframe(data_path) if data_path else None
+        self.data_path = data_path
+        self._df = None
+
+    @property
+    def df(self):
+        """The DataFrame at `data_path`, loaded on first use (None without a data path)."""
+        if self._df is None and self.data_path:
+            self._df = self.load_dataframe(self.data_path)
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
 
     def load_dataframe(self, path):
-        """Load DataFrame from file based on file extension."""
+        """Load DataFrame from file based on file extension, or from a ChunkStore directory."""
+        import pandas as pd
+        if os.path.isdir(path):
+            from chunk_store import ChunkStore
+            # Only the columns needed for indexing are read from the memory-mapped files.
+            return ChunkStore(path).read(columns=['id', 'title', 'chunked_text'])
         if path.endswith('.csv'):
             return pd.read_csv(path).head(1)
         elif path.endswith('.parquet'):
@@ -57,6 +124,28 @@ class VectorStore:
         else:
             raise ValueError(f"Unsupported file format for path: {path}")
 
+    def reopen(self):
+        """
+        Reload the collections and the BM25 index from disk, after another process (e.g. the
+        ingestion of another worker) changed them: the collection handles and the in-memory
+        BM25 state are otherwise those of the previous index version.
+
+        Chroma keeps the HNSW index of a collection loaded for the lifetime of its client and
+        does not see the vectors other processes add to it, so the collections are reopened
+        with a new client (`chroma_client` is replaced). Handles and clients opened before
+        keep serving the previous index until they are released.
+        """
+        settings = self.chroma_client.get_settings()
+        # Only this directory's cached system is dropped: clear_system_cache() would also break
+        # the clients of other directories of the process.
+        SharedSystemClient._identifier_to_system.pop(settings.persist_directory, None)
+        self.chroma_client = chromadb.PersistentClient(path=settings.persist_directory, settings=settings)
+        self.doc_collection = self.load_vectors_store(self.doc_collection_name, reset=False)
+        self.keyword_collection = self.load_vectors_store(self.keyword_collection_name, reset=False)
+        if self.lexical_index is not None:
+            lexical_index = self.lexical_index
+            self.lexical_index = BM25Index(lexical_index.path, k1=lexical_index.k1, b=lexical_index.b)
+
     def load_vectors_store(self, collection_name, reset):
         """Load or reset a ChromaDB vector store collection."""
         if reset:
@@ -65,28 +154,122 @@ class VectorStore:
             except Exception as e:
                 print(f"No collection found to delete: {e}")
         
-        collection = self.chroma_client.get_or_create_collection(collection_name)
+        if self.embedding_function is not None:
+            collection = self.chroma_client.get_or_create_collection(
+                collection_name, embedding_function=self.embedding_function
+            )
+        else:
+            collection = self.chroma_client.get_or_create_collection(collection_name)
         print(f"Vector store '{collection_name}' loaded.\n")
         return collection
 
+    def index_version(self):
+        """
+        Return the current version of the document index, "<collection id>:<counter>". It changes
+        whenever the collection is recreated or re-indexed, including from another process.
+        """
+        return collection_version(
+            self.chroma_client.get_collection(self.doc_collection_name, embedding_function=self.embedding_function)
+        )
+
+    def _bump_index_version(self):
+        """Record that the document index changed, invalidating answers cached against it."""
+        metadata = dict(self.doc_collection.metadata or {})
+        metadata["index_version"] = metadata.get("index_version", 0) + 1
+        self.doc_collection.modify(metadata=metadata)
+
     def get_openai_embedding(self, text: str):
         """
         Get the OpenAI embedding for a given text using the text-embedding-ada-002 model.
         """
-        response = openai.Embedding.create(
-            input=text,
-            model="text-embedding-ada-002"
-        )
-        return response['data'][0]['embedding']
+        return self.embedding_engine.embed([text])[0]
 
-    def create_document_store(self, chunked_docs=None, use_openai_embedding=False):
+    def _write_batch(self, collection, ids, documents, metadatas, use_openai_embedding=False, upsert=False):
+        """
+        Write records to a collection in slices of at most `ingest_batch_size`.
+        
+        Args:
+            collection: ChromaDB collection to write to.
+            ids (list): Record IDs.
+            documents (list): Record documents.
+            metadatas (list): Record metadata dictionaries.
+            use_openai_embedding (bool): Whether to compute OpenAI embeddings for the documents.
+            upsert (bool): Overwrite records with existing IDs instead of adding new ones.
+        """
+        if collection is self.doc_collection and self.lexical_index is not None:
+            with tracing.span("vector_store.bm25_add", records=len(ids)):
+                self.lexical_index.add(ids, documents)
+        write = collection.upsert if upsert else collection.add
+        for start in range(0, len(ids), self.ingest_batch_size):
+            end = start + self.ingest_batch_size
+            if use_openai_embedding:
+                with tracing.span("vector_store.embed", records=len(ids[start:end])):
+                    embeddings = self.embedding_engine.embed(documents[start:end])
+                with tracing.span("vector_store.write", collection=collection.name, records=len(ids[start:end])):
+                    write(
+                        ids=ids[start:end],
+                        documents=documents[start:end],
+                        metadatas=metadatas[start:end],
+                        embeddings=embeddings
+                    )
+            else:
+                # Without precomputed embeddings, the write includes the collection's embedding function.
+                with tracing.span("vector_store.write", collection=collection.name, records=len(ids[start:end])):
+                    write(
+                        ids=ids[start:end],
+                        documents=documents[start:end],
+                        metadatas=metadatas[start:end],
+                    )
+
+    def _delete_ids(self, collection, ids):
+        """Delete records from a collection in slices of at most `ingest_batch_size`."""
+        if collection is self.doc_collection and self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+        for start in range(0, len(ids), self.ingest_batch_size):
+            with tracing.span("vector_store.delete", collection=collection.name):
+                collection.delete(ids=ids[start:start + self.ingest_batch_size])
+
+    @staticmethod
+    def article_id(doc):
+        """Return the article ID of a record, falling back to a hash of its title."""
+        import pandas as pd
+        article_id = doc.get('id')
+        if article_id is None or pd.isna(article_id):
+            return content_hash(doc['title'])[:16]
+        if isinstance(article_id, float) and article_id.is_integer():
+            article_id = int(article_id)
+        return str(article_id)
+
+    def _stored_chunk_counts(self, article_ids):
+        """Return the number of chunks stored for each of the given articles, from the keyword collection."""
+        counts = {}
+        if not self.keyword_collection.count():
+            return counts
+        for start in range(0, len(article_ids), self.ingest_batch_size):
+            records = self.keyword_collection.get(ids=article_ids[start:start + self.ingest_batch_size],
+                                                  include=['metadatas'])
+            for keyword_id, metadata in zip(records['ids'], records['metadatas']):
+                counts[keyword_id] = (metadata or {}).get('n_chunks', 0)
+        return counts
+
+    def create_document_store(self, chunked_docs=None, use_openai_embedding=False, bulk=True):
         """
         Create vector store for document chunks and return DataFrame with chunk IDs.
         
+        Articles that are already stored are overwritten: their chunks are upserted and the
+        chunks past their new end deleted, so the collection and the BM25 index stay in sync.
+        Articles without chunked text (None, e.g. unchanged articles skipped by an index
+        manifest, see WikipediaDumpProcessor.chunk_articles) are left as they are and dropped
+        from the returned DataFrame.
+        
         Args:
             chunked_docs: DataFrame or other data structure containing documents.
             use_openai_embedding (bool): Whether to compute OpenAI embeddings for each chunk.
+            bulk (bool): Buffer chunks across articles and write them in batches of `ingest_batch_size`
+                instead of one add() call per article.
         """
+        # pandas is only imported for ingestion, which keeps the query path's startup fast.
+        import pandas as pd
         print("Creating document store")
         # Use loaded DataFrame if no input provided
         if chunked_docs is None:
@@ -97,96 +280,359 @@ class VectorStore:
             df = pd.DataFrame(chunked_docs)
         else:
             df = chunked_docs.copy()
+        if len(df):
+            df = df[df['chunked_text'].notna()].copy()
         
-        # Create new column for chunk IDs
+        # Create new columns for article and chunk IDs
+        df['article_id'] = None
         df['chunk_ids'] = None
+        stored_counts = self._stored_chunk_counts(df.apply(self.article_id, axis=1).tolist() if len(df) else [])
+        stale_chunk_ids = []
         
-
-        # for idx, doc in tqdm(df.iterrows(), desc="Processing Document Chunks", total=len(df)):
-        for idx, doc in df.iterrows():
-            print(doc['title'])
+        batch_ids, batch_documents, batch_metadatas = [], [], []
+        for idx, doc in tqdm(df.iterrows(), desc="Processing Document Chunks", total=len(df), leave=False):
             title = doc['title']
+            article_id = self.article_id(doc)
             chunk_ids = []
             documents = []
             metadatas = []
-            print(len(doc['chunked_text']))
-            # Process each chunk in the document
-            for content in tqdm(doc['chunked_text'], desc="Processing Chunks", leave=False):
-
-                chunk_id = str(uuid4())
-                chunk_ids.append(chunk_id)
+            # Process each chunk in the document; IDs are derived from the article ID and chunk offset
+            for offset, content in enumerate(doc['chunked_text']):
+                chunk_ids.append(chunk_id(article_id, offset))
                 documents.append(content)
-                metadatas.append({"Title": title})
-            
-            # Compute embeddings using OpenAI if enabled
-            if use_openai_embedding:
-                embeddings = [self.get_openai_embedding(text) for text in documents]
-                self.doc_collection.add(
-                    ids=chunk_ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                    embeddings=embeddings
-                )
-            else:
-                self.doc_collection.add(
-                    ids=chunk_ids,
-                    documents=documents,
-                    metadatas=metadatas,
-                )
-            
-            # Store chunk IDs in DataFrame
+                metadatas.append({"Title": title, "article_id": article_id, "offset": offset})
+
+            # Store article and chunk IDs in DataFrame
+            df.at[idx, 'article_id'] = article_id
             df.at[idx, 'chunk_ids'] = chunk_ids
+            # A re-ingested article that shrank leaves its old chunks past the new end.
+            stale_chunk_ids.extend(chunk_id(article_id, offset)
+                                   for offset in range(len(chunk_ids), stored_counts.get(article_id, 0)))
+
+            if not bulk:
+                self._write_batch(self.doc_collection, chunk_ids, documents, metadatas, use_openai_embedding, upsert=True)
+                continue
+
+            batch_ids.extend(chunk_ids)
+            batch_documents.extend(documents)
+            batch_metadatas.extend(metadatas)
+            if len(batch_ids) >= self.ingest_batch_size:
+                self._write_batch(self.doc_collection, batch_ids, batch_documents, batch_metadatas, use_openai_embedding,
+                                  upsert=True)
+                batch_ids, batch_documents, batch_metadatas = [], [], []
+
+        self._write_batch(self.doc_collection, batch_ids, batch_documents, batch_metadatas, use_openai_embedding, upsert=True)
+        self._delete_ids(self.doc_collection, stale_chunk_ids)
+        if use_openai_embedding:
+            self.embedding_engine.report()
         
         return df
 
-    def create_keyword_store(self, df):
+    def create_keyword_store(self, df, bulk=True):
         """
-        Create vector store for keywords based on titles and their chunk IDs.
+        Create vector store for keywords based on titles and their chunk ranges.
+        
+        Each title is stored under its article ID, with the article ID and number of chunks in
+        its metadata, so a title hit expands to its chunk IDs without parsing any string.
         
         Args:
-            df (pandas.DataFrame): DataFrame containing 'title' and 'chunk_ids' columns.
+            df (pandas.DataFrame): DataFrame containing 'title', 'article_id' and 'chunk_ids' columns.
+            bulk (bool): Write titles in batches of `ingest_batch_size` instead of one add() call per title.
             
         Returns:
             pandas.DataFrame: Original DataFrame with keyword_id column added.
         """
         df = df.copy()
-        df['keyword_id'] = None
-        
-        for idx, row in tqdm(df.iterrows(), desc="Processing Keywords", total=len(df)):
-            # Generate unique ID for the keyword entry
-            keyword_id = str(uuid4())
-            
-            # Add title as keyword to ChromaDB
-            self.keyword_collection.add(
-                ids=[keyword_id],
-                documents=[row['title']],
-                metadatas=[{
-                    "Title": row['title'],
-                    "chunk_ids": ",".join(row['chunk_ids'])  # Store associated chunk IDs in metadata
-                }]
-            )
-            
-            # Store keyword ID in DataFrame
-            df.at[idx, 'keyword_id'] = keyword_id
+        # Keyword entries are keyed by article ID
+        keyword_ids = df['article_id'].tolist()
+        titles = df['title'].tolist()
+        n_chunks = [len(chunk_ids) for chunk_ids in df['chunk_ids']]
+        metadatas = [
+            {"Title": title, "article_id": article_id, "n_chunks": count}
+            for title, article_id, count in zip(titles, keyword_ids, n_chunks)
+        ]
+
+        # Add titles as keywords to ChromaDB
+        if bulk:
+            self._write_batch(self.keyword_collection, keyword_ids, titles, metadatas, upsert=True)
+        else:
+            for i in tqdm(range(len(keyword_ids)), desc="Processing Keywords", leave=False):
+                self._write_batch(self.keyword_collection, keyword_ids[i:i + 1], titles[i:i + 1], metadatas[i:i + 1],
+                                  upsert=True)
+
+        if self.chunk_index is not None:
+            self.chunk_index.put(zip(keyword_ids, n_chunks))
+
+        # Store keyword IDs in DataFrame
+        df['keyword_id'] = keyword_ids
         
         return df
 
-    def process_all(self, chunked_docs=None, use_openai_embedding=False):
+    def process_all(self, chunked_docs=None, use_openai_embedding=False, bulk=True):
         """
         Process both document chunks and keywords in one go.
         
+        Without `chunked_docs`, a ChunkStore at `data_path` is streamed with ingest_chunk_store
+        instead of being loaded as a DataFrame.
+        
         Args:
             chunked_docs: DataFrame or other data structure containing documents.
             use_openai_embedding (bool): Whether to compute OpenAI embeddings for document chunks.
+            bulk (bool): Whether to write records in large cross-article batches.
             
         Returns:
-            tuple: (final_df, doc_collection, keyword_collection)
+            tuple: (final_df, doc_collection, keyword_collection), or the counts of
+            ingest_chunk_store for a chunk store.
         """
+        if chunked_docs is None and self._df is None and self.data_path and os.path.isdir(self.data_path):
+            return self.ingest_chunk_store(use_openai_embedding=use_openai_embedding)
         # First process documents to get chunk IDs (and optionally compute embeddings)
-        df_with_chunks = self.create_document_store(chunked_docs, use_openai_embedding=use_openai_embedding)
+        df_with_chunks = self.create_document_store(chunked_docs, use_openai_embedding=use_openai_embedding, bulk=bulk)
         # Then process keywords using the chunk IDs
-        final_df = self.create_keyword_store(df_with_chunks)
+        final_df = self.create_keyword_store(df_with_chunks, bulk=bulk)
+        if self.lexical_index is not None:
+            self.lexical_index.flush()
+        self._bump_index_version()
         
         # Return the final DataFrame along with both vector store objects.
         return final_df
 
+    def rebuild_lexical_index(self, page_size=5000):
+        """Rebuild the BM25 index from the documents already stored in the document collection."""
+        if self.lexical_index is None:
+            raise ValueError("No lexical index configured (lexical_index_path)")
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.doc_collection.get(include=['documents'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.lexical_index.add(page['ids'], page['documents'])
+            offset += len(page['ids'])
+        self.lexical_index.optimize()
+        print(f"Lexical index rebuilt over {len(self.lexical_index)} chunks.")
+
+    def build_vector_index(self, path, mode="int8", store_full=True):
+        """
+        Export the document embeddings into a compressed QuantizedVectorIndex.
+
+        Args:
+            path (str): Path of the index, switched atomically to the new build (see QuantizedVectorIndex.build).
+            mode (str): "float16" or "int8".
+            store_full (bool): Keep the float32 vectors on disk for rescoring the candidates.
+
+        Returns:
+            QuantizedVectorIndex: The new index, tagged with the current index version.
+        """
+        start = time.perf_counter()
+        index = QuantizedVectorIndex.build(self.doc_collection, path, mode=mode, store_full=store_full,
+                                           page_size=self.ingest_batch_size, index_version=self.index_version())
+        print(f"Built {mode} vector index over {len(index)} chunks in {time.perf_counter() - start:.1f}s "
+              f"({index.memory_bytes() / 2**20:.1f} MiB in RAM).")
+        return index
+
+    def export_mapped_index(self, path, mode="int8", store_full=True):
+        """
+        Export both collections into memory-mapped MappedCollections under `path` (one export
+        per collection name, see MappedCollection.export), tagged with the current index version.
+
+        Args:
+            path (str): Directory of the exports.
+            mode (str): "float16" or "int8" codes for the scan.
+            store_full (bool): Also store the float32 vectors for exact rescoring.
+
+        Returns:
+            tuple: (doc MappedCollection, keyword MappedCollection)
+        """
+        version = self.index_version()
+        exports = []
+        for collection in (self.doc_collection, self.keyword_collection):
+            start = time.perf_counter()
+            mapped = MappedCollection.export(collection, os.path.join(path, collection.name), mode=mode,
+                                             store_full=store_full, page_size=self.ingest_batch_size,
+                                             index_version=version)
+            mapped.embedding_function = self.embedding_function
+            print(f"Exported {collection.name}: {len(mapped)} records in {time.perf_counter() - start:.1f}s.")
+            exports.append(mapped)
+        return tuple(exports)
+
+    def ingest_stream(self, windows, use_openai_embedding=False):
+        """
+        Ingest a stream of article windows, one window at a time.
+        
+        Each window is written to both collections and then released, so memory use is
+        bounded by the window size rather than by the size of the dump.
+        
+        Args:
+            windows: Iterable of lists of article dicts with 'title' and 'chunked_text' keys,
+                e.g. WikipediaDumpProcessor.iter_chunked_windows().
+            use_openai_embedding (bool): Whether to compute OpenAI embeddings for document chunks.
+            
+        Returns:
+            tuple: (number of articles, number of chunks) ingested.
+        """
+        import pandas as pd
+        n_articles = 0
+        n_chunks = 0
+        start = time.perf_counter()
+        with tqdm(desc="Ingesting articles", unit="articles") as progress:
+            for window in windows:
+                with tracing.span("vector_store.window", articles=len(window)):
+                    self.process_all(pd.DataFrame(window), use_openai_embedding=use_openai_embedding)
+                n_articles += len(window)
+                n_chunks += sum(len(article['chunked_text']) for article in window)
+                progress.update(len(window))
+        if self.lexical_index is not None:
+            self.lexical_index.maybe_optimize()
+        elapsed = time.perf_counter() - start
+        print(f"Ingested {n_articles} articles ({n_chunks} chunks) in {elapsed:.1f}s.")
+        return n_articles, n_chunks
+
+
+    def ingest_chunk_store(self, path=None, window_size=1000, use_openai_embedding=False):
+        """
+        Ingest a ChunkStore with ingest_stream, one row group window at a time: only the 'id',
+        'title' and 'chunked_text' columns are read, and the store is never loaded as a whole.
+        
+        Args:
+            path (str, optional): Directory of the store (default: `data_path`).
+            window_size (int): Number of articles per window.
+            use_openai_embedding (bool): Whether to compute OpenAI embeddings for document chunks.
+            
+        Returns:
+            tuple: (number of articles, number of chunks) ingested.
+        """
+        from chunk_store import ChunkStore
+        store = ChunkStore(path or self.data_path)
+        if not store.exists():
+            raise ValueError(f"No chunk store at {store.path}")
+        windows = store.iter_windows(window_size=window_size, columns=['id', 'title', 'chunked_text'])
+        return self.ingest_stream(windows, use_openai_embedding=use_openai_embedding)
+
+    def ingest_incremental(self, windows, manifest, source, use_openai_embedding=False):
+        """
+        Incrementally ingest a stream of article windows, tracked by an IndexManifest.
+        
+        New articles are added. Changed articles only get the chunks whose content changed at
+        their offset embedded, and the chunks past their new end deleted. Unchanged articles ('chunked_text' set to None) are only marked
+        as seen, and articles missing from the source are deleted once the stream is exhausted.
+        The manifest is committed after every window, so an interrupted ingest resumes where it
+        stopped: the articles written before the interruption hash-match and are skipped.
+        
+        Args:
+            windows: Iterable of lists of article dicts with 'id', 'title', 'content_hash' and 'chunked_text'
+                keys, e.g. WikipediaDumpProcessor.iter_chunked_windows(manifest_path=...).
+            manifest (IndexManifest): Manifest describing the current content of the collections.
+            source (str): Identifier of the ingested source (e.g. the dump file), used to resume runs.
+            use_openai_embedding (bool): Whether to compute OpenAI embeddings for document chunks.
+            
+        Returns:
+            dict: Number of added, updated, unchanged and deleted articles.
+
+        Raises:
+            ValueError: If the stream yields no articles. The run is left incomplete and nothing is deleted.
+        """
+        if manifest.bind(self.doc_collection.id) and self.doc_collection.count():
+            # Records written without a manifest cannot be diffed, so rebuild once from scratch.
+            print("Vector store is not tracked by the index manifest, rebuilding it.")
+            self.doc_collection = self.load_vectors_store(self.doc_collection_name, reset=True)
+            self.keyword_collection = self.load_vectors_store(self.keyword_collection_name, reset=True)
+            if self.chunk_index is not None:
+                self.chunk_index.clear()
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            manifest.bind(self.doc_collection.id)
+        run_id = manifest.begin_run(source)
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        start = time.perf_counter()
+        with tqdm(desc="Ingesting articles", unit="articles") as progress:
+            for window in windows:
+                with tracing.span("vector_store.window", articles=len(window)):
+                    self._ingest_window_incremental(window, manifest, run_id, stats, use_openai_embedding)
+                # Persist the lexical index before the manifest, so a resumed run never skips unindexed chunks.
+                if self.lexical_index is not None:
+                    self.lexical_index.flush()
+                manifest.commit()
+                progress.update(len(window))
+
+        if not (stats["added"] or stats["updated"] or stats["unchanged"]):
+            # An empty source (e.g. no dump part selected) would otherwise delete the whole index.
+            raise ValueError(f"The ingestion run of {source} saw no articles, keeping the indexed ones")
+        # Articles not seen by this run no longer exist in the source.
+        stale = manifest.stale_articles(run_id)
+        self._delete_ids(self.doc_collection, [chunk_id for _, _, chunk_ids in stale for chunk_id in chunk_ids])
+        self._delete_ids(self.keyword_collection, [keyword_id for _, keyword_id, _ in stale if keyword_id])
+        manifest.delete_articles([article_id for article_id, _, _ in stale])
+        if self.chunk_index is not None:
+            self.chunk_index.remove([article_id for article_id, _, _ in stale])
+        stats["deleted"] = len(stale)
+        if self.lexical_index is not None:
+            self.lexical_index.maybe_optimize()
+        if stats["added"] or stats["updated"] or stats["deleted"]:
+            self._bump_index_version()
+        manifest.complete_run(run_id)
+
+        elapsed = time.perf_counter() - start
+        print(f"Incremental ingest finished in {elapsed:.1f}s: {stats}")
+        return stats
+
+    def _ingest_window_incremental(self, window, manifest, run_id, stats, use_openai_embedding):
+        """Apply one window of articles to the collections and the manifest."""
+        unchanged_ids = []
+        records = []
+        chunk_ids_to_write, documents, metadatas = [], [], []
+        stale_chunk_ids, stale_keyword_ids = [], []
+        keyword_ids, titles, keyword_metadatas = [], [], []
+        chunk_ranges = []
+
+        for article in window:
+            article_id = str(article['id'])
+            if article['chunked_text'] is None:
+                unchanged_ids.append(article_id)
+                stats["unchanged"] += 1
+                continue
+
+            title = article['title']
+            previous = manifest.get_article(article_id)
+            previous_hashes = previous['chunk_hashes'] if previous else []
+            chunk_ids, chunk_hashes = [], []
+            for offset, content in enumerate(article['chunked_text']):
+                chunk_hash = content_hash(content)
+                chunk_ids.append(chunk_id(article_id, offset))
+                chunk_hashes.append(chunk_hash)
+                # Only chunks whose content changed at this offset need to be embedded and written.
+                if offset >= len(previous_hashes) or previous_hashes[offset] != chunk_hash:
+                    chunk_ids_to_write.append(chunk_ids[-1])
+                    documents.append(content)
+                    metadatas.append({"Title": title, "article_id": article_id, "offset": offset})
+            if previous:
+                # The article got shorter: drop the chunks past its new end.
+                stale_chunk_ids.extend(previous['chunk_ids'][len(chunk_ids):])
+
+            keyword_id = article_id if chunk_ids else None
+            if keyword_id:
+                keyword_ids.append(keyword_id)
+                titles.append(title)
+                keyword_metadatas.append({"Title": title, "article_id": article_id, "n_chunks": len(chunk_ids)})
+            elif previous and previous['keyword_id']:
+                stale_keyword_ids.append(previous['keyword_id'])
+            chunk_ranges.append((article_id, len(chunk_ids)))
+
+            records.append({
+                "article_id": article_id,
+                "title": title,
+                "content_hash": article['content_hash'],
+                "keyword_id": keyword_id,
+                "chunk_ids": chunk_ids,
+                "chunk_hashes": chunk_hashes,
+            })
+            stats["updated" if previous else "added"] += 1
+
+        self._write_batch(self.doc_collection, chunk_ids_to_write, documents, metadatas, use_openai_embedding, upsert=True)
+        self._delete_ids(self.doc_collection, stale_chunk_ids)
+        self._write_batch(self.keyword_collection, keyword_ids, titles, keyword_metadatas, upsert=True)
+        self._delete_ids(self.keyword_collection, stale_keyword_ids)
+        manifest.put_articles(records, run_id)
+        manifest.touch(unchanged_ids, run_id)
+        if self.chunk_index is not None:
+            self.chunk_index.put(chunk_ranges)
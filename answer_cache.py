@@ -0,0 +1,142 @@
+import json
+import time
+from index_manifest import content_hash
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, stored in a Chroma collection with cosine distance.
+    A question is answered from the cache when a past question is at least `threshold`
+    similar, was cached less than `ttl` seconds ago and against the same index version.
+    The least recently used entries are evicted above `max_entries`, every `purge_every` stores.
+    """
+    def __init__(self, chroma_client, embedding_function=None, collection_name="answer_cache",
+                 threshold=0.92, ttl=7 * 24 * 3600, max_entries=10_000, purge_every=100):
+        """
+        Open (or create) the cache collection.
+
+        Args:
+            chroma_client: Chroma client holding the cache collection, usually the vector store's.
+            embedding_function (optional): Embedding function for the questions. Use the document
+                collection's, so the question embedding is computed once and served from the
+                embedding cache for retrieval.
+            collection_name (str): Name of the cache collection.
+            threshold (float): Minimum cosine similarity between questions for a cache hit.
+            ttl (float): Seconds after which a cached answer expires.
+            max_entries (int): Maximum number of cached answers before LRU eviction.
+            purge_every (int): Number of stores between purges. Lookups already ignore expired
+                and outdated entries, so purging only bounds the size of the collection, which
+                can exceed `max_entries` by up to `purge_every` entries in between.
+        """
+        self.chroma_client = chroma_client
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._stores = 0
+        self.collection = self._load_collection()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_collection(self):
+        kwargs = {"metadata": {"hnsw:space": "cosine"}}
+        if self.embedding_function is not None:
+            kwargs["embedding_function"] = self.embedding_function
+        return self.chroma_client.get_or_create_collection(self.collection_name, **kwargs)
+
+    def _where(self, index_version, now):
+        valid = {"created_at": {"$gte": now - self.ttl}}
+        if index_version is None:
+            return valid
+        return {"$and": [valid, {"index_version": str(index_version)}]}
+
+    def lookup(self, question, index_version=None):
+        """
+        Return the cached answer of the most similar past question, if it is similar enough.
+
+        Args:
+            question (str): The user question.
+            index_version (str, optional): Current version of the vector store; answers cached
+                against another version are ignored.
+
+        Returns:
+            dict or None: 'answer', 'sources', 'question' (the cached one) and 'similarity', or None on a miss.
+        """
+        now = time.time()
+        if self.collection.count() == 0:
+            self.misses += 1
+            return None
+        results = self.collection.query(
+            query_texts=[question],
+            n_results=1,
+            where=self._where(index_version, now),
+            include=['documents', 'metadatas', 'distances']
+        )
+        if not results['ids'][0] or 1 - results['distances'][0][0] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry_id = results['ids'][0][0]
+        metadata = results['metadatas'][0][0]
+        self.collection.update(ids=[entry_id], metadatas=[{"last_used": now}])
+        return {
+            "answer": metadata["answer"],
+            "sources": json.loads(metadata["sources"]),
+            "question": results['documents'][0][0],
+            "similarity": 1 - results['distances'][0][0],
+        }
+
+    def store(self, question, answer, sources, index_version=None):
+        """
+        Cache the answer to a question. Every `purge_every` stores, expired, outdated and least
+        recently used entries are evicted (see purge).
+
+        Args:
+            question (str): The user question.
+            answer (str): The generated answer.
+            sources (list[str]): The context documents shown with the answer.
+            index_version (str, optional): Version of the vector store the answer was generated from.
+        """
+        now = time.time()
+        metadata = {
+            "answer": answer,
+            "sources": json.dumps(list(sources)),
+            "created_at": now,
+            "last_used": now,
+            "index_version": "" if index_version is None else str(index_version),
+        }
+        self.collection.upsert(ids=[content_hash(question)], documents=[question], metadatas=[metadata])
+        # Purging scans the collection, so it is not done on every store.
+        self._stores += 1
+        if self._stores % self.purge_every == 0:
+            self.purge(index_version)
+
+    def purge(self, index_version=None):
+        """
+        Delete expired entries, entries of other index versions (if `index_version` is given)
+        and, above `max_entries`, the least recently used ones down to 90% of the capacity.
+        """
+        now = time.time()
+        self.collection.delete(where={"created_at": {"$lt": now - self.ttl}})
+        if index_version is not None:
+            self.collection.delete(where={"index_version": {"$ne": str(index_version)}})
+
+        size = self.collection.count()
+        if size > self.max_entries:
+            entries = self.collection.get(include=['metadatas'])
+            by_last_use = sorted(zip(entries['ids'], entries['metadatas']), key=lambda entry: entry[1]["last_used"])
+            excess = size - int(self.max_entries * 0.9)
+            self.collection.delete(ids=[entry_id for entry_id, _ in by_last_use[:excess]])
+
+    def invalidate(self):
+        """Drop all cached answers, e.g. after the vector store was re-indexed."""
+        self.chroma_client.delete_collection(name=self.collection_name)
+        self.collection = self._load_collection()
+
+    def hit_rate(self):
+        """Return the fraction of lookups answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+import tracing
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `max_wait_ms` (or until `max_batch_size` are
+    waiting) and runs them as one call of `batch_function` in a worker thread, so
+    concurrent questions share one embedding batch and one vector store query.
+    """
+
+    def __init__(self, batch_function, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Args:
+            batch_function (callable): Takes a list of items and returns one result per item.
+            max_batch_size (int): Maximum number of items per call.
+            max_wait_ms (float): How long the first item of a batch waits for others.
+        """
+        self.batch_function = batch_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = []
+        # A thread of its own: requests blocked in the shared threadpool waiting for their
+        # batch must not be able to starve the batch itself.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MicroBatcher")
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, item):
+        """Queue an item and wait for its result."""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._batch_loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            # Let concurrent requests arrive, then take all that are waiting, up to a full batch.
+            if self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(requests) < self.max_batch_size and not self._queue.empty():
+                requests.append(self._queue.get_nowait())
+            self.batch_sizes.append(len(requests))
+            try:
+                results = await loop.run_in_executor(self._executor, self.batch_function,
+                                                     [item for item, _ in requests])
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(requests, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    n_results: int = 10
+    k: int = 10
+
+
+class AnswerRequest(BaseModel):
+    question: str
+    stream: bool = False
+
+
+def _fused(results):
+    """The JSON-serializable part of a hybrid retrieval result."""
+    return {key: results[key] for key in ("ids", "documents", "scores", "provenance")}
+
+
+def warm_up_pipeline(pipeline):
+    try:
+        pipeline.warm_up()
+    except Exception as e:
+        print(f"Warm-up failed, the components will be created on first use: {e}")
+
+
+def create_app(pipeline=None, max_batch_size=32, max_wait_ms=5.0, warm_up=True):
+    """
+    Create the HTTP service around a RAGPipeline.
+
+    Endpoints:
+        GET /health: status, whether the pipeline is warmed up, and the index version once it is.
+        GET /metrics: latency histograms of every stage, in the Prometheus text format.
+        POST /search: hybrid retrieval for {"query", "n_results", "k"}.
+        POST /answer: answer for {"question"}; with "stream": true the response is
+            newline-delimited JSON events: {"event": "text", "text": <answer so far>},
+            {"event": "fallback"} and finally {"event": "done", ...result}.
+        POST /ingest: download and index the Wikipedia dump (one at a time: 409 while one is running).
+
+    Args:
+        pipeline (RAGPipeline, optional): Created on startup when not given.
+        max_batch_size (int): Maximum number of concurrent retrievals batched together.
+        max_wait_ms (float): How long a retrieval waits for concurrent ones.
+        warm_up (bool): Create the pipeline's components in the background right after startup,
+            instead of on the first requests. The service accepts requests meanwhile; they
+            wait for the components they need.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if app.state.pipeline is None:
+            from rag_pipeline import RAGPipeline
+            app.state.pipeline = RAGPipeline()
+        warm_up_task = None
+        if warm_up:
+            warm_up_task = asyncio.get_running_loop().run_in_executor(None, warm_up_pipeline, app.state.pipeline)
+        yield
+        if warm_up_task is not None and not warm_up_task.done():
+            warm_up_task.cancel()
+        app.state.search_batcher.close()
+        app.state.pipeline.llm.close()
+
+    app = FastAPI(title="Wiki-RAG", lifespan=lifespan)
+    app.state.pipeline = pipeline
+    if tracing.otel_enabled():
+        try:
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+            FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
+        except ImportError:
+            pass
+    # Retrievals with the default sizes are batched together; other sizes run on their own.
+    app.state.search_batcher = MicroBatcher(
+        lambda questions: app.state.pipeline.retrieve_batch(questions),
+        max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+    )
+
+    @app.get("/health")
+    async def health(request: Request):
+        pipeline = request.app.state.pipeline
+        if not pipeline.ready:
+            return {"status": "ok", "ready": False, "index_version": None}
+        return {"status": "ok", "ready": True, "index_version": await run_in_threadpool(pipeline.index_version)}
+
+    @app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(tracing.metrics_text(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/search")
+    async def search(body: SearchRequest, request: Request):
+        # Includes the wait for the batch; the retrieval itself is recorded by the batch.
+        with tracing.trace("search", query=body.query):
+            if body.n_results == 10 and body.k == 10:
+                results = await request.app.state.search_batcher.submit(body.query)
+            else:
+                results = await run_in_threadpool(request.app.state.pipeline.retrieve, body.query, body.n_results, body.k)
+        return _fused(results)
+
+    @app.post("/answer")
+    async def answer(body: AnswerRequest, request: Request):
+        pipeline = request.app.state.pipeline
+        batcher = request.app.state.search_batcher
+        loop = asyncio.get_running_loop()
+
+        def retrieve(question):
+            # Called from the worker thread running the pipeline: retrieval joins the shared batches.
+            return asyncio.run_coroutine_threadsafe(batcher.submit(question), loop).result()
+
+        if not body.stream:
+            return await run_in_threadpool(pipeline.answer, body.question, retrieve=retrieve)
+
+        events = asyncio.Queue()
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        def run():
+            try:
+                result = pipeline.answer(
+                    body.question,
+                    on_text=lambda text: emit({"event": "text", "text": text}),
+                    on_fallback=lambda: emit({"event": "fallback"}),
+                    retrieve=retrieve
+                )
+                emit({"event": "done", **result})
+            except Exception as e:
+                emit({"event": "error", "error": str(e)})
+
+        async def stream():
+            task = loop.run_in_executor(None, run)
+            while True:
+                event = await events.get()
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+                if event["event"] in ("done", "error"):
+                    break
+            await task
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/ingest")
+    async def ingest(request: Request):
+        from rag_pipeline import IngestionBusy
+        try:
+            index_version = await run_in_threadpool(request.app.state.pipeline.ingest_dump)
+        except IngestionBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            # Download, checksum and dump-reading failures, reported with their message.
+            raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {e}")
+        return {"index_version": index_version}
+
+    return app
+
+
+app = create_app(
+    max_batch_size=int(os.getenv("API_MAX_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("API_MAX_WAIT_MS", "5")),
+    warm_up=os.getenv("API_WARM_UP", "1") == "1"
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api:app", host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")))
@@ -1,68 +1,16 @@
-import itertools
-import ast
+import json
+import requests
 import streamlit as st
-from search import Search
-from prompt import *
-from VectorStore import VectorStore
-from ModelQuery import ModelQuery
-import wikipedia_dump_processor as wp
 from dotenv import load_dotenv
 import os
 load_dotenv()
-print(os.getenv("DUMP_FILE"))
-def download_and_process_dump():
-    """
-    Main function to download, extract, parse, and chunk the Wikipedia dump.
-    Returns the processed DataFrame.
-    """
-    # Define your Wikipedia dump parameters (adjust as needed)
-    DUMP_URL = "https://dumps.wikimedia.org/itwiki/latest/itwiki-latest-pages-articles1.xml-p1p316052.bz2"
-    DUMP_FILE = "Data/itwiki-latest-pages-articles1.xml-p1p316052.bz2"    # Change this to your local dump file path
-    OUTPUT_DIR = "Data"         # Change this to your desired output directory
-    BASE_DIR = OUTPUT_DIR                       # Assuming the extracted files reside in the output directory
-
-    # Ensure the output directory exists
-    # os.makedirs(OUTPUT_DIR, exist_ok=True)
+# The retrieval and answer service (api.py); the UI only renders its responses.
+RAG_API_URL = os.getenv("RAG_API_URL", "http://127.0.0.1:8000")
 
-    # Initialize processor and execute processing steps
-    processor = wp.WikipediaDumpProcessor(DUMP_URL, DUMP_FILE, OUTPUT_DIR, BASE_DIR)
-    processor.download_dump()
-    processor.extract_dump()
-    df = processor.parse_extracted_files().head(1)
-    # Assumes that the article text is stored in the 'text' column. Adjust if necessary.
-    df = processor.chunk_dataframe_text(df, 'text')
-    return df.head(5)
-
-# Initialize session state for the LLM if not already done.
-if 'llm' not in st.session_state:
-    st.session_state.llm = ModelQuery("http://127.0.0.1:1234/v1/chat/completions", "meta-llama-3.1-8b-instruct")
-
-# -------------------------------------------------------------------
-# Always initialize the vector stores (document and keyword) even if no dump is downloaded.
-# -------------------------------------------------------------------
-if 'vector_store_doc' not in st.session_state or 'vector_store_keywords' not in st.session_state:
-    try:
-        # Create a single VectorStore instance so we can extract both collections.
-        vs = VectorStore(
-            doc_collection_name="wikipedia_docs",
-            keyword_collection_name="wikipedia_keywords",
-            data_path="Wikipedia.csv",  # Provide the path if the CSV exists; otherwise, set to None
-            reset=False
-        )
-    except Exception as e:
-        vs = VectorStore(
-            doc_collection_name="wikipedia_docs",
-            keyword_collection_name="wikipedia_keywords",
-            reset=False
-        )
-    st.session_state.vector_store_doc = vs.doc_collection
-    st.session_state.vector_store_keywords = vs.keyword_collection
-
-# Initialize search objects if they do not exist
-if 'search_docs' not in st.session_state:
-    st.session_state.search_docs = Search(st.session_state.vector_store_doc)
-if 'search_keywords' not in st.session_state:
-    st.session_state.search_keywords = Search(st.session_state.vector_store_keywords)
+@st.cache_resource
+def api_session():
+    """One pooled HTTP session for all browser sessions of this process."""
+    return requests.Session()
 
 # -------------------------------------------------------------------
 # Button to Download and Process Wikipedia Dump and Update Vector Stores
@@ -70,23 +18,17 @@ if 'search_keywords' not in st.session_state:
 st.header("Aggiorna Vector Store da Wikipedia Dump")
 if st.button("Scarica e carica dump Wikipedia"):
     with st.spinner("Elaborazione del dump in corso..."):
-        df = download_and_process_dump()
-        # Reinitialize vector stores with reset enabled to ensure a fresh update.
-        vs = VectorStore(
-            doc_collection_name="wikipedia_docs",
-            keyword_collection_name="wikipedia_keywords",
-            data_path="Data/Wikipedia.csv",
-            reset=True
-        )
-        # Update session state with the separate vector stores.
-        st.session_state.vector_store_doc = vs.doc_collection
-        st.session_state.vector_store_keywords = vs.keyword_collection
-        # Process both document chunks and keywords using the same instance.
-        df_final = vs.process_all(chunked_docs=df, use_openai_embedding=False)
-        # Update the session state search objects with the new collections.
-        st.session_state.search_docs = Search(st.session_state.vector_store_doc)
-        st.session_state.search_keywords = Search(st.session_state.vector_store_keywords)
-    st.success("Dump Wikipedia processato e Vector Stores aggiornati con successo!")
+        # The service updates the collections incrementally: only new or changed articles are
+        # re-embedded, deleted ones are removed, and an interrupted update resumes on the next click.
+        response = api_session().post(f"{RAG_API_URL}/ingest", timeout=None)
+    if response.status_code == 409:
+        st.warning("Un aggiornamento è già in corso.")
+    elif response.status_code >= 500:
+        is_json = response.headers.get("Content-Type", "").startswith("application/json")
+        st.error(f"Aggiornamento non riuscito: {response.json().get('detail') if is_json else response.text}")
+    else:
+        response.raise_for_status()
+        st.success("Dump Wikipedia processato e Vector Stores aggiornati con successo!")
 
 # -------------------------------------------------------------------
 #  Q&A UI Section
@@ -103,71 +45,52 @@ generate_button = st.button("Genera Risposta")
 # Answer placeholder
 answer_placeholder = st.empty()
 
-def process_query(question):
-    with st.spinner("Recuperando informazioni rilevanti..."):
-        # Use the document vector store for semantic retrieval.
-        semantic_results = st.session_state.search_docs.semantic_retrieve(question)
-        print(semantic_results)
-        # Flatten and reverse the document lists to preserve original order.
-        semantic_docs = list(itertools.chain(*semantic_results['documents']))[::-1]
-        context = " ".join(semantic_docs)
-        # Debug: Count tokens using tiktoken
-        import tiktoken
-        encoding = tiktoken.get_encoding("cl100k_base")
-        encoded_text = encoding.encode(context)
-        print("Numero di token:", len(encoded_text))
-    with st.spinner("Generando risposta..."):
-        answer = st.session_state.llm.query_local_model(
-            query=question,
-            context=context,
-            prompt=answer_prompt
-        )
-        return answer, semantic_docs
+def render_answer(text):
+    answer_placeholder.markdown(f"## Risposta\n\n{text}")
+
+def stream_answer(question):
+    """
+    Ask the service for an answer, rendering it while it streams, and return the final
+    result ('answer', 'sources', 'from_cache', 'fallback', 'ttft', 'error'). Returns None,
+    after showing the error, if the answer failed or the stream ended before the result.
+    """
+    with api_session().post(f"{RAG_API_URL}/answer", json={"question": question, "stream": True},
+                            stream=True, timeout=(5, 300)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "text":
+                render_answer(event["text"])
+            elif event["event"] == "fallback":
+                st.warning("La risposta non è stata soddisfacente. Generando nuove query...")
+            elif event["event"] == "error":
+                st.error(f"Generazione della risposta non riuscita: {event['error']}")
+                return None
+            elif event["event"] == "done":
+                return event
+    st.error("La risposta si è interrotta prima di essere completata.")
+    return None
 
 if user_question and generate_button:
-    answer, semantic_docs = process_query(user_question)
+    with st.spinner("Generando risposta..."):
+        result = stream_answer(user_question)
 
-    # Check for fallback condition
-    if answer == "Non posso rispondere.":
-        st.warning("La risposta non è stata soddisfacente. Generando nuove query...")
-        new_queries = st.session_state.llm.query_local_model(
-            query=user_question,
-            context="",
-            prompt=rewriting_prompt
-        )
-        new_queries = ast.literal_eval(new_queries)
-        print(new_queries)
-        
-        if isinstance(new_queries, list):
-            all_documents = []
-            for new_query in new_queries:
-                semantic_results = st.session_state.search_docs.semantic_retrieve(new_query)
-                semantic_docs = list(itertools.chain(*semantic_results['documents']))[::-1]
-                all_documents.append(semantic_docs)
-            # Re-rank using RRF (Ranked Retrieval Fusion)
-            combined_results = st.session_state.search_docs.rrf(all_documents)
-            duck_result = st.session_state.search_docs.duckduckgo_retrieve(user_question)
-            context = duck_result + " " + " ".join(combined_results)
-            answer = st.session_state.llm.query_local_model(
-                query=user_question,
-                context=context,
-                prompt=fallback_prompt
-            )
-            st.write("## Risposta")
-            st.write(answer)
+    # None: the failure was already shown by stream_answer.
+    if result is not None:
+        if result['from_cache']:
+            st.caption("Risposta dalla cache")
+        elif result['ttft'] is not None:
+            st.caption(f"Primo token in {result['ttft']:.2f}s")
+
+        if result['error']:
+            st.error(result['error'])
+        else:
             with st.expander("Visualizza Contesto di Origine"):
-                for idx, result in enumerate(combined_results, start=1):
-                    st.write(f"Fonte {idx}:", result)
+                for idx, source in enumerate(result['sources'], start=1):
+                    st.write(f"Fonte {idx}:", source)
                     st.write("---")
-        else:
-            st.error("Impossibile generare nuove query.")
-    else:
-        st.write("## Risposta")
-        st.write(answer)
-        with st.expander("Visualizza Contesto di Origine"):
-            for idx, result in enumerate(semantic_docs[:3], start=1):
-                st.write(f"Fonte {idx}:", result)
-                st.write("---")
 
 if generate_button:
     st.success("Elaborazione completata!")
@@ -0,0 +1,106 @@
+"""
+Throughput and latency of the /search endpoint of the HTTP service (api.py) under
+concurrent clients, with micro-batching of concurrent retrievals versus one retrieval
+per request (max batch size 1), over a synthetic corpus in a fresh Chroma store.
+The cost per query of the retrieval itself, one query per call versus batched, is
+measured first, without HTTP.
+
+The load generator runs in the same process as the server, so on machines with few
+cores the two compete for the CPU.
+
+Usage: python benchmarks/bench_api.py [--articles 1000] [--requests 400] [--clients 32]
+"""
+import argparse
+import asyncio
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import pandas as pd
+import uvicorn
+from api import create_app
+from ModelQuery import ModelQuery
+from rag_pipeline import RAGPipeline
+from VectorStore import VectorStore
+from stubs import BagOfWordsEmbeddingFunction
+from synthetic import synthetic_chunked_corpus
+
+
+def serve(app):
+    """Run the app with uvicorn in a background thread and return (server, url)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def load(url, queries, clients):
+    latencies = []
+    pending = iter(queries)
+
+    async def client(session):
+        for query in pending:
+            start = time.perf_counter()
+            response = await session.post(f"{url}/search", json={"query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(queries) / elapsed, latencies[len(latencies) // 2], latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_chunked_corpus(args.articles))
+    rng = random.Random(0)
+    queries = [" ".join(rng.choice(chunks).split()[:8]) for chunks in rng.choices(df["chunked_text"], k=args.requests)]
+    with tempfile.TemporaryDirectory() as root:
+        vs = VectorStore("bench_docs", "bench_keywords", chroma_path=root,
+                         embedding_function=BagOfWordsEmbeddingFunction(), lexical_index_path=f"{root}/bm25")
+        vs.process_all(df)
+        # Only retrieval is exercised, so the model endpoint is never called.
+        pipeline = RAGPipeline(vector_store=vs, llm=ModelQuery("http://127.0.0.1:9/v1/chat/completions", "unused"))
+        print(f"{vs.doc_collection.count()} chunks, {args.requests} requests, {args.clients} clients")
+        for batch_size in (1, args.clients):
+            start = time.perf_counter()
+            for i in range(0, len(queries), batch_size):
+                pipeline.retrieve_batch(queries[i:i + batch_size])
+            print(f"retrieve_batch, {batch_size} per call: "
+                  f"{1000 * (time.perf_counter() - start) / len(queries):.1f}ms per query")
+        for max_batch_size in (1, args.clients):
+            app = create_app(pipeline, max_batch_size=max_batch_size, max_wait_ms=args.max_wait_ms)
+            server, url = serve(app)
+            asyncio.run(load(url, queries[:args.clients], args.clients))  # warm-up
+            app.state.search_batcher.batch_sizes.clear()
+            rps, p50, p95 = asyncio.run(load(url, queries, args.clients))
+            sizes = app.state.search_batcher.batch_sizes
+            print(f"max batch {max_batch_size}: {rps:.0f} req/s, p50 {1000 * p50:.0f}ms, p95 {1000 * p95:.0f}ms, "
+                  f"mean batch {sum(sizes) / len(sizes):.1f}")
+            server.should_exit = True
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    main()
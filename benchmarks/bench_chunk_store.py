@@ -0,0 +1,147 @@
+"""
+Chunked-corpus storage: the previous Wikipedia.csv round trip (to_csv, then read_csv with
+the chunk lists parsed back from their string form) versus the Parquet ChunkStore, on
+synthetic chunked articles with their text, as written by chunk_dataframe_text.
+
+Reports write time and size, then the time and peak memory of a fresh process to read
+everything, the columns VectorStore.load_dataframe reads, the titles only, and to stream the chunks for indexing
+(ChunkStore.iter_windows over id, title and chunked_text). Memory is the anonymous resident
+memory sampled every 5 ms (Linux), so the page cache of the memory-mapped files, which the
+kernel can reclaim and processes share, is not counted.
+
+Usage: python benchmarks/bench_chunk_store.py [--articles 20000]
+"""
+import argparse
+import ast
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+from chunk_store import ChunkStore
+from synthetic import synthetic_chunked_corpus
+
+
+def csv_full(path):
+    df = pd.read_csv(path)
+    df["chunked_text"] = [ast.literal_eval(value) for value in df["chunked_text"]]
+    return int(df["chunked_text"].map(len).sum())
+
+
+def csv_columns(path):
+    df = pd.read_csv(path, usecols=["id", "title", "chunked_text"])
+    df["chunked_text"] = [ast.literal_eval(value) for value in df["chunked_text"]]
+    return int(df["chunked_text"].map(len).sum())
+
+
+def csv_titles(path):
+    return len(pd.read_csv(path, usecols=["title"]))
+
+
+def csv_chunks(path):
+    n = 0
+    for df in pd.read_csv(path, usecols=["id", "title", "chunked_text"], chunksize=1000):
+        n += sum(len(ast.literal_eval(value)) for value in df["chunked_text"])
+    return n
+
+
+def store_full(path):
+    return int(ChunkStore(path).read()["chunked_text"].map(len).sum())
+
+
+def store_columns(path):
+    # What VectorStore.load_dataframe reads.
+    return int(ChunkStore(path).read(columns=["id", "title", "chunked_text"])["chunked_text"].map(len).sum())
+
+
+def store_titles(path):
+    return len(ChunkStore(path).read(columns=["title"]))
+
+
+def store_chunks(path):
+    return sum(len(article["chunked_text"]) for window in ChunkStore(path).iter_windows(columns=["id", "title", "chunked_text"])
+               for article in window)
+
+
+def rss_anon_mb():
+    """Resident anonymous memory: the heap, without the page cache of memory-mapped files (Linux)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+
+
+def _measure(function, path, queue):
+    peak, done = [rss_anon_mb()], threading.Event()
+
+    def sample():
+        while not done.wait(0.005):
+            peak[0] = max(peak[0], rss_anon_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    queue.put((elapsed, max(peak[0], rss_anon_mb()), result))
+
+
+def measure(function, path):
+    """Run `function(path)` in a fresh process; return (seconds, peak anonymous memory in MB, result)."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(function, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20000)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_chunked_corpus(args.articles))
+    with tempfile.TemporaryDirectory() as root:
+        csv_path, store_path = os.path.join(root, "Wikipedia.csv"), os.path.join(root, "chunk_store")
+        start = time.perf_counter()
+        df.to_csv(csv_path)
+        csv_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        ChunkStore(store_path).write(df)
+        store_seconds = time.perf_counter() - start
+        n_chunks = int(df["chunked_text"].map(len).sum())
+        print(f"{args.articles} articles, {n_chunks} chunks")
+        print(f"write: CSV {csv_seconds:.2f}s, {size_of(csv_path) / 1e6:.0f} MB; "
+              f"chunk store {store_seconds:.2f}s, {size_of(store_path) / 1e6:.0f} MB")
+        del df
+
+        baseline = measure(len, root)[1]
+        for name, (csv_function, store_function) in {"everything": (csv_full, store_full),
+                                                     "id, title, chunks": (csv_columns, store_columns),
+                                                     "titles only": (csv_titles, store_titles),
+                                                     "streamed chunks": (csv_chunks, store_chunks)}.items():
+            csv_time, csv_rss, csv_result = measure(csv_function, csv_path)
+            store_time, store_rss, store_result = measure(store_function, store_path)
+            same = "same result" if csv_result == store_result else "DIFFERENT results"
+            print(f"read {name}: CSV {csv_time:.2f}s, +{csv_rss - baseline:.0f} MB; "
+                  f"chunk store {store_time:.2f}s, +{store_rss - baseline:.0f} MB ({same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Chunking throughput of WikipediaDumpProcessor with 1..N worker processes over a
+synthetic Italian corpus written in WikiExtractor's JSON layout (AA/wiki_00, ...).
+
+Usage: python benchmarks/bench_chunking.py [--articles 5000] [--files 40] [--workers 1 2 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import wikipedia_dump_processor as wp
+from synthetic import synthetic_corpus
+
+
+def write_extracted_files(base_dir, n_articles, n_files):
+    per_file = max(1, n_articles // n_files)
+    handle = None
+    for i, article in enumerate(synthetic_corpus(n_articles)):
+        if i % per_file == 0:
+            if handle:
+                handle.close()
+            file_index = i // per_file
+            directory = os.path.join(base_dir, "A" + chr(ord("A") + file_index // 100))
+            os.makedirs(directory, exist_ok=True)
+            handle = open(os.path.join(directory, f"wiki_{file_index % 100:02d}"), "w")
+        handle.write(json.dumps(article) + "\n")
+    handle.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        write_extracted_files(base_dir, args.articles, args.files)
+        processor = wp.WikipediaDumpProcessor(None, None, base_dir, base_dir)
+
+        reference = None
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            articles = list(processor.iter_chunked_articles(workers=workers))
+            elapsed = time.perf_counter() - start
+            ids = [(article["id"], len(article["chunked_text"])) for article in articles]
+            if reference is None:
+                reference, baseline = ids, elapsed
+            assert ids == reference, "article order or chunking differs between worker counts"
+            n_chunks = sum(n for _, n in ids)
+            print(f"workers={workers}: {len(articles) / elapsed:.0f} articles/sec, "
+                  f"{n_chunks / elapsed:.0f} chunks/sec, speed-up x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
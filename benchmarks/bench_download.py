@@ -0,0 +1,170 @@
+"""
+Download throughput of a dump file from a local server laid out like dumps.wikimedia.org
+(dumpstatus.json with the sizes and SHA-1 checksums of a two-part multistream series),
+with an optional per-connection bandwidth limit like the one of the dump mirrors:
+
+1. the previous download loop (one stream, iter_content(chunk_size=1024));
+2. Downloader with 1 and `--connections` connections (Range requests, 1 MiB buffers);
+3. dropped connections: the previous loop fails with a truncated file, while Downloader,
+   on a server dropping every 3rd response halfway, resumes the parts and the checksum matches;
+4. an interrupted download (no retries) resumed by a second run, and a corrupted file
+   rejected by the checksum;
+5. the whole series, listed with dump_series.
+
+Usage: python benchmarks/bench_download.py [--size-mb 64] [--bandwidth-mb 20] [--connections 4]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+from downloader import Downloader, dump_series, file_digest
+from stubs import file_server
+
+WIKI, DATE = "itwiki", "20250101"
+
+
+def write_series(root, size, n_parts=2):
+    """Write a `pages-articles-multistreamN` series of random files, with its dumpstatus.json and RSS feed."""
+    run_dir = os.path.join(root, WIKI, DATE)
+    os.makedirs(run_dir)
+    os.makedirs(os.path.join(root, WIKI, "latest"))
+    files = {}
+    for part in range(1, n_parts + 1):
+        for name, length in ((f"{WIKI}-{DATE}-pages-articles-multistream{part}.xml-p{part}p{part * 1000}.bz2", size),
+                             (f"{WIKI}-{DATE}-pages-articles-multistream-index{part}.txt-p{part}p{part * 1000}.bz2", size // 64)):
+            data = os.urandom(length)
+            with open(os.path.join(run_dir, name), "wb") as f:
+                f.write(data)
+            files[name] = {"size": length, "url": f"/{WIKI}/{DATE}/{name}", "sha1": hashlib.sha1(data).hexdigest(),
+                           "md5": hashlib.md5(data).hexdigest()}
+    with open(os.path.join(run_dir, "dumpstatus.json"), "w") as f:
+        json.dump({"jobs": {"articlesmultistreamdump": {"status": "done", "files": files}}}, f)
+    with open(os.path.join(root, WIKI, "latest", f"{WIKI}-latest-pages-articles-multistream.xml.bz2-rss.txt"), "w") as f:
+        f.write(f"<rss><channel><item><link>http://download.wikimedia.org/{WIKI}/{DATE}</link></item></channel></rss>")
+
+
+def legacy_download(url, path):
+    """The previous WikipediaDumpProcessor._download loop."""
+    response = requests.get(url, stream=True)
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=1024):
+            if chunk:
+                f.write(chunk)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def remove(*paths):
+    for path in paths:
+        for suffix in ("", ".part", ".part.json"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=64, help="size of each dump part")
+    parser.add_argument("--bandwidth-mb", type=float, default=20.0, help="per-connection limit, 0 for none")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--part-mb", type=int, default=8, help="Range request size")
+    args = parser.parse_args()
+    size, bandwidth, part_size = args.size_mb * 2 ** 20, args.bandwidth_mb * 1e6, args.part_mb * 2 ** 20
+
+    def downloader(**kwargs):
+        return Downloader(part_size=part_size, progress=False, backoff_base=0.05, **kwargs)
+
+    with tempfile.TemporaryDirectory() as root:
+        write_series(os.path.join(root, "dumps"), size)
+        out = os.path.join(root, "out.bz2")
+        with file_server(os.path.join(root, "dumps"), bandwidth=bandwidth) as server:
+            (dump, _), (second, _) = dump_series(WIKI, base_url=server.url + "/")
+            path = f"/{WIKI}/{DATE}/{dump['name']}"
+            url = server.url + path
+            print(f"{dump['name']}: {size / 1e6:.0f} MB, "
+                  f"{'unlimited' if not bandwidth else f'{args.bandwidth_mb:g} MB/s'} per connection")
+
+            elapsed = timed(legacy_download, url, out)
+            ok = file_digest(out) == dump["sha1"]
+            print(f"iter_content(1024), 1 connection: {elapsed:.2f}s, {size / 1e6 / elapsed:.1f} MB/s, checksum {'ok' if ok else 'MISMATCH'}")
+            remove(out)
+
+            for connections in sorted({1, args.connections}):
+                d = downloader(connections=connections)
+                elapsed = timed(d.download, url, out, sha1=dump["sha1"])
+                d.close()
+                print(f"Downloader, {connections} connection(s): {elapsed:.2f}s, {size / 1e6 / elapsed:.1f} MB/s, checksum ok")
+                remove(out)
+
+        with file_server(os.path.join(root, "dumps"), bandwidth=bandwidth, drop_every=1) as server:
+            try:
+                timed(legacy_download, server.url + path, out)
+                error = "no error"
+            except requests.RequestException as e:
+                error = type(e).__name__
+            print(f"iter_content(1024) with a dropped connection: {error}, {os.path.getsize(out) / 1e6:.1f} of "
+                  f"{size / 1e6:.1f} MB written, checksum {'ok' if file_digest(out) == dump['sha1'] else 'MISMATCH'}")
+            remove(out)
+
+        with file_server(os.path.join(root, "dumps"), bandwidth=bandwidth, drop_every=3) as server:
+            url = server.url + path
+            before = server.counter["bytes"]
+            d = downloader(connections=args.connections)
+            elapsed = timed(d.download, url, out, sha1=dump["sha1"])
+            d.close()
+            print(f"Downloader with dropped connections: {elapsed:.2f}s, {server.counter['dropped']} responses dropped, "
+                  f"{(server.counter['bytes'] - before) / size:.2f}x the file size transferred, checksum ok")
+            remove(out)
+
+            # A run without retries stops at the first dropped response and keeps its progress.
+            d = downloader(connections=args.connections, max_retries=0)
+            try:
+                timed(d.download, url, out, sha1=dump["sha1"])
+            except RuntimeError:
+                pass
+            d.close()
+            with open(out + ".part.json") as f:
+                done = sum(json.load(f)["done"])
+        with file_server(os.path.join(root, "dumps"), bandwidth=bandwidth) as server:
+            d = downloader(connections=args.connections)
+            elapsed = timed(d.download, server.url + path, out, sha1=dump["sha1"])
+            print(f"Interrupted at {100 * done / size:.0f}%, resumed in {elapsed:.2f}s, "
+                  f"{server.counter['bytes'] / 1e6:.1f} MB transferred by the second run, checksum ok")
+            remove(out)
+
+            try:
+                timed(d.download, server.url + f"/{WIKI}/{DATE}/{second['name']}", out, sha1=dump["sha1"])
+                print("Corrupted file ACCEPTED")
+            except ValueError:
+                print(f"Wrong file rejected by the checksum, {'partial file removed' if not os.path.exists(out + '.part') else 'partial file KEPT'}")
+            remove(out)
+
+            start = time.perf_counter()
+            total = 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                for entries in dump_series(WIKI, base_url=server.url + "/"):
+                    for entry in entries:
+                        d.download(entry["url"], os.path.join(root, "series", entry["name"]), sha1=entry["sha1"])
+                        total += entry["size"]
+            elapsed = time.perf_counter() - start
+            d.close()
+            print(f"Series of {len(os.listdir(os.path.join(root, 'series')))} files ({total / 1e6:.0f} MB): "
+                  f"{elapsed:.2f}s, {total / 1e6 / elapsed:.1f} MB/s, checksums ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Articles/sec from a bz2 dump to chunked articles: WikiExtractor run over the dump into
+JSON files that are then read back and chunked (extract_with_wikiextractor + iter_chunked_articles),
+versus the in-process reader (iter_chunked_articles(from_dump=True)) on a multistream
+dump with its index and on a single-stream dump. Checks that all paths return the same
+articles.
+
+Usage: python benchmarks/bench_dump_reader.py [--articles 2000] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wikipedia_dump_processor import WikipediaDumpProcessor
+from synthetic import write_synthetic_dump
+
+
+def extract_with_wikiextractor(processor):
+    """Runs WikiExtractor over the dump into JSON files under the processor's output directory."""
+    # Imported here: WikiExtractor is only the baseline of the comparison, and it is driven through sys.argv.
+    from wikiextractor.WikiExtractor import main as wiki_extractor
+    argv = sys.argv
+    sys.argv = ["WikiExtractor.py", processor.dump_file, "--json", "--no-templates", "--output", processor.output_dir]
+    try:
+        wiki_extractor()
+    finally:
+        sys.argv = argv
+
+
+def run(processor, workers, from_dump):
+    start = time.perf_counter()
+    if not from_dump:
+        extract_with_wikiextractor(processor)
+    articles = list(processor.iter_chunked_articles(workers=workers, from_dump=from_dump))
+    return time.perf_counter() - start, articles
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        multistream = os.path.join(root, "multistream.xml.bz2")
+        index = os.path.join(root, "multistream-index.txt.bz2")
+        single = os.path.join(root, "single.xml.bz2")
+        expected = write_synthetic_dump(multistream, args.articles, index_path=index)
+        write_synthetic_dump(single, args.articles, multistream=False)
+        print(f"{args.articles} articles, {os.path.getsize(single) / 1e6:.1f} MB compressed, {args.workers} workers")
+
+        extracted = os.path.join(root, "extracted")
+        runs = {
+            "WikiExtractor + JSON files": (WikipediaDumpProcessor(None, single, extracted, extracted), False),
+            "in-process, multistream + index": (WikipediaDumpProcessor(None, multistream, root, root, index_file=index), True),
+            "in-process, multistream, scanned": (WikipediaDumpProcessor(None, multistream, root, root), True),
+            "in-process, single stream": (WikipediaDumpProcessor(None, single, root, root), True),
+        }
+        reference = None
+        for name, (processor, from_dump) in runs.items():
+            elapsed, articles = run(processor, args.workers, from_dump)
+            assert [article["id"] for article in articles] == expected, name
+            texts = [(article["title"], article["chunked_text"]) for article in articles]
+            reference = reference or texts
+            same = "same chunks" if texts == reference else "DIFFERENT chunks"
+            print(f"{name}: {elapsed:.2f}s, {len(articles) / elapsed:.0f} articles/sec, {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark and load test of Wiki-RAG with local stand-ins for every external
+service, so it runs offline and its results can be compared between commits.
+
+1. Ingestion: a synthetic Italian corpus is written as WikiExtractor output, chunked by
+   WikipediaDumpProcessor and indexed by VectorStore.process_all in a fresh Chroma store.
+2. Queries: Search.semantic_retrieve, hybrid retrieval (vector and BM25 rankings fused by
+   RRF) and full RAGPipeline.answer calls, streamed from a stub OpenAI-compatible LLM
+   server through ModelQuery, at several concurrency levels. Every `--refuse-every`-th
+   answer is a refusal, so the fallback (query rewriting, multi-query retrieval and the
+   DuckDuckGo stand-in) is part of the load.
+
+Reports ingest articles/sec, p50/p95/p99 latency and QPS per operation and concurrency
+level, and writes them to `--output` as JSON, with the per-stage breakdown recorded by the
+tracing spans (embedding, vector search, BM25, RRF, LLM, ...) of each operation. With
+`--baseline`, the results are compared with a previous JSON file and the script exits with
+status 1 if a throughput dropped or a latency grew by more than `--tolerance`.
+
+The dump download and the WikiExtractor run are not measured (they need the real dump),
+and the load generator shares the machine with the service, so compare results from the
+same machine only.
+
+Usage: python benchmarks/bench_e2e.py [--articles 500] [--requests 100] [--concurrency 1 4 16]
+           [--output bench_e2e.json] [--baseline previous.json] [--tolerance 0.2]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+import tracing
+from ModelQuery import ModelQuery
+from rag_pipeline import RAGPipeline
+from VectorStore import VectorStore
+from stubs import BagOfWordsEmbeddingFunction, chat_server, stub_duckduckgo
+from synthetic import synthetic_corpus
+from wikipedia_dump_processor import WikipediaDumpProcessor
+
+# Metrics compared with the baseline, and whether higher values are better.
+HIGHER_IS_BETTER = {"articles_per_sec": True, "chunks_per_sec": True, "qps": True,
+                    "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+
+def write_extracted(articles, base_dir, articles_per_file=100):
+    """Write articles as WikiExtractor --json output (AA/wiki_00, AA/wiki_01, ...)."""
+    os.makedirs(os.path.join(base_dir, "AA"), exist_ok=True)
+    n_files = 0
+    for i, article in enumerate(articles):
+        if i % articles_per_file == 0:
+            if n_files:
+                f.close()
+            f = open(os.path.join(base_dir, "AA", f"wiki_{n_files:02d}"), "w")
+            n_files += 1
+        f.write(json.dumps(article, ensure_ascii=False) + "\n")
+    if n_files:
+        f.close()
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_load(function, inputs, concurrency):
+    """Call `function` on every input from `concurrency` threads; return QPS and latency percentiles."""
+    latencies, errors = [], []
+
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            result = function(item)
+        except Exception as e:
+            errors.append(repr(e))
+            return None
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    # The service logs to stdout on every request; keep the report readable.
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        results = list(pool.map(timed, inputs))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    stats = {"concurrency": concurrency, "requests": len(inputs), "errors": len(errors), "qps": len(latencies) / elapsed}
+    if latencies:
+        stats.update({f"p{q}_ms": 1000 * percentile(latencies, q / 100) for q in (50, 95, 99)})
+    if errors:
+        stats["first_error"] = errors[0]
+    return stats, results
+
+
+def make_questions(df, n, seed):
+    """Questions naming an article's topic and year and quoting a few words of one of its chunks."""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        article = df.iloc[rng.randrange(len(df))]
+        words = rng.choice(article["chunked_text"]).split()
+        start = rng.randrange(max(1, len(words) - 6))
+        topic_year = " ".join(article["title"].split()[3:5])
+        questions.append(f"{topic_year} {' '.join(words[start:start + 6])}?")
+    return questions
+
+
+def bench_ingest(args, root):
+    extract_dir = os.path.join(root, "extracted")
+    write_extracted(synthetic_corpus(args.articles), extract_dir)
+    processor = WikipediaDumpProcessor(None, None, extract_dir, extract_dir)
+
+    start = time.perf_counter()
+    df = pd.DataFrame(processor.iter_chunked_articles(text_column="text", workers=args.workers))
+    chunk_seconds = time.perf_counter() - start
+
+    vs = VectorStore("bench_docs", "bench_keywords", chroma_path=os.path.join(root, "chroma"),
+                     embedding_function=BagOfWordsEmbeddingFunction(), lexical_index_path=os.path.join(root, "bm25"))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vs.process_all(df)
+    index_seconds = time.perf_counter() - start
+
+    n_chunks = int(df["chunked_text"].map(len).sum())
+    total = chunk_seconds + index_seconds
+    return vs, df, {
+        "articles": len(df),
+        "chunks": n_chunks,
+        "chunk_seconds": chunk_seconds,
+        "index_seconds": index_seconds,
+        "articles_per_sec": len(df) / total,
+        "chunks_per_sec": n_chunks / total,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def flatten(results):
+    """Map 'ingest.articles_per_sec', 'answer.c4.p95_ms', ... to the values of the compared metrics."""
+    metrics = {f"ingest.{name}": value for name, value in results["ingest"].items() if name in HIGHER_IS_BETTER}
+    for operation, levels in results["queries"].items():
+        for level in levels:
+            for name, value in level.items():
+                if name in HIGHER_IS_BETTER:
+                    metrics[f"{operation}.c{level['concurrency']}.{name}"] = value
+    return metrics
+
+
+def compare(results, baseline, tolerance):
+    """Return the metrics that regressed by more than `tolerance` relative to the baseline."""
+    regressions = []
+    current = flatten(results)
+    for key, before in flatten(baseline).items():
+        after = current.get(key)
+        if after is None or not before:
+            continue
+        change = after / before - 1
+        if change < -tolerance if HIGHER_IS_BETTER[key.rsplit(".", 1)[1]] else change > tolerance:
+            regressions.append(f"{key}: {before:.1f} -> {after:.1f} ({100 * change:+.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="chunking processes")
+    parser.add_argument("--requests", type=int, default=100, help="requests per operation and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ttft-ms", type=float, default=50.0, help="stub LLM time to first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="stub LLM time between tokens")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--refuse-every", type=int, default=5, help="every N-th answer takes the fallback path")
+    parser.add_argument("--web-ms", type=float, default=300.0, help="DuckDuckGo stand-in latency")
+    parser.add_argument("--output", default="bench_e2e.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "config": vars(args), "queries": {}, "stages": {}}
+    llm_server = chat_server(ttft=args.ttft_ms / 1000, token_delay=args.token_ms / 1000,
+                             answer_tokens=args.answer_tokens, refuse_every=args.refuse_every)
+    with tempfile.TemporaryDirectory() as root, llm_server, stub_duckduckgo(latency=args.web_ms / 1000) as web:
+        vs, df, results["ingest"] = bench_ingest(args, root)
+        results["stages"]["ingest"] = tracing.summary()
+        ingest = results["ingest"]
+        print(f"ingest: {ingest['articles']} articles, {ingest['chunks']} chunks, "
+              f"{ingest['articles_per_sec']:.1f} articles/sec (chunking {ingest['chunk_seconds']:.1f}s, "
+              f"indexing {ingest['index_seconds']:.1f}s)")
+
+        llm = ModelQuery(f"{llm_server.url}/v1/chat/completions", "stub", max_connections=max(args.concurrency))
+        pipeline = RAGPipeline(vector_store=vs, llm=llm)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.warm_up()
+        operations = {
+            "semantic": pipeline.search_docs.semantic_retrieve,
+            "hybrid": pipeline.retrieve,
+            "answer": pipeline.answer,
+        }
+        seed = 0
+        for operation, function in operations.items():
+            results["queries"][operation] = []
+            tracing.reset()
+            for concurrency in args.concurrency:
+                # Fresh questions and an empty answer cache, so every answer is generated.
+                seed += 1
+                questions = make_questions(df, args.requests, seed)
+                pipeline.answer_cache.invalidate()
+                stats, outputs = run_load(function, questions, concurrency)
+                if operation == "answer":
+                    answers = [output for output in outputs if output is not None]
+                    stats["fallback_rate"] = sum(a["fallback"] for a in answers) / max(1, len(answers))
+                    stats["cache_hit_rate"] = sum(a["from_cache"] for a in answers) / max(1, len(answers))
+                    ttfts = sorted(a["ttft"] for a in answers if a["ttft"] is not None)
+                    if ttfts:
+                        stats["ttft_p50_ms"] = 1000 * percentile(ttfts, 0.5)
+                results["queries"][operation].append(stats)
+                print(f"{operation}, concurrency {concurrency}: {stats['qps']:.1f} QPS, "
+                      f"p50 {stats.get('p50_ms', 0):.0f}ms, p95 {stats.get('p95_ms', 0):.0f}ms, "
+                      f"p99 {stats.get('p99_ms', 0):.0f}ms" + (f", {stats['errors']} errors" if stats["errors"] else ""))
+            results["stages"][operation] = tracing.summary()
+            print("  " + ", ".join(f"{stage} {stage_stats['mean_ms']:.1f}ms" for stage, stage_stats in results["stages"][operation].items()))
+        results["stubs"] = {"llm_requests": llm_server.counter["requests"], "web_searches": web.calls}
+        llm.close()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {100 * args.tolerance:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Throughput of the serial per-chunk embedding path versus the batched, concurrent
+EmbeddingEngine, measured against a local stub embedding server.
+
+Usage: python benchmarks/bench_embedding.py [--chunks 2000] [--latency 0.05]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_engine import EmbeddingEngine
+from stubs import embedding_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit-every", type=int, default=7)
+    args = parser.parse_args()
+
+    texts = [f"Frammento {i} della voce sui Giochi olimpici." for i in range(args.chunks)]
+
+    with embedding_server(latency=args.latency, rate_limit_every=args.rate_limit_every) as server:
+        api_base = f"{server.url}/v1"
+
+        serial = EmbeddingEngine(api_key="stub", api_base=api_base, backoff_base=0.05)
+        sample = texts[:min(100, len(texts))]
+        start = time.perf_counter()
+        for text in sample:
+            serial.embed([text])
+        serial_rate = len(sample) / (time.perf_counter() - start)
+        print(f"serial, 1 chunk/request: {serial_rate:.1f} chunks/sec (on {len(sample)} chunks)")
+
+        for batch_size, in_flight in [(64, 1), (64, 4), (256, 4), (256, 8)]:
+            engine = EmbeddingEngine(api_key="stub", api_base=api_base, batch_size=batch_size,
+                                     max_in_flight=in_flight, backoff_base=0.05)
+            embeddings = engine.embed(texts)
+            assert len(embeddings) == len(texts)
+            print(f"batch_size={batch_size} in_flight={in_flight}: ", end="")
+            engine.report()
+
+
+if __name__ == "__main__":
+    main()
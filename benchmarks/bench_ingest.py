@@ -0,0 +1,50 @@
+"""
+Articles/sec of per-article add() calls versus cross-article bulk ingestion
+into a fresh persistent Chroma store.
+
+Usage: python benchmarks/bench_ingest.py [--articles 2000] [--batch-sizes 1000 5000 20000]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+from VectorStore import VectorStore
+from stubs import HashEmbeddingFunction
+from synthetic import synthetic_chunked_corpus
+
+
+def run(df, bulk, ingest_batch_size):
+    with tempfile.TemporaryDirectory() as chroma_path:
+        vs = VectorStore("bench_docs", "bench_keywords", chroma_path=chroma_path,
+                         embedding_function=HashEmbeddingFunction(), ingest_batch_size=ingest_batch_size)
+        start = time.perf_counter()
+        vs.process_all(df, bulk=bulk)
+        elapsed = time.perf_counter() - start
+        assert vs.doc_collection.count() == sum(map(len, df["chunked_text"]))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_chunked_corpus(args.articles))
+    n_chunks = sum(map(len, df["chunked_text"]))
+    print(f"{len(df)} articles, {n_chunks} chunks")
+
+    elapsed = run(df, bulk=False, ingest_batch_size=5000)
+    print(f"per-article add(): {len(df) / elapsed:.1f} articles/sec ({n_chunks / elapsed:.0f} chunks/sec)")
+    for batch_size in args.batch_sizes:
+        elapsed = run(df, bulk=True, ingest_batch_size=batch_size)
+        print(f"bulk, batch {batch_size}: {len(df) / elapsed:.1f} articles/sec ({n_chunks / elapsed:.0f} chunks/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Embedding throughput of Chroma's default ONNX embedder versus LocalEmbeddingFunction
+(fp32 and int8, several thread counts), for bulk ingestion and for concurrent
+single-query calls pooled by the dynamic batcher.
+
+Needs the all-MiniLM-L6-v2 model files (downloaded by Chroma on first use) and,
+for --int8, the onnx package.
+
+Usage: python benchmarks/bench_local_embedding.py [--chunks 2000] [--queries 500] [--threads 1 4] [--int8]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+from local_embedding import LocalEmbeddingFunction
+from synthetic import synthetic_chunked_corpus
+
+
+def bulk(embedding_function, chunks, batch_size=256):
+    start = time.perf_counter()
+    embeddings = []
+    for i in range(0, len(chunks), batch_size):
+        embeddings.extend(embedding_function(chunks[i:i + batch_size]))
+    return len(chunks) / (time.perf_counter() - start), np.array(embeddings)
+
+
+def concurrent_queries(embedding_function, queries, clients):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda query: embedding_function([query]), queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--int8", action="store_true")
+    args = parser.parse_args()
+
+    chunks = [chunk for article in synthetic_chunked_corpus(max(1, args.chunks // 20))
+              for chunk in article["chunked_text"]][:args.chunks]
+    queries = [" ".join(chunk.split()[:8]) for chunk in chunks[:args.queries]]
+
+    default = DefaultEmbeddingFunction()
+    rate, reference = bulk(default, chunks)
+    print(f"chroma default: bulk {rate:.0f} chunks/sec, "
+          f"{args.clients} clients {concurrent_queries(default, queries, args.clients):.0f} queries/sec")
+
+    for quantize in ([False, True] if args.int8 else [False]):
+        for threads in args.threads:
+            local = LocalEmbeddingFunction(num_threads=threads, quantize=quantize)
+            rate, embeddings = bulk(local, chunks)
+            # Cosine similarity with the default embedder's vectors (1.0 = identical).
+            agreement = float(np.mean(np.sum(embeddings * reference, axis=1)))
+            print(f"local {'int8' if quantize else 'fp32'}, {threads} threads: bulk {rate:.0f} chunks/sec, "
+                  f"{args.clients} clients {concurrent_queries(local, queries, args.clients):.0f} queries/sec, "
+                  f"cosine vs default {agreement:.4f}")
+
+
+if __name__ == "__main__":
+    main()
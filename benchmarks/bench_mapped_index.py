@@ -0,0 +1,106 @@
+"""
+Cold start and memory of worker processes searching a Chroma PersistentClient versus the
+memory-mapped MappedCollection export of the same collection.
+
+Each worker is a fresh process that opens the store, runs its first query and then a batch of
+queries; its time to first result and its private / shared resident memory (Linux
+/proc/self/smaps_rollup) are reported. Several workers are started at once to show that the
+mapped export is shared through the page cache instead of being loaded into every heap.
+
+Usage: python benchmarks/bench_mapped_index.py [--vectors 50000] [--dim 384] [--workers 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from bench_quantized import clustered_vectors
+
+WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+backend, path, queries_path = sys.argv[1:4]
+import numpy as np
+sys.path.insert(0, {root!r})
+queries = np.load(queries_path)
+if backend == "chroma":
+    import chromadb
+    collection = chromadb.PersistentClient(path=path).get_collection("bench_vectors", embedding_function=None)
+else:
+    from vector_index import MappedCollection
+    collection = MappedCollection(path)
+collection.query(query_embeddings=queries[:1], n_results=10, include=['documents', 'metadatas', 'distances'])
+first = time.perf_counter() - start
+for query in queries:
+    collection.query(query_embeddings=[query], n_results=10, include=['documents', 'metadatas', 'distances'])
+memory = {{}}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("Rss", "Shared_Clean", "Private_Clean", "Private_Dirty"):
+            memory[key] = int(value.split()[0]) / 1024
+print(json.dumps({{"first_query": first, "qps": len(queries) / (time.perf_counter() - start - first), **memory}}))
+"""
+
+
+def run_workers(backend, path, queries_path, workers):
+    script = WORKER.format(root=str(Path(__file__).resolve().parent.parent))
+    processes = [subprocess.Popen([sys.executable, "-c", script, backend, path, queries_path],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                 for _ in range(workers)]
+    return [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in processes]
+
+
+def report(name, results):
+    mean = {key: np.mean([result[key] for result in results]) for key in results[0]}
+    print(f"{name}: first query {1000 * mean['first_query']:.0f}ms, {mean['qps']:.0f} QPS, "
+          f"RSS {mean['Rss']:.0f} MiB (private {mean['Private_Clean'] + mean['Private_Dirty']:.0f} MiB, "
+          f"shared {mean['Shared_Clean']:.0f} MiB) per worker")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", default="int8")
+    args = parser.parse_args()
+
+    import chromadb
+    from vector_index import MappedCollection
+
+    vectors = clustered_vectors(args.vectors, args.dim)
+    ids = [str(i) for i in range(args.vectors)]
+    with tempfile.TemporaryDirectory() as root:
+        client = chromadb.PersistentClient(path=os.path.join(root, "chroma"))
+        collection = client.create_collection("bench_vectors", embedding_function=None)
+        batch = client.get_max_batch_size()
+        for start in range(0, args.vectors, batch):
+            end = start + batch
+            collection.add(ids=ids[start:end], embeddings=vectors[start:end],
+                           documents=[f"chunk {i}" for i in range(start, min(end, args.vectors))],
+                           metadatas=[{"article_id": str(i // 20), "offset": i % 20}
+                                      for i in range(start, min(end, args.vectors))])
+        start = time.perf_counter()
+        MappedCollection.export(collection, os.path.join(root, "mapped"), mode=args.mode, page_size=batch)
+        print(f"{args.vectors} vectors x {args.dim} dims, export {time.perf_counter() - start:.1f}s")
+        del client, collection
+
+        queries_path = os.path.join(root, "queries.npy")
+        np.save(queries_path, clustered_vectors(args.queries, args.dim, seed=1))
+        for workers in (1, args.workers):
+            report(f"chroma, {workers} workers", run_workers("chroma", os.path.join(root, "chroma"), queries_path, workers))
+            report(f"mapped {args.mode}, {workers} workers",
+                   run_workers("mapped", os.path.join(root, "mapped"), queries_path, workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Memory footprint, recall@k and QPS of the compressed vector tier (QuantizedVectorIndex,
+float16 and int8, with and without full-precision rescoring) against the uncompressed
+Chroma store, on clustered synthetic embeddings. Recall is measured against exact
+float32 search.
+
+Usage: python benchmarks/bench_quantized.py [--vectors 50000] [--dim 384] [--queries 200] [--k 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import chromadb
+import numpy as np
+from vector_index import QuantizedVectorIndex
+
+
+def clustered_vectors(n, dim, n_clusters=200, seed=0):
+    """Normalized vectors around random centroids, so neighbours are meaningful like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(n_clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def directory_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def evaluate(search, queries, truth, k):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    qps = len(queries) / (time.perf_counter() - start)
+    recall = np.mean([len(set(ids) & set(expected)) / k for ids, expected in zip(results, truth)])
+    return qps, recall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.vectors, args.dim)
+    queries = clustered_vectors(args.queries, args.dim, seed=1)
+    ids = [str(i) for i in range(args.vectors)]
+    # Exact float32 ground truth (squared L2).
+    distances = (vectors ** 2).sum(1)[None, :] - 2 * queries @ vectors.T
+    truth = [[ids[i] for i in np.argsort(row)[:args.k]] for row in distances]
+    print(f"{args.vectors} vectors x {args.dim} dims, float32 {vectors.nbytes / 2**20:.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as chroma_path:
+        client = chromadb.PersistentClient(path=chroma_path)
+        collection = client.create_collection("bench_vectors", embedding_function=None)
+        batch = client.get_max_batch_size()
+        for start in range(0, args.vectors, batch):
+            collection.add(ids=ids[start:start + batch], embeddings=vectors[start:start + batch])
+        qps, recall = evaluate(
+            lambda query: collection.query(query_embeddings=[query], n_results=args.k, include=[])['ids'][0],
+            queries, truth, args.k
+        )
+        print(f"chroma hnsw (float32): {directory_size(chroma_path) / 2**20:.1f} MiB on disk, "
+              f"{qps:.0f} QPS, recall@{args.k} {recall:.3f}")
+
+        for mode in QuantizedVectorIndex.MODES:
+            for store_full in (False, True):
+                path = os.path.join(chroma_path, f"index_{mode}_{store_full}")
+                index = QuantizedVectorIndex.build(collection, path, mode=mode, store_full=store_full)
+                qps, recall = evaluate(lambda query: index.search(query, k=args.k)[0], queries, truth, args.k)
+                # Several queries per scan, as in multi-query retrieval.
+                start = time.perf_counter()
+                index.query(queries, n_results=args.k)
+                batched_qps = len(queries) / (time.perf_counter() - start)
+                print(f"{mode}{' + rescoring' if store_full else ''}: {index.memory_bytes() / 2**20:.1f} MiB in RAM, "
+                      f"{directory_size(path) / 2**20:.1f} MiB on disk, {qps:.0f} QPS ({batched_qps:.0f} batched), "
+                      f"recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency and recall of the global chunk search versus title-first two-stage retrieval
+(Search.title_first_retrieve) over a synthetic corpus in a fresh Chroma store.
+
+Each query names an article's topic and year and quotes a few words of one of its
+chunks; recall@k is the fraction of queries whose source chunk is retrieved.
+
+Usage: python benchmarks/bench_retrieval.py [--articles 2000] [--queries 200] [--k 10]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+from VectorStore import VectorStore
+from search import Search
+from stubs import BagOfWordsEmbeddingFunction
+from synthetic import synthetic_chunked_corpus
+
+
+def make_queries(df, n_queries, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        article = df.iloc[rng.randrange(len(df))]
+        chunk = rng.choice(article["chunked_text"])
+        words = chunk.split()
+        start = rng.randrange(max(1, len(words) - 6))
+        topic_year = " ".join(article["title"].split()[3:5])
+        queries.append((f"{topic_year} {' '.join(words[start:start + 6])}", chunk))
+    return queries
+
+
+def run(queries, retrieve, k):
+    latencies, hits, stages = [], 0, []
+    for query, chunk in queries:
+        start = time.perf_counter()
+        results = retrieve(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += chunk in results['documents'][0]
+        stages.append(results.get('stage', 'global'))
+    latencies.sort()
+    return {
+        "mean_ms": 1000 * statistics.mean(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "recall": hits / len(queries),
+        "title_stage": stages.count("title") / len(stages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-articles", type=int, default=5)
+    parser.add_argument("--min-title-similarity", type=float, default=0.4)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_chunked_corpus(args.articles))
+    queries = make_queries(df, args.queries)
+    with tempfile.TemporaryDirectory() as chroma_path:
+        vs = VectorStore("bench_docs", "bench_keywords", chroma_path=chroma_path,
+                         embedding_function=BagOfWordsEmbeddingFunction())
+        vs.process_all(df)
+        print(f"{len(df)} articles, {vs.doc_collection.count()} chunks, {len(queries)} queries")
+        search = Search(vs.doc_collection, keyword_db=vs.keyword_collection)
+
+        paths = {
+            "global": lambda query, k: search.semantic_retrieve(query, n_results=k),
+            "title-first": lambda query, k: search.title_first_retrieve(
+                query, n_results=k, n_articles=args.n_articles, min_title_similarity=args.min_title_similarity
+            ),
+        }
+        for name, retrieve in paths.items():
+            stats = run(queries, retrieve, args.k)
+            print(f"{name}: mean {stats['mean_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms, "
+                  f"recall@{args.k} {stats['recall']:.3f}, title stage {stats['title_stage']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Reciprocal rank fusion: the text-keyed Search.rrf against the vectorized, ID-based
+Search.rrf_ids, fusing several rankers of 10, 100 and 1000 candidates each.
+
+Usage: python benchmarks/bench_rrf.py [--candidates 10 100 1000] [--rankers 4] [--repeat 200]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search import Search
+from synthetic import synthetic_chunked_corpus
+
+
+def make_rankings(n_candidates, n_rankers, seed=0):
+    """Return (texts, ids) rankings drawn from a shared pool, so rankers overlap like real retrievers."""
+    pool = []
+    for article in synthetic_chunked_corpus(max(1, 2 * n_candidates // 5), seed=seed):
+        for offset, text in enumerate(article["chunked_text"]):
+            pool.append((f"{article['id']}-{offset}", text))
+            if len(pool) == 2 * n_candidates:
+                break
+        if len(pool) == 2 * n_candidates:
+            break
+    rng = random.Random(seed)
+    rankings = [rng.sample(pool, min(n_candidates, len(pool))) for _ in range(n_rankers)]
+    texts = [[text for _, text in ranking] for ranking in rankings]
+    ids = [[doc_id for doc_id, _ in ranking] for ranking in rankings]
+    return texts, ids
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rankers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    search = Search(None)
+    for n in args.candidates:
+        texts, ids = make_rankings(n, args.rankers)
+        text_time = timeit(lambda: search.rrf(texts, k=args.k), args.repeat)
+        id_time = timeit(lambda: search.rrf_ids(ids, k=args.k), args.repeat)
+        print(f"candidates={n} rankers={args.rankers}: rrf {text_time * 1e6:.0f}us, "
+              f"rrf_ids {id_time * 1e6:.0f}us, speed-up x{text_time / id_time:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup cost of the service: import time of its modules in fresh interpreters, which heavy
+packages each import pulls in, and how long `uvicorn api:app` takes to answer /health.
+
+Pass --repo to measure another checkout (e.g. `git worktree add /tmp/before HEAD~1`) and
+compare.
+
+Usage: python benchmarks/bench_startup.py [--repo .] [--runs 5]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+# Packages with a noticeable import cost, reported when an import pulls them in.
+HEAVY = ["chromadb", "pandas", "langchain", "langchain_text_splitters", "wikiextractor", "aiohttp",
+         "duckduckgo_search", "tiktoken", "onnxruntime", "fastapi"]
+
+IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def import_time(repo, module, runs):
+    seconds, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT.format(module=module, heavy=HEAVY)], cwd=repo,
+                                capture_output=True, text=True)
+        if output.returncode:
+            return None, output.stderr.strip().splitlines()[-1]
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(seconds), loaded
+
+
+def time_to_health(repo, timeout=120):
+    """Start the service and return the seconds until /health answers (and its body)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)], cwd=repo,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                return None, "service exited"
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    return time.perf_counter() - start, json.loads(response.read())
+            except OSError:
+                time.sleep(0.05)
+        return None, "timeout"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo", default=str(Path(__file__).resolve().parent.parent))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    for module in ("app", "api", "rag_pipeline", "VectorStore", "search", "ModelQuery"):
+        if not os.path.exists(os.path.join(repo, f"{module}.py")):
+            continue
+        seconds, loaded = import_time(repo, module, args.runs)
+        if seconds is None:
+            print(f"import {module}: failed ({loaded})")
+        else:
+            print(f"import {module}: {1000 * seconds:.0f}ms, loads {', '.join(loaded) or 'none'}")
+    seconds, health = time_to_health(repo)
+    print(f"uvicorn api:app answers /health: " + (f"{seconds:.2f}s {health}" if seconds else f"failed ({health})"))
+
+
+if __name__ == "__main__":
+    main()
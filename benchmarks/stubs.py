@@ -0,0 +1,339 @@
+"""
+Local stand-ins for the external services used by Wiki-RAG, so benchmarks can
+run without network access or API keys.
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text, dim):
+    """Deterministic pseudo-embedding derived from the text checksum."""
+    rng = random.Random(zlib.crc32(text.encode("utf-8")))
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+class StubServer:
+    """Runs a ThreadingHTTPServer on a free local port in a background thread."""
+
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def embedding_server(dim=1536, latency=0.05, rate_limit_every=0):
+    """
+    Stub for the OpenAI `/v1/embeddings` endpoint.
+
+    Args:
+        dim (int): Embedding dimension returned for every input.
+        latency (float): Simulated per-request latency in seconds.
+        rate_limit_every (int): Answer every N-th request with a 429 (0 disables it).
+    """
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                counter["requests"] += 1
+                limited = rate_limit_every and counter["requests"] % rate_limit_every == 0
+            time.sleep(latency)
+            if limited:
+                self.send_response(429)
+                self.send_header("Retry-After", "0.1")
+                self.end_headers()
+                return
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            payload = json.dumps({
+                "object": "list",
+                "model": body.get("model"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text, dim)}
+                         for i, text in enumerate(inputs)],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = StubServer(Handler)
+    server.counter = counter
+    return server
+
+
+class HashEmbeddingFunction:
+    """
+    Cheap Chroma embedding function for benchmarks, so Chroma's default ONNX
+    model does not need to be downloaded and does not dominate the timings.
+    """
+
+    def __init__(self, dim=32):
+        self.dim = dim
+
+    def __call__(self, input):
+        import numpy as np
+        return [np.array(fake_embedding(text, self.dim), dtype=np.float32) for text in input]
+
+
+class BagOfWordsEmbeddingFunction:
+    """
+    Normalized hashed bag-of-words embeddings: texts sharing words are close, so
+    retrieval benchmarks can measure recall without a neural model.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def __call__(self, input):
+        import numpy as np
+        embeddings = []
+        for text in input:
+            vector = np.zeros(self.dim, dtype=np.float32)
+            for word in text.lower().split():
+                vector[zlib.crc32(word.strip(".,()").encode("utf-8")) % self.dim] += 1
+            norm = np.linalg.norm(vector)
+            embeddings.append(vector / norm if norm else vector)
+        return embeddings
+
+
+def chat_server(ttft=0.05, token_delay=0.005, answer_tokens=40, refuse_every=0, n_rewrites=3, split_utf8=False):
+    """
+    Stub for an OpenAI-compatible `/v1/chat/completions` endpoint, e.g. LM Studio.
+
+    Streamed requests get `answer_tokens` words as server-sent events; non-streamed requests
+    (the query rewriting) get a Python list of `n_rewrites` variants of the question.
+
+    Args:
+        ttft (float): Simulated time to the first token in seconds.
+        token_delay (float): Simulated time between tokens in seconds.
+        answer_tokens (int): Number of words of a streamed answer.
+        refuse_every (int): Answer every N-th streamed request with the refusal, so the
+            fallback path is exercised (0 disables it).
+        n_rewrites (int): Number of rewritten questions returned by non-streamed requests.
+        split_utf8 (bool): Send every event containing a multi-byte character in two chunks,
+            cut inside that character, as servers flushing at arbitrary byte offsets do.
+    """
+    from synthetic import WORDS
+
+    counter = {"requests": 0, "streamed": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive and chunked streaming, like real servers: clients read the events as they arrive.
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except ConnectionError:
+                # The client stopped a generation and dropped the connection, e.g. on a refusal.
+                pass
+
+        def send_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def send_json(self, payload):
+            payload = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            question = body["messages"][-1]["content"].split("\n")[0].removeprefix("Question: ")
+            with lock:
+                counter["requests"] += 1
+                if body.get("stream"):
+                    counter["streamed"] += 1
+                refused = body.get("stream") and refuse_every and counter["streamed"] % refuse_every == 0
+            time.sleep(ttft)
+            if not body.get("stream"):
+                rewrites = [f"{question} ({i + 1})" for i in range(n_rewrites)]
+                self.send_json({"choices": [{"index": 0, "message": {"role": "assistant", "content": repr(rewrites)}}]})
+                return
+
+            rng = random.Random(zlib.crc32(question.encode("utf-8")))
+            # Answers start with accented words, sent as raw UTF-8 like real servers do.
+            words = ["Non posso rispondere."] if refused else (["Città", "è", "più"] + rng.choices(WORDS, k=answer_tokens))[:answer_tokens]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(token_delay)
+                delta = {"choices": [{"index": 0, "delta": {"content": f" {word}" if i else word.capitalize()}}]}
+                event = f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode("utf-8")
+                # Cut after the lead byte of the first multi-byte character, if any.
+                cut = next((i + 1 for i, byte in enumerate(event) if byte >= 0xC0), None) if split_utf8 else None
+                if cut:
+                    self.send_chunk(event[:cut])
+                    self.send_chunk(event[cut:])
+                else:
+                    self.send_chunk(event)
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+
+    server = StubServer(Handler)
+    server.counter = counter
+    return server
+
+
+def file_server(directory, bandwidth=0, latency=0.0, ranges=True, drop_every=0):
+    """
+    Static file server for download tests, e.g. a local copy of the dumps.wikimedia.org
+    layout (`<wiki>/<date>/dumpstatus.json` and the dump files).
+
+    Args:
+        directory (str): Directory served.
+        bandwidth (float): Bytes per second per connection, like the per-connection limit
+            of the dump mirrors (0 for unlimited).
+        latency (float): Delay before every response in seconds.
+        ranges (bool): Honour Range requests (single ranges) and advertise Accept-Ranges.
+        drop_every (int): Close every N-th GET response after half of its body, as a dropped
+            connection (0 disables it).
+    """
+    counter = {"requests": 0, "gets": 0, "bytes": 0, "dropped": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except ConnectionError:
+                pass
+
+        def send_file_headers(self):
+            path = os.path.join(directory, self.path.lstrip("/").split("?")[0])
+            with lock:
+                counter["requests"] += 1
+            time.sleep(latency)
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return None
+            size = os.path.getsize(path)
+            start, end = 0, size - 1
+            match = ranges and self.headers.get("Range", "").removeprefix("bytes=").split("-")
+            if match and match[0]:
+                start = int(match[0])
+                end = min(int(match[1]), size - 1) if match[1] else size - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            if ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", f'"{os.stat(path).st_mtime_ns:x}-{size:x}"')
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            return path, start, end
+
+        def do_HEAD(self):
+            self.send_file_headers()
+
+        def do_GET(self):
+            found = self.send_file_headers()
+            if found is None:
+                return
+            path, start, end = found
+            with lock:
+                counter["gets"] += 1
+                drop = drop_every and counter["gets"] % drop_every == 0
+            length = end - start + 1
+            limit = length // 2 if drop else length
+            block_size = 64 * 1024
+            sent = 0
+            began = time.perf_counter()
+            with open(path, "rb") as f:
+                f.seek(start)
+                while sent < limit:
+                    block = f.read(min(block_size, limit - sent))
+                    self.wfile.write(block)
+                    sent += len(block)
+                    if bandwidth:
+                        ahead = sent / bandwidth - (time.perf_counter() - began)
+                        if ahead > 0:
+                            time.sleep(ahead)
+            with lock:
+                counter["bytes"] += sent
+                counter["dropped"] += bool(drop)
+            if drop:
+                self.close_connection = True
+                self.wfile.flush()
+                self.connection.shutdown(2)
+
+    server = StubServer(Handler)
+    server.counter = counter
+    return server
+
+
+class stub_duckduckgo:
+    """
+    Context manager replacing the `duckduckgo_search` package with a local stand-in whose
+    `DDGS().text()` returns synthetic results after `latency` seconds, so the web search of
+    the fallback path (Search.duckduckgo_retrieve) runs without network access.
+    """
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.calls = 0
+
+    def __enter__(self):
+        import sys
+        import types
+
+        stand_in = self
+
+        class DDGS:
+            def text(self, query, max_results=10):
+                stand_in.calls += 1
+                time.sleep(stand_in.latency)
+                return [{"title": f"{query} ({i + 1})", "href": f"https://example.org/{i}",
+                         "body": f"Risultato web {i + 1} per {query}."} for i in range(max_results)]
+
+        module = types.ModuleType("duckduckgo_search")
+        module.DDGS = DDGS
+        self._previous = sys.modules.get("duckduckgo_search")
+        sys.modules["duckduckgo_search"] = module
+        return self
+
+    def __exit__(self, *exc):
+        import sys
+        if self._previous is None:
+            sys.modules.pop("duckduckgo_search", None)
+        else:
+            sys.modules["duckduckgo_search"] = self._previous
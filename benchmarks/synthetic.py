@@ -0,0 +1,141 @@
+"""
+Synthetic Italian corpus used by the benchmarks, shaped like WikiExtractor output.
+"""
+import random
+
+WORDS = (
+    "giochi olimpici atleta medaglia oro argento bronzo gara stadio nazione squadra record "
+    "mondiale storia edizione estate inverno città comitato internazionale cerimonia apertura "
+    "chiusura fiaccola disciplina nuoto atletica ciclismo scherma ginnastica calcio pallavolo "
+    "vittoria finale semifinale qualificazione allenatore federazione campione europeo italiano "
+    "secolo anno durante dopo prima della delle degli nella nel con per tra fra anche come sono "
+    "stato stata furono venne essere viene molto grande primo ultima nuovo antica moderna"
+).split()
+
+TOPICS = (
+    "Atene", "Parigi", "Londra", "Roma", "Tokyo", "Berlino", "Pechino", "Sydney", "Torino",
+    "Cortina", "Monaco", "Barcellona", "Atlanta", "Seul", "Mosca", "Helsinki", "Anversa",
+)
+
+
+def synthetic_article(article_id, rng, min_paragraphs=3, max_paragraphs=12):
+    """Return one article record with the fields produced by WikiExtractor."""
+    topic = rng.choice(TOPICS)
+    year = rng.randint(1896, 2024)
+    title = f"Giochi olimpici di {topic} {year} ({article_id})"
+    paragraphs = []
+    for _ in range(rng.randint(min_paragraphs, max_paragraphs)):
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = rng.choices(WORDS, k=rng.randint(8, 20))
+            sentences.append(" ".join(words).capitalize() + f" {topic} nel {year}.")
+        paragraphs.append(" ".join(sentences))
+    return {
+        "id": str(article_id),
+        "revid": str(article_id * 10),
+        "url": f"https://it.wikipedia.org/wiki?curid={article_id}",
+        "title": title,
+        "text": "\n\n".join(paragraphs),
+    }
+
+
+def synthetic_corpus(n_articles, seed=0, **kwargs):
+    """Yield `n_articles` reproducible synthetic articles."""
+    rng = random.Random(seed)
+    for article_id in range(1, n_articles + 1):
+        yield synthetic_article(article_id, rng, **kwargs)
+
+
+def synthetic_chunked_corpus(n_articles, chunks_per_article=(5, 40), chunk_size=256, seed=0):
+    """Yield articles with a ready-made `chunked_text` list, skipping the text splitter."""
+    rng = random.Random(seed)
+    for article in synthetic_corpus(n_articles, seed=seed):
+        text = article["text"]
+        n_chunks = rng.randint(*chunks_per_article)
+        article["chunked_text"] = [
+            text[(i * chunk_size) % max(1, len(text) - chunk_size):][:chunk_size] for i in range(n_chunks)
+        ]
+        yield article
+
+
+SITEINFO = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" version="0.11" xml:lang="it">
+  <siteinfo>
+    <sitename>Wikipedia</sitename>
+    <dbname>itwiki</dbname>
+    <base>https://it.wikipedia.org/wiki/Pagina_principale</base>
+    <namespaces>
+      <namespace key="0" case="first-letter" />
+      <namespace key="10" case="first-letter">Template</namespace>
+    </namespaces>
+  </siteinfo>
+"""
+
+
+def synthetic_wikitext(article, rng):
+    """Turn the paragraphs of a synthetic article into wikitext with links, templates, references and sections."""
+    paragraphs = article["text"].split("\n\n")
+    lines = ["{{Infobox evento|nome=%s}}" % article["title"]]
+    for i, paragraph in enumerate(paragraphs):
+        if i and i % 3 == 0:
+            lines.append(f"== Sezione {i // 3} ==")
+        words = paragraph.split(" ")
+        for _ in range(3):
+            j = rng.randrange(len(words))
+            words[j] = rng.choice([f"[[{words[j]}]]", f"[[{words[j].capitalize()}|{words[j]}]]", f"'''{words[j]}'''"])
+        lines.append(" ".join(words) + "<ref>{{cita web|url=https://example.org|titolo=Fonte}}</ref>")
+    return "\n\n".join(lines)
+
+
+def _page_xml(page_id, title, text, redirect=None):
+    escape = lambda s: s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+    return (f"  <page>\n    <title>{escape(title)}</title>\n    <ns>{10 if title.startswith('Template:') else 0}</ns>\n"
+            f"    <id>{page_id}</id>\n" + (f'    <redirect title="{escape(redirect)}" />\n' if redirect else "") +
+            f"    <revision>\n      <id>{page_id * 10}</id>\n"
+            f'      <text bytes="{len(text)}" xml:space="preserve">{escape(text)}</text>\n'
+            f"    </revision>\n  </page>\n")
+
+
+def write_synthetic_dump(path, n_articles, index_path=None, pages_per_stream=100, multistream=True, seed=0):
+    """
+    Write a bz2 Wikipedia XML dump of `n_articles` synthetic articles (plus a redirect and a
+    template every 50 pages, which readers must skip), optionally as a multistream dump:
+    the header and every `pages_per_stream` pages in their own bz2 stream, with the
+    "offset:page_id:title" index written to `index_path`.
+
+    Returns:
+        list[str]: IDs of the articles a reader should return, in order.
+    """
+    import bz2
+    rng = random.Random(seed)
+    pages, expected = [], []
+    for article in synthetic_corpus(n_articles, seed=seed):
+        page_id = int(article["id"])
+        pages.append((page_id, article["title"], _page_xml(page_id, article["title"], synthetic_wikitext(article, rng))))
+        expected.append(article["id"])
+        if page_id % 50 == 0:
+            pages.append((page_id + 1_000_000, f"Olimpiadi {page_id}",
+                          _page_xml(page_id + 1_000_000, f"Olimpiadi {page_id}", f"#RINVIA [[{article['title']}]]",
+                                    redirect=article["title"])))
+            pages.append((page_id + 2_000_000, f"Template:Olimpiadi {page_id}",
+                          _page_xml(page_id + 2_000_000, f"Template:Olimpiadi {page_id}", "{{{1}}} olimpiadi")))
+
+    if not multistream:
+        with bz2.open(path, "wt", encoding="utf-8") as f:
+            f.write(SITEINFO)
+            f.writelines(xml for _, _, xml in pages)
+            f.write("</mediawiki>\n")
+        return expected
+
+    index = []
+    with open(path, "wb") as f:
+        f.write(bz2.compress(SITEINFO.encode("utf-8")))
+        for start in range(0, len(pages), pages_per_stream):
+            offset = f.tell()
+            stream = pages[start:start + pages_per_stream]
+            index.extend(f"{offset}:{page_id}:{title}\n" for page_id, title, _ in stream)
+            f.write(bz2.compress("".join(xml for _, _, xml in stream).encode("utf-8")))
+        f.write(bz2.compress(b"</mediawiki>\n"))
+    if index_path:
+        with bz2.open(index_path, "wt", encoding="utf-8") as f:
+            f.writelines(index)
+    return expected
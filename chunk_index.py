@@ -0,0 +1,76 @@
+import sqlite3
+
+
+def chunk_id(article_id, offset):
+    """Return the deterministic ID of the chunk at `offset` in an article."""
+    return f"{article_id}-{offset}"
+
+
+def article_chunk_ids(article_id, n_chunks):
+    """Return the IDs of all chunks of an article, in order."""
+    return [chunk_id(article_id, offset) for offset in range(n_chunks)]
+
+
+def parse_chunk_id(value):
+    """Split a chunk ID into (article_id, offset)."""
+    article_id, _, offset = value.rpartition('-')
+    return article_id, int(offset)
+
+
+class ChunkIndex:
+    """
+    Compact SQLite index from article IDs to their chunk ranges.
+    Since chunk IDs are derived from the article ID and the chunk offset, one
+    (article_id, n_chunks) row per article is enough to expand a title hit into
+    its chunks with a single primary-key lookup.
+    """
+    def __init__(self, path):
+        """
+        Open (or create) the index.
+
+        Args:
+            path (str): Path of the SQLite index file.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_ranges (article_id TEXT PRIMARY KEY, n_chunks INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def put(self, ranges):
+        """
+        Insert or replace article chunk ranges.
+
+        Args:
+            ranges (iterable): (article_id, n_chunks) pairs.
+        """
+        self.conn.executemany("INSERT OR REPLACE INTO chunk_ranges (article_id, n_chunks) VALUES (?, ?)",
+                              [(str(article_id), n_chunks) for article_id, n_chunks in ranges])
+        self.conn.commit()
+
+    def clear(self):
+        """Remove all ranges, e.g. after the collections were reset."""
+        self.conn.execute("DELETE FROM chunk_ranges")
+        self.conn.commit()
+
+    def remove(self, article_ids):
+        """Remove the ranges of deleted articles."""
+        self.conn.executemany("DELETE FROM chunk_ranges WHERE article_id = ?", [(str(a),) for a in article_ids])
+        self.conn.commit()
+
+    def n_chunks(self, article_id):
+        """Return the number of chunks of an article (0 if it is unknown)."""
+        row = self.conn.execute("SELECT n_chunks FROM chunk_ranges WHERE article_id = ?", (str(article_id),)).fetchone()
+        return row[0] if row else 0
+
+    def chunk_ids(self, article_id):
+        """Return the chunk IDs of an article."""
+        return article_chunk_ids(article_id, self.n_chunks(article_id))
+
+    def expand(self, article_ids):
+        """Return the chunk IDs of several articles, grouped by article in the given order."""
+        return [chunk for article_id in article_ids for chunk in self.chunk_ids(article_id)]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,257 @@
+import argparse
+import ast
+import os
+import shutil
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Columns of the chunk store. 'chunk_start' is the position of an article's first chunk in
+# the store-wide chunk sequence; its chunks are `<id>-<offset>` for offset < n_chunks.
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("revid", pa.string()),
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("text", pa.string()),
+    ("content_hash", pa.string()),
+    ("chunked_text", pa.list_(pa.string())),
+    ("n_chunks", pa.int32()),
+    ("chunk_start", pa.int64()),
+])
+
+
+class ChunkStore:
+    """
+    Columnar store of chunked articles: a directory of Parquet files (`part-00000.parquet`,
+    ...) with list-typed chunk columns, written in row groups.
+
+    Files are memory-mapped when read and only the requested columns are decoded, so e.g.
+    the titles or the chunks can be streamed row group by row group without loading the
+    article texts or the whole corpus.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Directory of the store.
+        """
+        self.path = path
+
+    def exists(self):
+        return bool(self.files())
+
+    def files(self):
+        """Return the paths of the Parquet files, in article order."""
+        if not os.path.isdir(self.path):
+            return []
+        return [os.path.join(self.path, name) for name in sorted(os.listdir(self.path))
+                if name.startswith("part-") and name.endswith(".parquet")]
+
+    def __len__(self):
+        """Number of articles, from the file footers."""
+        return sum(pq.ParquetFile(path, memory_map=True).metadata.num_rows for path in self.files())
+
+    def n_chunks(self):
+        """Number of chunks, from the 'n_chunks' column only."""
+        return sum(pc.sum(batch.column(0)).as_py() or 0 for batch in self.iter_batches(columns=["n_chunks"]))
+
+    def writer(self, rows_per_file=100_000, row_group_size=1000):
+        """Return a ChunkStoreWriter replacing the store's content when it is closed."""
+        return ChunkStoreWriter(self.path, rows_per_file=rows_per_file, row_group_size=row_group_size)
+
+    def write(self, articles, rows_per_file=100_000, row_group_size=1000):
+        """
+        Replace the store's content with `articles`: a DataFrame, or an iterable of article
+        dicts or of windows (lists) of article dicts, e.g. iter_chunked_windows().
+
+        Returns:
+            int: Number of articles written.
+        """
+        with self.writer(rows_per_file=rows_per_file, row_group_size=row_group_size) as writer:
+            if hasattr(articles, "to_dict"):
+                writer.write(articles.to_dict("records"))
+            else:
+                window = []
+                for item in articles:
+                    if isinstance(item, list):
+                        writer.write(item)
+                        continue
+                    window.append(item)
+                    if len(window) >= row_group_size:
+                        writer.write(window)
+                        window = []
+                writer.write(window)
+        return writer.n_rows
+
+    def iter_batches(self, columns=None, batch_size=1000):
+        """
+        Yield the articles as Arrow record batches of up to `batch_size` rows, reading only
+        `columns` (default all) from the memory-mapped files.
+        """
+        for path in self.files():
+            yield from pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_size, columns=columns)
+
+    def iter_windows(self, window_size=1000, columns=None):
+        """Yield windows (lists) of article dicts, e.g. for VectorStore.ingest_stream."""
+        for batch in self.iter_batches(columns=columns, batch_size=window_size):
+            yield batch.to_pylist()
+
+    def iter_chunks(self, batch_size=1000):
+        """Yield (article id, offset, chunk text) for every chunk, reading only those two columns."""
+        for batch in self.iter_batches(columns=["id", "chunked_text"], batch_size=batch_size):
+            for article_id, chunks in zip(batch.column(0).to_pylist(), batch.column(1).to_pylist()):
+                for offset, chunk in enumerate(chunks or ()):
+                    yield article_id, offset, chunk
+
+    def read_table(self, columns=None):
+        """Read `columns` (default all) of the whole store as one Arrow table."""
+        files = self.files()
+        if not files:
+            return SCHEMA.empty_table().select(columns) if columns else SCHEMA.empty_table()
+        return pa.concat_tables(pq.read_table(path, columns=columns, memory_map=True) for path in files)
+
+    def read(self, columns=None):
+        """Read `columns` (default all) of the whole store as a DataFrame (chunk lists as arrays)."""
+        return self.read_table(columns).to_pandas()
+
+
+class ChunkStoreWriter:
+    """
+    Writes chunked articles into a ChunkStore: `rows_per_file` articles per Parquet file,
+    `row_group_size` articles per row group. Files are written to `<path>.tmp` and swapped in
+    when the writer is closed, so readers never see a partial store.
+    """
+
+    def __init__(self, path, rows_per_file=100_000, row_group_size=1000):
+        self.path = path
+        self.rows_per_file = rows_per_file
+        self.row_group_size = row_group_size
+        self.tmp_path = f"{path}.tmp"
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self.n_rows = 0
+        self.n_chunks = 0
+        self._file = None
+        self._file_rows = 0
+        self._n_files = 0
+
+    def write(self, articles):
+        """Append a list of article dicts ('id', 'title', 'chunked_text', ...; other keys are dropped)."""
+        if not articles:
+            return
+        columns = {name: [] for name in SCHEMA.names}
+        for article in articles:
+            chunks = article.get("chunked_text")
+            # Missing values of DataFrame records are NaN.
+            chunks = None if chunks is None or isinstance(chunks, float) else [str(chunk) for chunk in chunks]
+            for name in ("id", "revid", "url", "title", "text", "content_hash"):
+                columns[name].append(_string(article.get(name)))
+            columns["chunked_text"].append(chunks)
+            columns["n_chunks"].append(len(chunks) if chunks else 0)
+            columns["chunk_start"].append(self.n_chunks)
+            self.n_chunks += len(chunks) if chunks else 0
+        table = pa.table(columns, schema=SCHEMA)
+
+        start = 0
+        while start < len(table):
+            if self._file is None or self._file_rows >= self.rows_per_file:
+                self._open_next_file()
+            n = min(len(table) - start, self.rows_per_file - self._file_rows)
+            self._file.write_table(table.slice(start, n), row_group_size=self.row_group_size)
+            self._file_rows += n
+            self.n_rows += n
+            start += n
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.tmp_path, f"part-{self._n_files:05d}.parquet")
+        self._file = pq.ParquetWriter(path, SCHEMA, compression="zstd")
+        self._file_rows = 0
+        self._n_files += 1
+
+    def close(self):
+        """Finish the last file and replace the store's previous content with the new files."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        # Readers of the previous files keep their memory maps of the unlinked files.
+        old_path = f"{self.path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def abort(self):
+        """Drop the files written so far and keep the store's previous content."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _string(value):
+    """Values as strings, NaN as missing; pandas turns integer IDs with missing values into floats."""
+    if value is None or value != value:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def convert_csv(csv_path, store_path, chunksize=10_000):
+    """
+    Convert a CSV written by the previous chunk_dataframe_text (chunk lists stored as their
+    Python repr) into a ChunkStore, reading the CSV in chunks.
+
+    Returns:
+        int: Number of articles converted.
+    """
+    import pandas as pd
+
+    def windows():
+        for df in pd.read_csv(csv_path, chunksize=chunksize):
+            df = df.drop(columns=[column for column in df.columns if column.startswith("Unnamed:")])
+            df["chunked_text"] = [ast.literal_eval(value) if isinstance(value, str) else [] for value in df["chunked_text"]]
+            yield df.to_dict("records")
+
+    return ChunkStore(store_path).write(windows())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a chunk store or convert a Wikipedia.csv into one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info = subparsers.add_parser("info", help="Show the files, row groups and sizes of a store.")
+    info.add_argument("store", nargs="?", default="Data/chunk_store")
+    convert = subparsers.add_parser("convert", help="Convert a CSV written by chunk_dataframe_text.")
+    convert.add_argument("csv", nargs="?", default="Data/Wikipedia.csv")
+    convert.add_argument("store", nargs="?", default="Data/chunk_store")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        start = time.perf_counter()
+        n = convert_csv(args.csv, args.store)
+        print(f"Converted {n} articles from {args.csv} to {args.store} in {time.perf_counter() - start:.1f}s.")
+        return
+    store = ChunkStore(args.store)
+    for path in store.files():
+        metadata = pq.ParquetFile(path, memory_map=True).metadata
+        print(f"{os.path.basename(path)}: {metadata.num_rows} articles, {metadata.num_row_groups} row groups, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
+    print(f"{len(store)} articles, {store.n_chunks()} chunks.")
+
+
+if __name__ == "__main__":
+    main()
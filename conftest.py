@@ -0,0 +1,32 @@
+import os
+import sys
+import zlib
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb import EmbeddingFunction
+
+# The local service stubs and the synthetic corpus of the benchmarks.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+
+class HashEmbedding(EmbeddingFunction):
+    """Deterministic 8-dimensional embeddings derived from the text checksum, so tests need no model."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.random.default_rng(zlib.crc32(text.encode("utf-8"))).uniform(-1, 1, 8).astype(np.float32)
+                for text in input]
+
+
+@pytest.fixture
+def embedding_function():
+    return HashEmbedding()
+
+
+@pytest.fixture
+def chroma_client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
@@ -0,0 +1,173 @@
+import math
+from functools import lru_cache
+from chunk_index import parse_chunk_id
+
+
+class _ApproximateEncoding:
+    """Fallback token counter when tiktoken is not installed: about 4 characters per token."""
+    chars_per_token = 4
+
+    def encode(self, text):
+        return range(math.ceil(len(text) / self.chars_per_token))
+
+    def decode_prefix(self, text, n_tokens):
+        return text[:n_tokens * self.chars_per_token]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name="cl100k_base"):
+    """
+    Return the (cached) tokenizer used to count prompt tokens. tiktoken is imported here,
+    on first use, and the tokenizer is loaded once per process.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return _ApproximateEncoding()
+    return tiktoken.get_encoding(name)
+
+
+def merge_overlapping(first, second, min_overlap=20):
+    """
+    Merge two consecutive chunks of an article on their overlapping text.
+
+    Returns:
+        str or None: The merged text, or None if the chunks do not overlap by at least `min_overlap` characters.
+    """
+    if second in first:
+        return first
+    # The longest suffix of `first` that is a prefix of `second`; chunks overlap by less than their size.
+    tail = first[-len(second):]
+    for start in range(len(tail) - min_overlap + 1):
+        if second.startswith(tail[start:]):
+            return first + second[len(tail) - start:]
+    return None
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context within a token budget.
+    Overlapping chunks of the same article are merged into one passage, chunks already
+    contained in a passage are dropped, and passages are added by relevance until the
+    model's context window (minus the prompt, the question and the answer) is full.
+    """
+    def __init__(self, max_context_tokens=4096, reserve_tokens=1024, encoding="cl100k_base",
+                 separator="\n\n", min_passage_tokens=32):
+        """
+        Args:
+            max_context_tokens (int): Context window of the model.
+            reserve_tokens (int): Tokens kept free for the answer.
+            encoding (str): tiktoken encoding used to count tokens.
+            separator (str): Text placed between passages.
+            min_passage_tokens (int): Smallest remainder of the budget worth filling with a truncated passage.
+        """
+        self.max_context_tokens = max_context_tokens
+        self.reserve_tokens = reserve_tokens
+        self.encoding = get_encoding(encoding)
+        self.separator = separator
+        self.min_passage_tokens = min_passage_tokens
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text)) if text else 0
+
+    def _truncate(self, text, n_tokens):
+        if isinstance(self.encoding, _ApproximateEncoding):
+            return self.encoding.decode_prefix(text, n_tokens)
+        return self.encoding.decode(self.encoding.encode(text)[:n_tokens])
+
+    def budget(self, question="", prompt="", preamble=""):
+        """Return the number of tokens left for passages once the fixed parts of the prompt are counted."""
+        fixed = self.count_tokens(question) + self.count_tokens(prompt) + self.count_tokens(preamble)
+        return max(0, self.max_context_tokens - self.reserve_tokens - fixed)
+
+    def passages(self, ids, documents):
+        """
+        Group chunks into passages, ordered by the rank of their best chunk.
+
+        Chunks of the same article are sorted by offset and merged where they overlap;
+        chunks whose IDs are not "<article_id>-<offset>" stay separate passages.
+
+        Args:
+            ids (list[str]): Chunk IDs, ranked best first.
+            documents (list[str]): Chunk texts, in the same order.
+
+        Returns:
+            list[dict]: Passages with 'text', 'ids' and 'rank' (rank of the best chunk).
+        """
+        articles = {}
+        for rank, (doc_id, text) in enumerate(zip(ids, documents)):
+            try:
+                article_id, offset = parse_chunk_id(doc_id)
+            except ValueError:
+                article_id, offset = doc_id, 0
+            chunks = articles.setdefault(article_id, {})
+            if offset not in chunks:
+                chunks[offset] = (rank, doc_id, text)
+
+        passages = []
+        for chunks in articles.values():
+            current = None
+            for offset in sorted(chunks):
+                rank, doc_id, text = chunks[offset]
+                merged = merge_overlapping(current["text"], text) if current else None
+                if merged is None:
+                    current = {"text": text, "ids": [doc_id], "rank": rank}
+                    passages.append(current)
+                else:
+                    current["text"] = merged
+                    current["ids"].append(doc_id)
+                    current["rank"] = min(current["rank"], rank)
+
+        # Drop exact duplicates (e.g. the same text in two articles), keeping the better ranked one.
+        passages.sort(key=lambda passage: passage["rank"])
+        seen = set()
+        unique = []
+        for passage in passages:
+            if passage["text"] not in seen:
+                seen.add(passage["text"])
+                unique.append(passage)
+        return unique
+
+    def build(self, ids, documents, question="", prompt="", preamble=""):
+        """
+        Build the context for a question from ranked chunks.
+
+        Args:
+            ids (list[str]): Chunk IDs, ranked best first.
+            documents (list[str]): Chunk texts, in the same order.
+            question (str): The question, counted against the budget.
+            prompt (str): The system prompt, counted against the budget.
+            preamble (str): Text always placed before the passages, e.g. web search results.
+
+        Returns:
+            dict: 'context' (preamble, then the passages with the most relevant last, closest
+            to the question), 'passages' (texts, best first), 'ids' (chunk IDs of each passage)
+            and 'tokens' (tokens of the context).
+        """
+        budget = self.budget(question, prompt, preamble)
+        separator_tokens = self.count_tokens(self.separator)
+        selected = []
+        used = 0
+        for passage in self.passages(ids, documents):
+            tokens = self.count_tokens(passage["text"]) + (separator_tokens if selected else 0)
+            if used + tokens <= budget:
+                selected.append(passage)
+                used += tokens
+            elif budget - used >= self.min_passage_tokens:
+                # Fill the rest of the budget with the start of the next passage.
+                truncated = self._truncate(passage["text"], budget - used - separator_tokens)
+                selected.append({**passage, "text": truncated})
+                break
+            else:
+                break
+
+        texts = [passage["text"] for passage in selected]
+        context = self.separator.join(texts[::-1])
+        if preamble:
+            context = preamble + self.separator + context if context else preamble
+        return {
+            "context": context,
+            "passages": texts,
+            "ids": [passage["ids"] for passage in selected],
+            "tokens": self.count_tokens(context),
+        }
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+DUMPS_URL = "https://dumps.wikimedia.org/"
+
+
+class Downloader:
+    """
+    Resumable, parallel HTTP downloader for large files such as Wikipedia dumps.
+
+    The file is split into parts fetched with Range requests over several pooled
+    connections and written in place into `<path>.part`. The parts (and the bytes written
+    within each part) are recorded in `<path>.part.json`, so an interrupted download
+    resumes where it stopped, within the run (retries) and across runs. Once complete, the
+    file can be verified against a published checksum before it is moved to `path`.
+    Servers without Range support get a single streamed download.
+    """
+    RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self, connections=2, part_size=32 * 1024 * 1024, buffer_size=1024 * 1024, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, connect_timeout=10, timeout=60, progress=True):
+        """
+        Args:
+            connections (int): Concurrent connections (Wikimedia allows 2 per client for dumps).
+            part_size (int): Bytes per Range request.
+            buffer_size (int): Bytes read from the socket and written to disk at a time.
+            max_retries (int): Retries per part on connection errors, timeouts and retryable status codes.
+            backoff_base (float): Initial backoff delay in seconds, doubled on every retry.
+            backoff_max (float): Upper bound for a single backoff delay in seconds.
+            connect_timeout (float): Timeout in seconds for opening a connection.
+            timeout (float): Timeout in seconds between two reads.
+            progress (bool): Show a progress bar.
+        """
+        self.connections = connections
+        self.part_size = part_size
+        self.buffer_size = buffer_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.progress = progress
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring a Retry-After header when present."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(self, method, url, headers=None, stream=False):
+        """Send a request, retrying connection errors, timeouts and retryable status codes."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.request(method, url, headers=headers, stream=stream,
+                                                timeout=(self.connect_timeout, self.timeout))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                error = f"{response.status_code} - {response.reason}"
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Failed to download {url} after {self.max_retries} retries: {error}")
+            time.sleep(self._backoff_delay(attempt, retry_after))
+
+    def probe(self, url):
+        """
+        Return the size of the remote file (None if unknown), a validator identifying its
+        version (ETag or Last-Modified) and whether the server accepts Range requests.
+        """
+        response = self._request("HEAD", url)
+        size = response.headers.get("Content-Length")
+        ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        return (int(size) if size is not None else None), validator, ranges
+
+    def download(self, url, path, sha1=None, md5=None):
+        """
+        Download `url` to `path`, resuming a previous partial download of the same file version.
+
+        Args:
+            url (str): URL of the file.
+            path (str): Destination path.
+            sha1 (str, optional): Expected SHA-1 hex digest of the file.
+            md5 (str, optional): Expected MD5 hex digest of the file (used without sha1).
+
+        Returns:
+            str: `path`.
+
+        Raises:
+            ValueError: If the downloaded file does not match the checksum (the partial file
+                is removed, so the next call downloads it again).
+            RuntimeError: If a request still fails after all retries (the progress is kept).
+        """
+        if os.path.exists(path):
+            print(f"Dump file already exists at {path}.")
+            return path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path, state_path = f"{path}.part", f"{path}.part.json"
+        print(f"Downloading {url}...")
+        size, validator, ranges = self.probe(url)
+        start = time.perf_counter()
+        if ranges and size:
+            self._download_ranges(url, part_path, state_path, size, validator)
+        else:
+            print(f"{url} does not support Range requests, downloading it in one stream.")
+            self._download_stream(url, part_path)
+        elapsed = time.perf_counter() - start
+        downloaded = os.path.getsize(part_path)
+        print(f"Downloaded {path}: {downloaded / 1e6:.1f} MB in {elapsed:.1f}s ({downloaded / 1e6 / max(elapsed, 1e-9):.1f} MB/s).")
+
+        if sha1 or md5:
+            algorithm, expected = ("sha1", sha1) if sha1 else ("md5", md5)
+            actual = file_digest(part_path, algorithm, self.buffer_size)
+            if actual != expected.lower():
+                os.remove(part_path)
+                if os.path.exists(state_path):
+                    os.remove(state_path)
+                raise ValueError(f"{algorithm} mismatch for {url}: expected {expected}, got {actual}")
+        os.replace(part_path, path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return path
+
+    def _load_state(self, state_path, url, size, validator):
+        """Return the progress of a previous download of the same file version, or a new one."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            # Matched on the file version, not the URL, so a download can resume from another mirror.
+            if (state["size"], state["validator"], state["part_size"]) == (size, validator, self.part_size):
+                return state
+            print(f"{url} changed since the partial download, starting over.")
+        except (OSError, ValueError, KeyError):
+            pass
+        n_parts = -(-size // self.part_size)
+        return {"url": url, "size": size, "validator": validator, "part_size": self.part_size, "done": [0] * n_parts}
+
+    def _save_state(self, state, state_path):
+        with self._lock:
+            tmp_path = f"{state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+
+    def _download_ranges(self, url, part_path, state_path, size, validator):
+        state = self._load_state(state_path, url, size, validator)
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            # Preallocated, so parts can be written at their offsets in any order.
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            state["done"] = [0] * len(state["done"])
+        self._save_state(state, state_path)
+
+        done = sum(state["done"])
+        if done:
+            print(f"Resuming {url} at {100 * done / size:.0f}%.")
+        bar = tqdm(total=size, initial=done, unit="B", unit_scale=True, desc=os.path.basename(part_path),
+                   disable=not self.progress)
+        pending = [i for i, n in enumerate(state["done"]) if n < self._part_length(i, size)]
+        try:
+            with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                futures = [pool.submit(self._download_part, url, part_path, state, state_path, i, bar) for i in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # Stop at the parts in flight; the next call resumes from the saved state.
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            bar.close()
+            self._save_state(state, state_path)
+
+    def _part_length(self, index, size):
+        return min(self.part_size, size - index * self.part_size)
+
+    def _download_part(self, url, part_path, state, state_path, index, bar):
+        """Fetch one part, continuing from its last written byte after a dropped connection."""
+        first = index * self.part_size
+        last = first + self._part_length(index, state["size"]) - 1
+        with open(part_path, "r+b") as f:
+            for attempt in range(self.max_retries + 1):
+                position = first + state["done"][index]
+                if position > last:
+                    return
+                response = self._request("GET", url, headers={"Range": f"bytes={position}-{last}"}, stream=True)
+                try:
+                    if response.status_code != 206:
+                        raise RuntimeError(f"{url} ignored the Range request (status {response.status_code})")
+                    f.seek(position)
+                    for block in response.iter_content(chunk_size=self.buffer_size):
+                        f.write(block)
+                        state["done"][index] += len(block)
+                        bar.update(len(block))
+                    f.flush()
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    # Keep what was written and ask for the rest of the part.
+                    f.flush()
+                    self._save_state(state, state_path)
+                    if attempt == self.max_retries:
+                        raise RuntimeError(f"Failed to download {url} after {self.max_retries} retries: {e}")
+                    time.sleep(self._backoff_delay(attempt))
+                    continue
+                finally:
+                    response.close()
+                self._save_state(state, state_path)
+                if first + state["done"][index] > last:
+                    return
+            raise RuntimeError(f"Failed to download bytes {first}-{last} of {url} after {self.max_retries} retries")
+
+    def _download_stream(self, url, part_path):
+        response = self._request("GET", url, stream=True)
+        with response, open(part_path, "wb") as f:
+            for block in response.iter_content(chunk_size=self.buffer_size):
+                f.write(block)
+
+    def close(self):
+        self.session.close()
+
+
+def file_digest(path, algorithm="sha1", buffer_size=1024 * 1024):
+    """Return the hex digest of a file, read in blocks of `buffer_size` bytes."""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(buffer_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dump_status(wiki, date, base_url=DUMPS_URL):
+    """Return the dumpstatus.json of a Wikimedia dump run (files, sizes, checksums per job)."""
+    response = requests.get(urljoin(base_url, f"{wiki}/{date}/dumpstatus.json"), timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+def latest_dump_date(wiki, base_url=DUMPS_URL):
+    """Return the date (YYYYMMDD) of the latest complete articles dump of a wiki."""
+    response = requests.get(urljoin(base_url, f"{wiki}/latest/{wiki}-latest-pages-articles-multistream.xml.bz2-rss.txt"),
+                            timeout=60)
+    response.raise_for_status()
+    match = re.search(rf"{re.escape(wiki)}/(\d{{8}})", response.text)
+    if match is None:
+        raise RuntimeError(f"Cannot find the date of the latest {wiki} dump")
+    return match.group(1)
+
+
+def dump_files(wiki, date, job="articlesmultistreamdump", base_url=DUMPS_URL):
+    """
+    List the files of a dump job, e.g. the multi-part `pages-articles-multistreamN` series
+    and their indexes, with their URL, size and published checksums.
+
+    Returns:
+        list[dict]: 'name', 'url', 'size', 'sha1' and 'md5' of each file, with numbered
+        parts in part order.
+    """
+    files = dump_status(wiki, date, base_url)["jobs"][job]["files"]
+    entries = [{"name": name, "url": urljoin(base_url, info["url"]), "size": info.get("size"),
+                "sha1": info.get("sha1"), "md5": info.get("md5")} for name, info in files.items()]
+    return sorted(entries, key=lambda entry: (part_number(entry["name"]) or 0, entry["name"]))
+
+
+def dump_series(wiki, date="latest", parts=None, base_url=DUMPS_URL):
+    """
+    Return the (dump file, index file) entries (see dump_files) of a multistream dump: one
+    pair per `pages-articles-multistreamN` part, or the combined dump if the wiki is not
+    split into parts.
+
+    Args:
+        wiki (str): Wiki name, e.g. "itwiki".
+        date (str): Dump date (YYYYMMDD), or "latest" for the latest complete dump.
+        parts (Iterable[int], optional): Part numbers to keep (default all).
+
+    Raises:
+        ValueError: If some of `parts` are not parts of the dump.
+    """
+    if date == "latest":
+        date = latest_dump_date(wiki, base_url)
+    files = dump_files(wiki, date, base_url=base_url)
+    dumps = {part_number(f["name"]): f for f in files if "-index" not in f["name"]}
+    indexes = {part_number(f["name"]): f for f in files if "-index" in f["name"]}
+    numbers = sorted(n for n in dumps if n is not None) or [None]
+    if parts is not None and numbers != [None]:
+        parts = set(parts)
+        unknown = sorted(parts - set(numbers))
+        if unknown:
+            raise ValueError(f"{wiki} ({date}) has no dump parts {unknown}, only {numbers}")
+        numbers = [n for n in numbers if n in parts]
+    return [(dumps[n], indexes.get(n)) for n in numbers]
+
+
+def part_number(name):
+    """Return N of a `...pages-articlesN.xml...` or `...-indexN.txt...` part, or None for a combined file."""
+    match = re.search(r"(?:articles|multistream|index)(\d+)\.(?:xml|txt)", name)
+    return int(match.group(1)) if match else None
+
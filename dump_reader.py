@@ -0,0 +1,214 @@
+import bz2
+import os
+import re
+from io import StringIO, TextIOWrapper
+
+# Line-oriented tag pattern of WikiExtractor's page splitter, so pages are cut the same way.
+tagRE = re.compile(r'(.*?)<(/?\w+)[^>]*>(?:([^<]*)(<.*?>)?)?')
+# Start of a bz2 stream: "BZh" + block size digit + the magic of its first block.
+STREAM_START = re.compile(rb'BZh[1-9]1AY&SY')
+# Namespace prefixes kept by WikiExtractor besides the main namespace.
+ACCEPTED_NAMESPACES = ('w', 'wiktionary', 'wikt')
+
+
+def read_index_offsets(index_path):
+    """
+    Return the sorted byte offsets of the bz2 streams of a multistream dump, from its index
+    (`<name>-multistream-index.txt.bz2`, one "offset:page_id:title" line per page).
+    """
+    offsets = set()
+    with bz2.open(index_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            offset, _, _ = line.partition(':')
+            if offset:
+                offsets.add(int(offset))
+    return sorted(offsets)
+
+
+def scan_stream_offsets(dump_path, block_size=16 * 1024 * 1024):
+    """
+    Return the byte offsets at which bz2 streams start, by scanning the file for stream
+    headers. A multistream dump without its index yields all its streams; a dump written
+    as a single stream yields [0].
+    """
+    offsets = []
+    with open(dump_path, 'rb') as f:
+        position = 0
+        # The last 9 bytes are carried over to the next block, so a (10-byte) header across a
+        # block boundary is found, and found once.
+        tail = b''
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            data = tail + block
+            base = position - len(tail)
+            offsets.extend(base + m.start() for m in STREAM_START.finditer(data))
+            tail = data[-9:]
+            position += len(block)
+    return offsets
+
+
+def stream_ranges(offsets, size, batch_bytes=4 * 1024 * 1024):
+    """
+    Split a dump into (start, end) byte ranges of whole bz2 streams, merged up to about
+    `batch_bytes` of compressed data each, so every range can be decompressed on its own.
+
+    Args:
+        offsets (list[int]): Start offsets of the streams (read_index_offsets or scan_stream_offsets).
+        size (int): Size of the dump file.
+        batch_bytes (int): Target size of a range.
+
+    Returns:
+        list[tuple[int, int]]: The ranges in file order.
+    """
+    if not offsets or offsets[0] != 0:
+        offsets = [0] + offsets
+    ranges = []
+    start = 0
+    for offset in offsets[1:] + [size]:
+        if offset - start >= batch_bytes or offset == size:
+            ranges.append((start, offset))
+            start = offset
+    return ranges
+
+
+def read_siteinfo(dump_path):
+    """
+    Read the <siteinfo> header of a dump.
+
+    Returns:
+        dict: 'urlbase' (for the article URLs) and 'template_namespace' (e.g. "Template").
+    """
+    siteinfo = {"urlbase": "", "template_namespace": ""}
+    with TextIOWrapper(bz2.open(dump_path, 'rb'), encoding='utf-8') as f:
+        for line in f:
+            m = tagRE.search(line)
+            if not m:
+                continue
+            tag = m.group(2)
+            if tag == 'base':
+                siteinfo["urlbase"] = m.group(3)[:m.group(3).rfind("/")]
+            elif tag == 'namespace' and 'key="10"' in line:
+                siteinfo["template_namespace"] = m.group(3)
+            elif tag in ('/siteinfo', 'page'):
+                break
+    return siteinfo
+
+
+def iter_pages(lines, template_namespace=""):
+    """
+    Yield the (id, revid, title, text lines) of the articles in dump XML lines, with the
+    rules of WikiExtractor: redirects, templates and pages outside the main namespace
+    are skipped.
+    """
+    page = []
+    id = revid = title = ''
+    in_text = False
+    redirect = False
+    for line in lines:
+        if '<' not in line:
+            if in_text:
+                page.append(line)
+            continue
+        m = tagRE.search(line)
+        if not m:
+            continue
+        tag = m.group(2)
+        if tag == 'page':
+            page = []
+            redirect = False
+        elif tag == 'id' and not id:
+            id = m.group(3)
+        elif tag == 'id' and id:
+            revid = m.group(3)
+        elif tag == 'title':
+            title = m.group(3)
+        elif tag == 'redirect':
+            redirect = True
+        elif tag == 'text':
+            in_text = True
+            page.append(line[m.start(3):m.end(3)])
+            if m.lastindex == 4:
+                in_text = False
+        elif tag == '/text':
+            if m.group(1):
+                page.append(m.group(1))
+            in_text = False
+        elif in_text:
+            page.append(line)
+        elif tag == '/page':
+            colon = title.find(':')
+            if ((colon < 0 or title[:colon] in ACCEPTED_NAMESPACES) and not redirect
+                    and not (template_namespace and title.startswith(template_namespace + ':'))):
+                yield id, revid, title, page
+            id = revid = ''
+            page = []
+
+
+def extract_pages(pages, urlbase="", html_safe=True):
+    """
+    Clean the wikitext of raw pages into article records, like `WikiExtractor --json
+    --no-templates`: 'id', 'revid', 'url', 'title' and 'text'.
+    """
+    # Imported here, in the worker processes that clean the text.
+    from wikiextractor.extract import Extractor, get_url
+    articles = []
+    for id, revid, title, page in pages:
+        extractor = Extractor(id, revid, urlbase, title, page)
+        paragraphs = extractor.clean_text(''.join(page), html_safe=html_safe)
+        articles.append({"id": id, "revid": revid, "url": get_url(urlbase, id), "title": title,
+                         "text": "\n".join(paragraphs)})
+    return articles
+
+
+def read_range(dump_path, start, end):
+    """Decompress the bz2 streams in bytes [start, end) of a dump and iterate over their text lines."""
+    with open(dump_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # bz2.decompress handles several concatenated streams. Universal newlines, as WikiExtractor's
+    # text-mode bz2.open reads them: str.splitlines would also split on \x0b, \x0c, \x85, U+2028 and U+2029.
+    return iter(StringIO(bz2.decompress(data).decode('utf-8'), newline=None))
+
+
+def extract_range(dump_path, start, end, siteinfo):
+    """Decompress, split and clean the articles of one stream range of a multistream dump."""
+    pages = iter_pages(read_range(dump_path, start, end), siteinfo["template_namespace"])
+    return extract_pages(pages, siteinfo["urlbase"])
+
+
+def iter_page_batches(dump_path, siteinfo, batch_pages=200):
+    """
+    Decompress a dump sequentially and yield lists of raw pages, for dumps written as a
+    single bz2 stream, whose parts cannot be decompressed independently.
+    """
+    with TextIOWrapper(bz2.open(dump_path, 'rb'), encoding='utf-8') as f:
+        batch = []
+        for page in iter_pages(f, siteinfo["template_namespace"]):
+            batch.append(page)
+            if len(batch) >= batch_pages:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def iter_dump_parts(dump_path, siteinfo, index_path=None, batch_bytes=4 * 1024 * 1024, batch_pages=200):
+    """
+    Yield the parts of a dump that can be processed independently, in order (see
+    extract_part): (start, end) stream ranges of a multistream dump, found with its index
+    if given, or else by scanning the file; lists of raw pages of a single-stream dump.
+    """
+    offsets = read_index_offsets(index_path) if index_path else scan_stream_offsets(dump_path)
+    if len(offsets) > 1:
+        yield from stream_ranges(offsets, os.path.getsize(dump_path), batch_bytes=batch_bytes)
+    else:
+        yield from iter_page_batches(dump_path, siteinfo, batch_pages=batch_pages)
+
+
+def extract_part(dump_path, part, siteinfo):
+    """Return the article records of a part yielded by iter_dump_parts."""
+    if isinstance(part, tuple):
+        return extract_range(dump_path, part[0], part[1], siteinfo)
+    return extract_pages(part, siteinfo["urlbase"])
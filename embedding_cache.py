@@ -0,0 +1,148 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache backed by SQLite.
+    Embeddings are keyed by a hash of the model name and the text and stored as
+    float32 blobs. The least recently used entries are evicted above `max_entries`.
+    """
+    def __init__(self, path, max_entries=1_000_000):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path (str): Path of the SQLite cache file.
+            max_entries (int): Maximum number of cached embeddings before LRU eviction.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self.size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, model):
+        return hashlib.sha1(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts, model):
+        """
+        Look up the embeddings of several texts.
+
+        Returns:
+            list: One float32 array per text, or None where the text is not cached.
+        """
+        keys = [self.key(text, model) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters.
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self.conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+
+    def put_many(self, texts, embeddings, model):
+        """Store the embeddings of several texts, evicting the least recently used entries if needed."""
+        now = time.time()
+        rows = [(self.key(text, model), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self.size += self.conn.total_changes - before
+            if self.size > self.max_entries:
+                # Evict down to 90% of the capacity, so eviction does not run on every insert.
+                excess = self.size - int(self.max_entries * 0.9)
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.size -= excess
+            self.conn.commit()
+
+    def embed(self, texts, model, embed_fn):
+        """
+        Return the embeddings of `texts`, computing only the cache misses with `embed_fn`.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            model (str): Name of the embedding model, part of the cache key.
+            embed_fn (callable): Function embedding a list of texts.
+
+        Returns:
+            list: One float32 array per text.
+        """
+        texts = list(texts)
+        embeddings = self.get_many(texts, model)
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            computed = embed_fn(list(missing))
+            self.put_many(list(missing), computed, model)
+            for text, embedding in zip(missing, computed):
+                for i in missing[text]:
+                    embeddings[i] = np.asarray(embedding, dtype=np.float32)
+        return embeddings
+
+    def hit_rate(self):
+        """Return the fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"entries": self.size, "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that serves embeddings from an EmbeddingCache and
+    only calls the wrapped embedding function for texts it has not seen.
+    """
+    def __init__(self, embedding_function, cache, model_name):
+        """
+        Args:
+            embedding_function: Chroma embedding function to wrap.
+            cache (EmbeddingCache): Cache shared with ingestion and queries.
+            model_name (str): Name of the wrapped model, part of the cache key.
+        """
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model_name = model_name
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.cache.embed(input, self.model_name, self.embedding_function)
@@ -0,0 +1,147 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class EmbeddingEngine:
+    """
+    Batched, concurrent client for OpenAI-compatible embedding endpoints.
+    Sends many texts per request, keeps several requests in flight and retries
+    rate-limited or failed requests with exponential backoff.
+    """
+    RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, api_key=None, model="text-embedding-ada-002", api_base=None,
+                 batch_size=256, max_in_flight=4, max_retries=6,
+                 backoff_base=1.0, backoff_max=60.0, timeout=60, cache=None):
+        """
+        Initialize the embedding engine.
+
+        Args:
+            api_key (str, optional): OpenAI API key. Defaults to the OPENAI_API_KEY environment variable.
+            model (str): Embedding model name.
+            api_base (str, optional): Base URL of the API. Defaults to OPENAI_API_BASE or the OpenAI endpoint,
+                so the engine can be pointed at a local stub server.
+            batch_size (int): Number of texts sent in a single request.
+            max_in_flight (int): Maximum number of concurrent requests.
+            max_retries (int): Retries per batch on rate limits, server errors and connection errors.
+            backoff_base (float): Initial backoff delay in seconds, doubled on every retry.
+            backoff_max (float): Upper bound for a single backoff delay in seconds.
+            timeout (float): Timeout in seconds for a single request.
+            cache (EmbeddingCache, optional): Cache consulted before calling the API.
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.api_base = (api_base or os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1").rstrip("/")
+        self.endpoint = f"{self.api_base}/embeddings"
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.cache = cache
+
+        # One pooled session shared by all worker threads, sized for the in-flight limit.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {"chunks": 0, "requests": 0, "retries": 0, "seconds": 0.0}
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring a Retry-After header when present."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _embed_batch(self, texts):
+        """Embed one batch of texts, retrying on rate limits and transient errors."""
+        payload = {"input": texts, "model": self.model}
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(self.endpoint, headers=self._headers(),
+                                             json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                with self._lock:
+                    self.stats["requests"] += 1
+                if response.status_code == 200:
+                    data = sorted(response.json()["data"], key=lambda item: item["index"])
+                    return [item["embedding"] for item in data]
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    raise Exception(f"Failed to get embeddings: {response.status_code} - {response.text}")
+                error = f"{response.status_code} - {response.text}"
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt == self.max_retries:
+                raise Exception(f"Failed to get embeddings after {self.max_retries} retries: {error}")
+            with self._lock:
+                self.stats["retries"] += 1
+            time.sleep(self._backoff_delay(attempt, retry_after))
+
+    def embed(self, texts):
+        """
+        Embed a list of texts, preserving their order. Cached texts are not sent to the API.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list: One embedding per input text.
+        """
+        if self.cache is not None:
+            return self.cache.embed(texts, self.model, self._embed_uncached)
+        return self._embed_uncached(texts)
+
+    def _embed_uncached(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        start = time.perf_counter()
+        if len(batches) == 1:
+            results = [self._embed_batch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats["chunks"] += len(texts)
+            self.stats["seconds"] += elapsed
+        return [embedding for batch in results for embedding in batch]
+
+    def throughput(self):
+        """Return the average embedding throughput in chunks/sec since creation."""
+        if not self.stats["seconds"]:
+            return 0.0
+        return self.stats["chunks"] / self.stats["seconds"]
+
+    def report(self):
+        """Print a one-line summary of the engine statistics."""
+        print(f"Embedded {self.stats['chunks']} chunks in {self.stats['seconds']:.2f}s "
+              f"({self.throughput():.1f} chunks/sec, {self.stats['requests']} requests, "
+              f"{self.stats['retries']} retries)")
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Embedding cache: {stats['entries']} entries, hit rate {stats['hit_rate']:.1%} "
+                  f"({stats['hits']} hits, {stats['misses']} misses)")
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+
+def content_hash(text):
+    """Return the SHA-1 hex digest used to detect changed articles and chunks."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class IndexManifest:
+    """
+    SQLite manifest of what has been indexed in the vector store.
+    Keeps a content hash per article and per chunk, the IDs written to Chroma, and
+    the ingestion runs, so re-ingests only touch new, changed or deleted articles and
+    an interrupted ingest can be resumed.
+    """
+    def __init__(self, path, read_only=False):
+        """
+        Open (or create) the manifest.
+
+        Args:
+            path (str): Path of the SQLite manifest file.
+            read_only (bool): Open an existing manifest for lookups only, without touching its
+                schema or journal mode, e.g. from worker processes while a writer holds it open.
+        """
+        self.path = path
+        if read_only:
+            self.conn = sqlite3.connect(f"{Path(os.path.abspath(path)).as_uri()}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                completed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                article_id TEXT PRIMARY KEY,
+                title TEXT,
+                content_hash TEXT NOT NULL,
+                keyword_id TEXT,
+                chunk_ids TEXT NOT NULL,
+                chunk_hashes TEXT NOT NULL,
+                run_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_run ON articles(run_id);
+        """)
+        self.conn.commit()
+
+    def bind(self, collection_id):
+        """
+        Tie the manifest to a Chroma collection. If the collection was recreated
+        (e.g. reset), the manifest no longer describes it and is cleared.
+
+        Returns:
+            bool: True if the manifest was empty or cleared, i.e. it does not describe the collection yet.
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'collection_id'").fetchone()
+        if row is not None and row[0] == str(collection_id):
+            return False
+        if row is not None:
+            print("Vector store was recreated, clearing the index manifest.")
+        self.conn.execute("DELETE FROM articles")
+        self.conn.execute("DELETE FROM runs")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('collection_id', ?)", (str(collection_id),))
+        self.conn.commit()
+        return True
+
+    def begin_run(self, source):
+        """
+        Start an ingestion run for `source`, or resume the last one if it did not complete.
+
+        Returns:
+            int: The run ID.
+        """
+        row = self.conn.execute(
+            "SELECT run_id, completed_at FROM runs WHERE source = ? ORDER BY run_id DESC LIMIT 1", (source,)
+        ).fetchone()
+        if row is not None and row[1] is None:
+            print(f"Resuming interrupted ingestion run {row[0]} for {source}.")
+            return row[0]
+        cursor = self.conn.execute("INSERT INTO runs (source, started_at) VALUES (?, ?)", (source, time.time()))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def complete_run(self, run_id):
+        """Mark a run as completed."""
+        self.conn.execute("UPDATE runs SET completed_at = ? WHERE run_id = ?", (time.time(), run_id))
+        self.conn.commit()
+
+    def get_hash(self, article_id):
+        """Return the stored content hash of an article, or None if it is not indexed."""
+        row = self.conn.execute("SELECT content_hash FROM articles WHERE article_id = ?", (str(article_id),)).fetchone()
+        return row[0] if row else None
+
+    def get_article(self, article_id):
+        """Return the stored record of an article, or None if it is not indexed."""
+        row = self.conn.execute(
+            "SELECT content_hash, keyword_id, chunk_ids, chunk_hashes FROM articles WHERE article_id = ?",
+            (str(article_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "content_hash": row[0],
+            "keyword_id": row[1],
+            "chunk_ids": json.loads(row[2]),
+            "chunk_hashes": json.loads(row[3]),
+        }
+
+    def put_articles(self, records, run_id):
+        """
+        Insert or replace article records.
+
+        Args:
+            records (list[dict]): Records with article_id, title, content_hash, keyword_id, chunk_ids and chunk_hashes.
+            run_id (int): The run that wrote them.
+        """
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO articles (article_id, title, content_hash, keyword_id, chunk_ids, chunk_hashes, run_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (str(r["article_id"]), r["title"], r["content_hash"], r["keyword_id"],
+                 json.dumps(r["chunk_ids"]), json.dumps(r["chunk_hashes"]), run_id)
+                for r in records
+            ]
+        )
+
+    def touch(self, article_ids, run_id):
+        """Mark unchanged articles as seen by a run."""
+        self.conn.executemany("UPDATE articles SET run_id = ? WHERE article_id = ?",
+                              [(run_id, str(article_id)) for article_id in article_ids])
+
+    def stale_articles(self, run_id):
+        """Return (article_id, keyword_id, chunk_ids) of articles not seen by a run, i.e. deleted from the source."""
+        rows = self.conn.execute(
+            "SELECT article_id, keyword_id, chunk_ids FROM articles WHERE run_id != ?", (run_id,)
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def delete_articles(self, article_ids):
+        """Remove article records."""
+        self.conn.executemany("DELETE FROM articles WHERE article_id = ?", [(str(a),) for a in article_ids])
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,340 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from array import array
+import numpy as np
+
+ITALIAN_STOPWORDS = frozenset("""
+a ad al allo ai agli all agl alla alle con col coi da dal dallo dai dagli dall dagl dalla dalle di del dello dei
+degli dell degl della delle in nel nello nei negli nell negl nella nelle su sul sullo sui sugli sull sugl sulla
+sulle per tra fra il lo la i gli le l un uno una un e ed o od ma se che chi cui non come dove quando quale quali
+quanto quanta quanti quante piu meno anche ancora gia mai sempre molto poco tutto tutti tutta tutte questo questa
+questi queste quello quella quelli quelle essere e sono era erano fu furono stato stata stati state sia siano
+ha hanno aveva avevano ho hai abbiamo avete io tu lui lei noi voi loro mi ti si ci vi ne suo sua suoi sue mio
+mia miei mie tuo tua nostro nostra vostro vostra loro c d s m t v
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def _light_stem(token):
+    """Light Italian stemmer: drops the final gender/number vowel of longer words (olimpico, olimpici -> olimpic)."""
+    if len(token) > 4 and token[-1] in "aeio":
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Tokenize Italian text for lexical search: lowercase, strip accents, split on
+    non-word characters (so elisions like l'atleta split off), drop stopwords and
+    apply a light stemmer.
+    """
+    tokens = _TOKEN_RE.findall(_strip_accents(text.lower()))
+    return [_light_stem(token) for token in tokens if token not in ITALIAN_STOPWORDS]
+
+
+class _Segment:
+    """An immutable, on-disk block of the inverted index."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "terms.json")) as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "doc_ids.json")) as f:
+            self.doc_ids = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"))
+
+    def postings(self, term):
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    @staticmethod
+    def write(path, postings, doc_ids, doc_lengths):
+        """Write postings ({term: (docs, tfs)} with segment-local doc numbers) as a new segment."""
+        os.makedirs(path, exist_ok=True)
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term][0])
+        docs = np.empty(offsets[-1], dtype=np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            docs[offsets[i]:offsets[i + 1]] = postings[term][0]
+            tfs[offsets[i]:offsets[i + 1]] = postings[term][1]
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        np.save(os.path.join(path, "docs.npy"), docs)
+        np.save(os.path.join(path, "tfs.npy"), tfs)
+        np.save(os.path.join(path, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+        with open(os.path.join(path, "terms.json"), "w") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(path, "doc_ids.json"), "w") as f:
+            json.dump(doc_ids, f)
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over the chunk corpus.
+
+    Posting lists are stored as compact uint32 document numbers and uint16 term
+    frequencies. New chunks are buffered in memory and flushed as immutable
+    segments; deleted or replaced chunks are tombstoned and dropped when the
+    segments are merged by optimize(), which maybe_optimize() only runs once
+    there are enough segments or tombstones. The list of live segments is committed
+    atomically, so an interrupted flush never leaves a half-written index.
+    """
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        """
+        Open (or create) the index.
+
+        Args:
+            path (str, optional): Directory of the persisted index. In-memory only if None.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 length normalization.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.segments = []
+        self.deleted = set()
+        self._segment_counter = 0
+        self._generation = 0
+        if path and os.path.exists(os.path.join(path, "segments.json")):
+            with open(os.path.join(path, "segments.json")) as f:
+                state = json.load(f)
+            self._segment_counter = state["counter"]
+            self._generation = state["generation"]
+            self.segments = [_Segment(os.path.join(path, name)) for name in state["segments"]]
+            self.deleted = set(np.load(os.path.join(path, state["deleted"])).tolist()) if state["deleted"] else set()
+
+        # Global document numbers: segments in order, then the in-memory buffer.
+        self.doc_ids = [doc_id for segment in self.segments for doc_id in segment.doc_ids]
+        self.doc_lengths = array('I')
+        for segment in self.segments:
+            self.doc_lengths.extend(segment.doc_lengths.tolist())
+        self.id_to_doc = {doc_id: n for n, doc_id in enumerate(self.doc_ids) if n not in self.deleted}
+        self.total_length = sum(self.doc_lengths[n] for n in self.id_to_doc.values())
+        self._buffer = {}
+        self._buffer_start = len(self.doc_ids)
+
+    def __len__(self):
+        return len(self.id_to_doc)
+
+    def add(self, ids, documents):
+        """
+        Index chunks. A chunk whose ID is already indexed is replaced.
+
+        Args:
+            ids (list[str]): Chunk IDs.
+            documents (list[str]): Chunk texts.
+        """
+        with self._lock:
+            self.remove(ids)
+            for doc_id, text in zip(ids, documents):
+                tokens = tokenize(text)
+                n = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.doc_lengths.append(len(tokens))
+                self.id_to_doc[doc_id] = n
+                self.total_length += len(tokens)
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    docs, tfs = self._buffer.setdefault(token, (array('I'), array('H')))
+                    docs.append(n)
+                    tfs.append(min(tf, 65535))
+
+    def remove(self, ids):
+        """Tombstone chunks by ID."""
+        with self._lock:
+            for doc_id in ids:
+                n = self.id_to_doc.pop(doc_id, None)
+                if n is not None:
+                    self.deleted.add(n)
+                    self.total_length -= self.doc_lengths[n]
+
+    def _iter_postings(self, term):
+        """Yield (global doc numbers, tfs) for a term across segments and the buffer."""
+        base = 0
+        for segment in self.segments:
+            postings = segment.postings(term)
+            if postings is not None:
+                yield postings[0].astype(np.int64) + base, postings[1]
+            base += len(segment.doc_ids)
+        if term in self._buffer:
+            docs, tfs = self._buffer[term]
+            yield np.frombuffer(docs, dtype=np.uint32).astype(np.int64), np.frombuffer(tfs, dtype=np.uint16)
+
+    def search(self, query, n_results=10):
+        """
+        Rank indexed chunks against a query with BM25.
+
+        Returns:
+            list[tuple[str, float]]: Up to n_results (chunk ID, score) pairs, best first.
+        """
+        with self._lock:
+            n_docs = len(self.id_to_doc)
+            if not n_docs:
+                return []
+            avgdl = self.total_length / n_docs or 1.0
+            doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            deleted = np.fromiter(self.deleted, dtype=np.int64) if self.deleted else None
+            all_docs, all_scores = [], []
+            for term in set(tokenize(query)):
+                postings = list(self._iter_postings(term))
+                if not postings:
+                    continue
+                docs = np.concatenate([p[0] for p in postings])
+                tfs = np.concatenate([p[1] for p in postings]).astype(np.float32)
+                if deleted is not None:
+                    # Tombstoned chunks stay in the postings until the next merge: leave them out of
+                    # the document frequency too, so the IDF matches the live chunks.
+                    alive = ~np.isin(docs, deleted)
+                    docs, tfs = docs[alive], tfs[alive]
+                    if not len(docs):
+                        continue
+                df = len(docs)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                lengths = doc_lengths[docs]
+                all_docs.append(docs)
+                all_scores.append(idf * tfs * (self.k1 + 1) /
+                                  (tfs + self.k1 * (1 - self.b + self.b * lengths / avgdl)))
+            if not all_docs:
+                return []
+            unique_docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+            top = np.argsort(-scores)[:n_results]
+            return [(self.doc_ids[unique_docs[i]], float(scores[i])) for i in top]
+
+    def flush(self):
+        """Persist buffered chunks as a new segment and commit the tombstones."""
+        if not self.path:
+            return
+        with self._lock:
+            if len(self.doc_ids) > self._buffer_start:
+                self._segment_counter += 1
+                name = f"seg-{self._segment_counter:06d}"
+                start = self._buffer_start
+                postings = {term: (np.frombuffer(docs, dtype=np.uint32) - start, tfs)
+                            for term, (docs, tfs) in self._buffer.items()}
+                _Segment.write(os.path.join(self.path, name), postings,
+                               self.doc_ids[start:], self.doc_lengths[start:])
+                self.segments.append(_Segment(os.path.join(self.path, name)))
+                self._buffer = {}
+                self._buffer_start = len(self.doc_ids)
+            self._commit()
+
+    def maybe_optimize(self, max_segments=8, max_deleted_ratio=0.2):
+        """
+        Flush, then merge the segments (see optimize) only when there are more than
+        `max_segments` of them or tombstones make up more than `max_deleted_ratio` of the
+        indexed chunks, so small updates do not rewrite the whole index.
+
+        Returns:
+            bool: True if the segments were merged.
+        """
+        with self._lock:
+            self.flush()
+            if (len(self.segments) > max_segments or
+                    len(self.deleted) > max_deleted_ratio * max(len(self.doc_ids), 1)):
+                self.optimize()
+                return True
+            return False
+
+    def optimize(self):
+        """Merge all segments into one, dropping deleted chunks and renumbering the rest."""
+        if not self.path:
+            return
+        with self._lock:
+            self.flush()
+            if len(self.segments) <= 1 and not self.deleted:
+                return
+            alive = np.ones(len(self.doc_ids), dtype=bool)
+            if self.deleted:
+                alive[np.fromiter(self.deleted, dtype=np.int64)] = False
+            renumber = np.cumsum(alive) - 1
+            merged = {}
+            base = 0
+            for segment in self.segments:
+                for term, i in segment.terms.items():
+                    start, end = segment.offsets[i], segment.offsets[i + 1]
+                    docs = segment.docs[start:end].astype(np.int64) + base
+                    keep = alive[docs]
+                    if keep.any():
+                        merged.setdefault(term, []).append((renumber[docs[keep]], segment.tfs[start:end][keep]))
+                base += len(segment.doc_ids)
+            postings = {term: (np.concatenate([p[0] for p in parts]).astype(np.uint32),
+                               np.concatenate([p[1] for p in parts])) for term, parts in merged.items()}
+            doc_ids = [doc_id for n, doc_id in enumerate(self.doc_ids) if alive[n]]
+            doc_lengths = [length for n, length in enumerate(self.doc_lengths) if alive[n]]
+
+            old_segments = self.segments
+            self._segment_counter += 1
+            name = f"seg-{self._segment_counter:06d}"
+            _Segment.write(os.path.join(self.path, name), postings, doc_ids, doc_lengths)
+            self.segments = [_Segment(os.path.join(self.path, name))]
+            self.deleted = set()
+            self.doc_ids = doc_ids
+            self.doc_lengths = array('I', doc_lengths)
+            self.id_to_doc = {doc_id: n for n, doc_id in enumerate(doc_ids)}
+            self._buffer_start = len(doc_ids)
+            self._commit()
+            for segment in old_segments:
+                for file in os.listdir(segment.path):
+                    os.remove(os.path.join(segment.path, file))
+                os.rmdir(segment.path)
+
+    def clear(self):
+        """Remove every indexed chunk, in memory and on disk."""
+        with self._lock:
+            old_segments = self.segments
+            self.segments = []
+            self.deleted = set()
+            self.doc_ids = []
+            self.doc_lengths = array('I')
+            self.id_to_doc = {}
+            self.total_length = 0
+            self._buffer = {}
+            self._buffer_start = 0
+            if self.path:
+                self._commit()
+                for segment in old_segments:
+                    for file in os.listdir(segment.path):
+                        os.remove(os.path.join(segment.path, file))
+                    os.rmdir(segment.path)
+
+    def _commit(self):
+        os.makedirs(self.path, exist_ok=True)
+        # Every commit writes a new tombstone file, so the committed one is never overwritten in place.
+        self._generation += 1
+        deleted_file = None
+        if self.deleted:
+            deleted_file = f"deleted-{self._generation:06d}.npy"
+            np.save(os.path.join(self.path, deleted_file), np.fromiter(self.deleted, dtype=np.int64))
+        state = {
+            "counter": self._segment_counter,
+            "generation": self._generation,
+            "segments": [os.path.basename(segment.path) for segment in self.segments],
+            "deleted": deleted_file,
+        }
+        tmp = os.path.join(self.path, "segments.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, os.path.join(self.path, "segments.json"))
+        for file in os.listdir(self.path):
+            if file.startswith("deleted-") and file != deleted_file:
+                os.remove(os.path.join(self.path, file))
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+
+class LocalEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    In-process CPU embedding backend running all-MiniLM-L6-v2 with ONNX Runtime.
+
+    It uses the same model files as Chroma's default embedder, so existing collections stay
+    compatible, but it pads each batch only to its longest text (sorted by length) instead of
+    to 256 tokens, lets the number of inference threads be set, can run an int8-quantized
+    copy of the model, and pools concurrent small requests (e.g. queries from several users)
+    into shared batches. One instance serves both ingestion and queries.
+    """
+    MODEL_NAME = ONNXMiniLM_L6_V2.MODEL_NAME
+    MODEL_DIR = os.path.join(ONNXMiniLM_L6_V2.DOWNLOAD_PATH, ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME)
+    DIM = 384
+
+    def __init__(self, model_dir=None, num_threads=None, batch_size=64, max_wait_ms=5.0,
+                 quantize=False, max_length=256):
+        """
+        Load the tokenizer and the ONNX model (downloading Chroma's model files if needed).
+
+        Args:
+            model_dir (str, optional): Directory with model.onnx and tokenizer.json. Defaults to
+                Chroma's download location for all-MiniLM-L6-v2.
+            num_threads (int, optional): Intra-op threads used by ONNX Runtime. Defaults to the CPU count.
+            batch_size (int): Maximum number of texts per inference call.
+            max_wait_ms (float): How long a small request waits for concurrent ones to share its batch.
+            quantize (bool): Use an int8 dynamically quantized copy of the model (created on first use;
+                requires the `onnx` package). Faster on CPU at a small cost in accuracy.
+            max_length (int): Maximum number of tokens per text.
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        if model_dir is None:
+            ONNXMiniLM_L6_V2()._download_model_if_not_exists()
+            model_dir = self.MODEL_DIR
+        self.model_dir = model_dir
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.quantize = quantize
+        self.model_name = self.MODEL_NAME + ("-int8" if quantize else "")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        if quantize:
+            model_path = self._quantized_model(model_path)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.log_severity_level = 3
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+
+        self._lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._batch_loop, name="LocalEmbedding-batcher", daemon=True)
+        self._worker.start()
+        self.stats = {"texts": 0, "batches": 0, "seconds": 0.0}
+
+    @staticmethod
+    def _quantized_model(model_path):
+        """Return the path of an int8 copy of the model, quantizing it on first use."""
+        quantized_path = model_path.replace(".onnx", "_int8.onnx")
+        if not os.path.exists(quantized_path):
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+            except ImportError as e:
+                raise ValueError("Quantizing the embedding model requires the onnx package: pip install onnx") from e
+            print(f"Quantizing {model_path} to int8...")
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def encode(self, texts):
+        """
+        Embed texts right away in the calling thread, in length-sorted batches.
+
+        Returns:
+            np.ndarray: Normalized float32 embeddings, one row per text.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.DIM), dtype=np.float32)
+        start = time.perf_counter()
+        # Sorting by length keeps texts of similar length together, so batches need little padding.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.empty((len(texts), self.DIM), dtype=np.float32)
+        for begin in range(0, len(order), self.batch_size):
+            indices = order[begin:begin + self.batch_size]
+            embeddings[indices] = self._forward([texts[i] for i in indices])
+        with self._lock:
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += -(-len(texts) // self.batch_size)
+            self.stats["seconds"] += time.perf_counter() - start
+        return embeddings
+
+    def _forward(self, texts):
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        last_hidden_state = self.session.run(None, {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        })[0]
+        # Mean pooling over the real tokens, then L2 normalization, as in sentence-transformers.
+        mask = attention_mask[..., None].astype(np.float32)
+        embeddings = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def _batch_loop(self):
+        while True:
+            requests = [self._requests.get()]
+            n_texts = len(requests[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            # Collect concurrent requests until the batch is full or the wait is over.
+            while n_texts < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                n_texts += len(request[0])
+            try:
+                embeddings = self.encode([text for texts, _ in requests for text in texts])
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for texts, future in requests:
+                future.set_result(embeddings[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        # Large calls (ingestion) are full batches already; small ones (queries) are pooled.
+        if len(texts) >= self.batch_size:
+            return list(self.encode(texts))
+        future = Future()
+        self._requests.put((texts, future))
+        return list(future.result())
+
+    def throughput(self):
+        """Return the average embedding throughput in texts/sec since creation."""
+        return self.stats["texts"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+
+@lru_cache(maxsize=None)
+def shared_embedding_function(num_threads=None, quantize=False, batch_size=64, max_wait_ms=5.0):
+    """Return the process-wide LocalEmbeddingFunction for these settings, so all sessions share one model and batcher."""
+    return LocalEmbeddingFunction(num_threads=num_threads, quantize=quantize,
+                                  batch_size=batch_size, max_wait_ms=max_wait_ms)
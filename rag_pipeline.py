@@ -0,0 +1,487 @@
+import ast
+import os
+import threading
+import time
+import chromadb
+from dotenv import load_dotenv
+from search import Search
+from prompt import answer_prompt, rewriting_prompt, fallback_prompt
+from VectorStore import VectorStore
+from ModelQuery import ModelQuery
+from index_manifest import IndexManifest
+from answer_cache import AnswerCache
+from context_builder import ContextBuilder
+from local_embedding import shared_embedding_function
+from resources import resource
+import tracing
+from vector_index import MappedCollection, QuantizedVectorIndex
+
+load_dotenv()
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "http://127.0.0.1:1234/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama-3.1-8b-instruct")
+CHROMA_PATH = "./chroma"
+DOC_COLLECTION = "wikipedia_docs"
+KEYWORD_COLLECTION = "wikipedia_keywords"
+MANIFEST_PATH = "Data/index_manifest.sqlite3"
+CHUNK_INDEX_PATH = "Data/chunk_index.sqlite3"
+# Parquet store of the chunked articles (chunk_store.py), written by write_chunk_store or
+# chunk_dataframe_text(store_path=...).
+CHUNK_STORE_PATH = "Data/chunk_store"
+EMBEDDING_CACHE_PATH = "Data/embedding_cache.sqlite3"
+LEXICAL_INDEX_PATH = "Data/bm25_index"
+# Search the chunks of the best matching article titles first (falls back to the global search).
+TITLE_FIRST_RETRIEVAL = os.getenv("TITLE_FIRST_RETRIEVAL", "0") == "1"
+# Optional compressed vector tier for the document chunks: "int8", "float16" or empty (search Chroma's HNSW index).
+# Built by ingest_dump or `python vector_index.py build`, never by the serving processes.
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "")
+VECTOR_INDEX_PATH = "Data/doc_vector_index"
+# Optional memory-mapped exports of both collections (`python vector_index.py export`), shared by all
+# worker processes through the page cache; empty to search the Chroma collections.
+MAPPED_INDEX_PATH = os.getenv("MAPPED_INDEX_PATH", "")
+REFUSAL = "Non posso rispondere."
+
+
+@resource
+def embedding_function():
+    """The in-process embedding model (and request batcher) shared by ingestion and queries."""
+    return shared_embedding_function(
+        num_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
+        quantize=os.getenv("EMBEDDING_INT8", "0") == "1"
+    )
+
+
+@resource
+def chroma_client():
+    """The Chroma client of the process, shared by every VectorStore and the answer cache."""
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+@resource
+def llm():
+    """The pooled client of the local model."""
+    return ModelQuery(LLM_ENDPOINT, LLM_MODEL)
+
+
+@resource
+def context_builder():
+    """Packs retrieved chunks into the model's context window (tokenizer loaded once)."""
+    return ContextBuilder(max_context_tokens=4096, reserve_tokens=1024)
+
+
+@resource
+def vector_store():
+    """The Wikipedia collections, with the chunk store if it exists."""
+    return open_vector_store(data_path=CHUNK_STORE_PATH)
+
+
+def open_vector_store(data_path=None, chunk_index_path=None):
+    """
+    Open the document and keyword collections (with the BM25 index and embedding cache),
+    with `data_path` (a DataFrame file or chunk store, read on first use) if it exists.
+    """
+    kwargs = dict(
+        doc_collection_name=DOC_COLLECTION,
+        keyword_collection_name=KEYWORD_COLLECTION,
+        reset=False,
+        chunk_index_path=chunk_index_path,
+        chroma_client=chroma_client(),
+        embedding_function=embedding_function(),
+        embedding_cache_path=EMBEDDING_CACHE_PATH,
+        lexical_index_path=LEXICAL_INDEX_PATH
+    )
+    if data_path is not None and os.path.exists(data_path):
+        try:
+            return VectorStore(data_path=data_path, **kwargs)
+        except Exception:
+            pass
+    return VectorStore(**kwargs)
+
+
+def load_vector_index(vs):
+    """
+    Return the compressed vector index of the document chunks, or None if the tier is disabled,
+    or the index is missing or older than the collection (search then uses Chroma's HNSW index).
+    It is not built here: every worker process would rebuild it.
+    """
+    if not VECTOR_INDEX_MODE:
+        return None
+    if os.path.exists(os.path.join(VECTOR_INDEX_PATH, "meta.json")):
+        index = QuantizedVectorIndex(VECTOR_INDEX_PATH)
+        if index.meta["index_version"] == vs.index_version() and index.mode == VECTOR_INDEX_MODE:
+            return index
+    print(f"No current {VECTOR_INDEX_MODE} vector index in {VECTOR_INDEX_PATH}, searching the Chroma collection. "
+          f"Build it with: python vector_index.py build --mode {VECTOR_INDEX_MODE} --out {VECTOR_INDEX_PATH}")
+    return None
+
+
+def load_mapped_collections(vs):
+    """
+    Return the memory-mapped (document, keyword) exports, or None if they are disabled,
+    missing or older than the collections (search then falls back to Chroma).
+    """
+    if not MAPPED_INDEX_PATH:
+        return None
+    paths = [os.path.join(MAPPED_INDEX_PATH, name) for name in (vs.doc_collection_name, vs.keyword_collection_name)]
+    if not all(os.path.exists(os.path.join(path, "meta.json")) for path in paths):
+        print(f"No mapped index in {MAPPED_INDEX_PATH}, run: python vector_index.py export --out {MAPPED_INDEX_PATH}")
+        return None
+    collections = tuple(MappedCollection(path, embedding_function=vs.embedding_function) for path in paths)
+    if any(collection.meta["index_version"] != vs.index_version() for collection in collections):
+        print(f"Mapped index in {MAPPED_INDEX_PATH} is stale, searching the Chroma collections.")
+        return None
+    return collections
+
+
+def index_state(vs):
+    """
+    Return the index version of `vs` with the directories the mapped exports and the compressed
+    vector index point to, which are switched after the collections changed: the search objects
+    are reopened whenever it changes.
+    """
+    paths = []
+    if MAPPED_INDEX_PATH:
+        paths.extend(os.path.join(MAPPED_INDEX_PATH, name) for name in (vs.doc_collection_name, vs.keyword_collection_name))
+    if VECTOR_INDEX_MODE:
+        paths.append(VECTOR_INDEX_PATH)
+    return vs.index_version(), tuple(os.path.realpath(path) for path in paths)
+
+
+def make_search(vs):
+    """Return the (document, keyword) Search objects, over the mapped exports when available."""
+    mapped = load_mapped_collections(vs)
+    if mapped is not None:
+        doc_db, keyword_db = mapped
+        vector_index = None
+    else:
+        doc_db, keyword_db = vs.doc_collection, vs.keyword_collection
+        vector_index = load_vector_index(vs)
+    search_docs = Search(doc_db, lexical_index=vs.lexical_index, keyword_db=keyword_db,
+                         vector_index=vector_index, embedding_function=vs.embedding_function)
+    return search_docs, Search(keyword_db)
+
+
+def download_and_process_dump(manifest_path=None):
+    """
+    Main function to download and extract the Wikipedia dump.
+    Returns the ingested source (the dump files) and an iterator over windows of chunked
+    articles of all the dump parts; with a manifest path, unchanged articles are not re-chunked.
+    """
+    # Imported here: the extractor, the text splitter and pandas are only needed for ingestion.
+    import wikipedia_dump_processor as wp
+    from downloader import dump_series
+
+    # Define your Wikipedia dump parameters (adjust as needed). The multistream dump is made of
+    # independent bz2 streams, listed in its index, so it is decompressed in parallel. Large wikis
+    # publish it in parts (pages-articles-multistreamN); DUMP_PARTS selects them ("1,2" or "all").
+    DUMP_WIKI = os.getenv("DUMP_WIKI", "itwiki")
+    DUMP_DATE = os.getenv("DUMP_DATE", "latest")
+    DUMP_PARTS = os.getenv("DUMP_PARTS", "1")
+    OUTPUT_DIR = "Data"         # Change this to your desired output directory
+    BASE_DIR = OUTPUT_DIR                       # Assuming the extracted files reside in the output directory
+
+    parts = None if DUMP_PARTS == "all" else [int(part) for part in DUMP_PARTS.split(",")]
+    series = dump_series(DUMP_WIKI, DUMP_DATE, parts)
+    if not series:
+        # Nothing to ingest: an empty run would delete every indexed article as stale.
+        raise ValueError(f"No dump parts {DUMP_PARTS} of {DUMP_WIKI} ({DUMP_DATE})")
+    processors = []
+    for dump, index in series:
+        # Initialize processor and execute processing steps
+        processor = wp.WikipediaDumpProcessor(
+            dump["url"], os.path.join(OUTPUT_DIR, dump["name"]), OUTPUT_DIR, BASE_DIR,
+            index_url=index and index["url"], index_file=index and os.path.join(OUTPUT_DIR, index["name"]),
+            dump_sha1=dump["sha1"], index_sha1=index and index["sha1"])
+        processor.download_dump()
+        processors.append(processor)
+
+    # The dump is parsed and chunked in worker processes straight from the bz2 file, without
+    # running WikiExtractor over it first. Assumes that the article text is stored in the 'text' column.
+    def windows():
+        for processor in processors:
+            yield from processor.iter_chunked_windows(window_size=1000, text_column='text', workers=os.cpu_count() or 1,
+                                                      manifest_path=manifest_path, from_dump=True)
+    return "+".join(processor.dump_file for processor in processors), windows()
+
+
+class IngestionBusy(RuntimeError):
+    """Raised by RAGPipeline.ingest_dump while another ingestion is running."""
+
+
+class RAGPipeline:
+    """
+    The question answering flow, independent of any UI: answer cache lookup, hybrid
+    retrieval, context packing, streamed generation with refusal detection and the
+    query-rewriting fallback with web search. It is shared by concurrent requests
+    (e.g. the HTTP service in api.py), so it keeps no per-request state.
+
+    Its components are created on first use, from the process-wide resources unless
+    given, so creating a pipeline is cheap and a request only waits for what it needs.
+    """
+
+    def __init__(self, vector_store=None, llm=None, title_first=TITLE_FIRST_RETRIEVAL):
+        """
+        Args:
+            vector_store (VectorStore, optional): Defaults to the shared Wikipedia collections.
+            llm (ModelQuery, optional): Defaults to the shared client of the model at LLM_ENDPOINT.
+            title_first (bool): Use title-first retrieval as the semantic ranker.
+        """
+        self.title_first = title_first
+        self._vector_store = vector_store
+        self._llm = llm
+        self._answer_cache = None
+        self._search = None
+        # What the search objects were opened at (see index_state).
+        self._search_state = None
+        # Reentrant, as components depend on each other (the search objects on the vector store).
+        self._lock = threading.RLock()
+        self._ingest_lock = threading.Lock()
+        self._reopen_lock = threading.Lock()
+
+    def _lazy(self, name, factory):
+        """Return the component stored in attribute `name`, creating it with `factory` on first use."""
+        value = getattr(self, name)
+        if value is None:
+            with self._lock:
+                value = getattr(self, name)
+                if value is None:
+                    value = factory()
+                    setattr(self, name, value)
+        return value
+
+    @property
+    def vector_store(self):
+        return self._lazy("_vector_store", vector_store)
+
+    @property
+    def llm(self):
+        return self._lazy("_llm", llm)
+
+    @property
+    def context_builder(self):
+        return context_builder()
+
+    @property
+    def answer_cache(self):
+        # Semantic cache of past answers, sharing the document embeddings (and their cache) for the questions.
+        return self._lazy("_answer_cache", lambda: AnswerCache(
+            self.vector_store.chroma_client, embedding_function=self.vector_store.embedding_function
+        ))
+
+    @property
+    def search_docs(self):
+        return self._lazy("_search", self._open_search)[0]
+
+    @property
+    def search_keywords(self):
+        return self._lazy("_search", self._open_search)[1]
+
+    def _open_search(self):
+        # Read first, so a change while the search objects are opened is seen by the next request.
+        self._search_state = index_state(self.vector_store)
+        return make_search(self.vector_store)
+
+    @property
+    def ready(self):
+        """Whether the components needed to answer have been created."""
+        return self._search is not None and self._answer_cache is not None
+
+    def warm_up(self):
+        """Create all the components now (and load the embedding model), instead of on the first requests."""
+        start = time.perf_counter()
+        self._lazy("_search", self._open_search)
+        self.answer_cache
+        self.context_builder
+        self.llm
+        print(f"Pipeline ready in {time.perf_counter() - start:.2f}s")
+
+    def index_version(self):
+        """
+        Return the current index version. Called on every request: if the version or the mapped
+        exports changed since the search objects were opened, e.g. after an ingestion in another
+        worker process, they are reopened first.
+        """
+        state = index_state(self.vector_store)
+        if self._search is not None and state != self._search_state:
+            self._reopen(state)
+        return state[0]
+
+    def _reopen(self, state):
+        """
+        Reopen the collections, the BM25 index and the answer cache (if the version changed) and
+        the search objects (mapped exports or compressed index) at `state`. Only one thread reopens; concurrent
+        requests keep using the previous objects meanwhile.
+        """
+        if not self._reopen_lock.acquire(blocking=False):
+            return
+        try:
+            if state == self._search_state:
+                return
+            start = time.perf_counter()
+            vs = self.vector_store
+            answer_cache = self._answer_cache
+            if state[0] != self._search_state[0]:
+                vs.reopen()
+                # The previous client no longer sees other processes' writes (see VectorStore.reopen).
+                chroma_client.reset()
+                if answer_cache is not None:
+                    previous, answer_cache = answer_cache, AnswerCache(
+                        vs.chroma_client, embedding_function=vs.embedding_function
+                    )
+                    answer_cache.hits, answer_cache.misses = previous.hits, previous.misses
+            search = make_search(vs)
+            with self._lock:
+                self._search, self._search_state = search, state
+                self._answer_cache = answer_cache
+            print(f"Reopened the indexes at version {state[0]} in {time.perf_counter() - start:.2f}s")
+        finally:
+            self._reopen_lock.release()
+
+    def retrieve_batch(self, questions, n_results=10, k=10):
+        """
+        Hybrid retrieval (vector and BM25 rankings fused with RRF) for several questions,
+        embedded and sent to the vector store together.
+
+        Returns:
+            list: One Search.hybrid_retrieve result per question.
+        """
+        with tracing.span("retrieve", queries=len(questions)):
+            if self.title_first:
+                # Title-first retrieval filters each question on its own articles, so it is not batched.
+                return [self.search_docs.hybrid_retrieve(question, n_results=n_results, k=k, title_first=True)
+                        for question in questions]
+            return self.search_docs.hybrid_retrieve_batch(questions, n_results=n_results, k=k)
+
+    def retrieve(self, question, n_results=10, k=10):
+        return self.retrieve_batch([question], n_results=n_results, k=k)[0]
+
+    def answer(self, question, on_text=None, on_fallback=None, retrieve=None):
+        """
+        Answer a question, from the answer cache or by retrieval and generation, falling back
+        to rewritten queries and a web search when the model refuses.
+
+        Args:
+            question (str): The user question.
+            on_text (callable, optional): Receives the answer generated so far while it streams.
+            on_fallback (callable, optional): Called when the model refused and the fallback starts.
+            retrieve (callable, optional): Retrieval function for the question, e.g. one that
+                batches concurrent requests; defaults to `self.retrieve`.
+
+        Returns:
+            dict: 'answer', 'sources', 'from_cache', 'fallback', 'ttft' (seconds to the first
+            streamed text, None from the cache) and 'error' (None unless the fallback failed).
+        """
+        # One trace per answer: the time of every stage is recorded, and slow answers are logged.
+        with tracing.trace("answer", question=question) as span:
+            result = self._answer(question, on_text, on_fallback, retrieve)
+            span.set(from_cache=result["from_cache"], fallback=result["fallback"], ttft=result["ttft"])
+            return result
+
+    def _answer(self, question, on_text, on_fallback, retrieve):
+        index_version = self.index_version()
+        result = {"answer": None, "sources": [], "from_cache": False, "fallback": False, "ttft": None, "error": None}
+        with tracing.span("cache.lookup"):
+            cached = self.answer_cache.lookup(question, index_version=index_version)
+        if cached is not None:
+            print(f"Answer cache hit (similarity {cached['similarity']:.3f}): {cached['question']}")
+            if on_text is not None:
+                on_text(cached['answer'])
+            result.update(answer=cached['answer'], sources=cached['sources'], from_cache=True)
+            return result
+
+        start = time.perf_counter()
+
+        def stream_text(text):
+            # Time to first text, measured per request since the model client is shared.
+            if result["ttft"] is None:
+                result["ttft"] = time.perf_counter() - start
+            if on_text is not None:
+                on_text(text)
+
+        # Hybrid retrieval: vector and BM25 rankings of the document chunks fused with RRF.
+        with tracing.span("answer.retrieve"):
+            retrieved = (retrieve or self.retrieve)(question)
+        # Merge overlapping chunks and fill the token budget; the most relevant passage ends up
+        # last in the context, closest to the question.
+        with tracing.span("context.build"):
+            packed = self.context_builder.build(retrieved['ids'], retrieved['documents'], question=question,
+                                                prompt=answer_prompt)
+        print("Numero di token:", packed['tokens'])
+        semantic_docs = packed['passages'][::-1]
+        # A refusal is detected on the streamed prefix, so the fallback starts without waiting
+        # for the full completion.
+        answer = self.llm.stream_query_local_model(query=question, context=packed['context'], prompt=answer_prompt,
+                                                   on_text=stream_text, stop_text=REFUSAL)
+        if answer != REFUSAL:
+            with tracing.span("cache.store"):
+                self.answer_cache.store(question, answer, semantic_docs[:3], index_version=index_version)
+            result.update(answer=answer, sources=semantic_docs[:3])
+            return result
+
+        result.update(answer=answer, fallback=True)
+        if on_fallback is not None:
+            on_fallback()
+        try:
+            with tracing.span("answer.rewrite"):
+                new_queries = ast.literal_eval(self.llm.query_local_model(query=question, context="",
+                                                                          prompt=rewriting_prompt))
+        except (ValueError, SyntaxError):
+            new_queries = None
+        print(new_queries)
+        if not isinstance(new_queries, list):
+            result["error"] = "Impossibile generare nuove query."
+            return result
+
+        # Retrieve for all rewritten queries in one batched call, with the web search running
+        # concurrently, and re-rank using RRF (Reciprocal Rank Fusion).
+        with tracing.span("answer.fallback_retrieve", queries=len(new_queries)):
+            retrieved = self.search_docs.multi_retrieve(new_queries, web_query=question)
+        with tracing.span("context.build"):
+            packed = self.context_builder.build(retrieved['ids'], retrieved['documents'], question=question,
+                                                prompt=fallback_prompt, preamble=retrieved['web'])
+        answer = self.llm.stream_query_local_model(query=question, context=packed['context'],
+                                                   prompt=fallback_prompt, on_text=stream_text, stop_text=REFUSAL)
+        # A refusal of the fallback is not cached either, so the question is retried next time.
+        if answer != REFUSAL:
+            with tracing.span("cache.store"):
+                self.answer_cache.store(question, answer, packed['passages'], index_version=index_version)
+        result.update(answer=answer, sources=packed['passages'])
+        return result
+
+    def ingest_dump(self):
+        """
+        Download and process the Wikipedia dump and update the collections incrementally: only
+        new or changed articles are re-embedded, deleted ones are removed, and an interrupted
+        update resumes on the next call. Only one ingestion runs at a time.
+
+        Returns:
+            str: The new index version.
+
+        Raises:
+            IngestionBusy: If another ingestion is running.
+        """
+        if not self._ingest_lock.acquire(blocking=False):
+            raise IngestionBusy("An ingestion is already running")
+        try:
+            source, windows = download_and_process_dump(MANIFEST_PATH)
+            vs = open_vector_store(chunk_index_path=CHUNK_INDEX_PATH)
+            manifest = IndexManifest(MANIFEST_PATH)
+            try:
+                vs.ingest_incremental(windows, manifest, source=source, use_openai_embedding=False)
+            finally:
+                manifest.close()
+            # Re-export the mapped index and rebuild the compressed one. The other worker processes see
+            # the new version (and the switched directories) on their next request and reopen their
+            # indexes (see index_version).
+            if MAPPED_INDEX_PATH:
+                vs.export_mapped_index(MAPPED_INDEX_PATH)
+            elif VECTOR_INDEX_MODE:
+                vs.build_vector_index(VECTOR_INDEX_PATH, mode=VECTOR_INDEX_MODE)
+            # Drop the answers cached against the previous index.
+            self.answer_cache.purge(index_version=vs.index_version())
+            state = index_state(vs)
+            search = make_search(vs)
+            with self._lock:
+                self._vector_store, self._search, self._search_state = vs, search, state
+            return vs.index_version()
+        finally:
+            self._ingest_lock.release()
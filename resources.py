@@ -0,0 +1,39 @@
+import functools
+import threading
+import time
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def resource(factory):
+    """
+    Decorator turning a zero-argument factory into a lazily initialized, process-wide
+    singleton: the first call creates the object (once, even with concurrent callers),
+    later calls return it. Used for the expensive, shareable objects of the service
+    (Chroma client, embedding model, LLM client, tokenizer).
+
+    The decorated function gets a `reset()` method that drops the instance, so the next
+    call creates a new one.
+    """
+    @functools.wraps(factory)
+    def get():
+        try:
+            return _instances[factory]
+        except KeyError:
+            pass
+        # Reentrant, as factories call other resources.
+        with _lock:
+            if factory not in _instances:
+                start = time.perf_counter()
+                _instances[factory] = factory()
+                print(f"Initialized {factory.__name__} in {time.perf_counter() - start:.2f}s")
+            return _instances[factory]
+
+    get.reset = lambda: _instances.pop(factory, None)
+    return get
+
+
+def initialized():
+    """Return the names of the resources created so far."""
+    return [factory.__name__ for factory in list(_instances)]
@@ -1,4 +1,12 @@
-from duckduckgo_search import DDGS
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import tracing
+
+# Pool for running the rankers and the web search concurrently, shared by every Search: one is
+# created per index version (see rag_pipeline.make_search), and the threads must not leak with it.
+_pool = ThreadPoolExecutor(max_workers=4)
+
+
 class Search:
     """
     Search class for RAG (Retrieval-Augmented Generation) application.
@@ -6,16 +14,31 @@ class Search:
     embeddings, and a Reciprocal Rank Fusion (RRF) algorithm to combine results from multiple rankers.
     """
     
-    def __init__(self, db):
+    def __init__(self, db, lexical_index=None, keyword_db=None, vector_index=None, embedding_function=None):
         """
         Initializes the Search class with a Retriever instance.
         
         Parameters:
         -----------
         retriever : Retriever
-            The Retriever instance containing BM25 and vector search methods.
+            The Retriever instance containing BM25 and vector search methods. A read-only
+            MappedCollection export can be used in place of a Chroma collection, here and
+            as `keyword_db`.
+        lexical_index : BM25Index, optional
+            BM25 index over the same chunks, used by the hybrid retrieval methods.
+        keyword_db : Collection, optional
+            Title (keyword) collection of the same articles, used by title-first retrieval.
+        vector_index : QuantizedVectorIndex, optional
+            Compressed vector tier over the same chunks; when set, semantic retrieval searches
+            it instead of the collection's HNSW index.
+        embedding_function : callable, optional
+            Embeds the queries for the vector index (the collection's embedding function).
         """
         self.db = db
+        self.lexical_index = lexical_index
+        self.keyword_db = keyword_db
+        self.vector_index = vector_index
+        self.embedding_function = embedding_function
 
 
 
@@ -25,23 +48,312 @@ class Search:
         
         Parameters:
         -----------
-        query : str
-            The search query.
+        query : str or list of str
+            The search query, or several queries answered in one batched call.
         n_results : int, optional
             Number of top results to retrieve (default: 10).
         
         Returns:
         --------
-        list
-            Top n documents ranked by semantic similarity.
+        dict
+            Top n documents per query ranked by semantic similarity.
         """
+        if self.vector_index is not None:
+            return self.vector_index_retrieve(query, n_results=n_results)
         query_args = {
-            "query_texts": query,
             "n_results": n_results,
             "include": ['documents', 'metadatas', 'distances', 'uris']
         }
-        return self.db.query(**query_args)
+        if self.embedding_function is not None:
+            # Embedded here rather than by the collection, so both stages are timed separately.
+            queries = [query] if isinstance(query, str) else list(query)
+            with tracing.span("search.embed_query", queries=len(queries)):
+                query_args["query_embeddings"] = self.embedding_function(queries)
+        else:
+            query_args["query_texts"] = query
+        with tracing.span("search.vector_search", n_results=n_results):
+            return self.db.query(**query_args)
+
+    def vector_index_retrieve(self, query, n_results=10):
+        """
+        Retrieves top documents from the vector index, then loads their documents and
+        metadatas from the collection in one call.
+        
+        Parameters:
+        -----------
+        query : str or list of str
+            The search query, or several queries.
+        n_results : int, optional
+            Number of top results to retrieve (default: 10).
+        
+        Returns:
+        --------
+        dict
+            Top n documents per query, shaped like vector store query results.
+        """
+        queries = [query] if isinstance(query, str) else list(query)
+        with tracing.span("search.embed_query", queries=len(queries)):
+            embeddings = self.embedding_function(queries)
+        with tracing.span("search.vector_index", n_results=n_results):
+            hits = self.vector_index.query(embeddings, n_results=n_results)
+        all_ids = list({doc_id for ids in hits['ids'] for doc_id in ids})
+        with tracing.span("search.fetch_chunks", ids=len(all_ids)):
+            records = self.db.get(ids=all_ids, include=['documents', 'metadatas']) if all_ids else {'ids': []}
+        by_id = {doc_id: i for i, doc_id in enumerate(records['ids'])}
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "uris": None}
+        for ids, distances in zip(hits['ids'], hits['distances']):
+            # IDs deleted from the collection since the index was built are skipped.
+            found = [(doc_id, distance) for doc_id, distance in zip(ids, distances) if doc_id in by_id]
+            results["ids"].append([doc_id for doc_id, _ in found])
+            results["documents"].append([records['documents'][by_id[doc_id]] for doc_id, _ in found])
+            results["metadatas"].append([records['metadatas'][by_id[doc_id]] for doc_id, _ in found])
+            results["distances"].append([distance for _, distance in found])
+        return results
     
+    @staticmethod
+    def similarity(distance, collection):
+        """
+        Converts a Chroma distance into a similarity for the collection's distance function
+        (embeddings are assumed normalized; Chroma's l2 distance is squared).
+        """
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "l2":
+            return 1 - distance / 2
+        return 1 - distance
+
+    def title_first_retrieve(self, query, n_results=10, n_articles=5, min_title_similarity=0.4):
+        """
+        Two-stage retrieval: finds the best matching article titles in the keyword collection,
+        then searches only the chunks of those articles with a `where` filter on their IDs.
+        Falls back to the global chunk search when no title is similar enough.
+        
+        Parameters:
+        -----------
+        query : str
+            The search query.
+        n_results : int, optional
+            Number of top chunks to retrieve (default: 10).
+        n_articles : int, optional
+            Number of articles whose chunks are searched (default: 5).
+        min_title_similarity : float, optional
+            Similarity the best title must reach for the restricted search (default: 0.4).
+        
+        Returns:
+        --------
+        dict
+            Vector store query results, like semantic_retrieve, plus 'stage' ("title" or "global")
+            and 'articles' (the article IDs searched, empty for the global search).
+        """
+        with tracing.span("search.title_search", n_articles=n_articles):
+            titles = self.keyword_db.query(query_texts=[query], n_results=n_articles,
+                                           include=['metadatas', 'distances'])
+        article_ids = [
+            metadata["article_id"]
+            for metadata, distance in zip(titles['metadatas'][0], titles['distances'][0])
+            if metadata and "article_id" in metadata
+            and self.similarity(distance, self.keyword_db) >= min_title_similarity
+        ]
+        if article_ids:
+            with tracing.span("search.vector_search", n_results=n_results, articles=len(article_ids)):
+                results = self.db.query(
+                    query_texts=[query],
+                    n_results=n_results,
+                    where={"article_id": {"$in": article_ids}},
+                    include=['documents', 'metadatas', 'distances', 'uris']
+                )
+            # Matched articles may have no chunks in the collection (e.g. empty pages).
+            if results['ids'][0]:
+                results.update({"stage": "title", "articles": article_ids})
+                return results
+        results = self.semantic_retrieve(query, n_results=n_results)
+        results.update({"stage": "global", "articles": []})
+        return results
+
+    def lexical_retrieve(self, query, n_results=10):
+        """
+        Retrieves top documents based on BM25 scores from the lexical index.
+        
+        Parameters:
+        -----------
+        query : str
+            The search query.
+        n_results : int, optional
+            Number of top results to retrieve (default: 10).
+        
+        Returns:
+        --------
+        dict
+            'ids', 'documents', 'metadatas' and 'scores', each a single ranked list
+            wrapped in an outer list like vector store query results.
+        """
+        return self.lexical_retrieve_batch([query], n_results=n_results)[0]
+
+    def lexical_retrieve_batch(self, queries, n_results=10):
+        """
+        BM25 retrieval for several queries, loading the documents of all of them from the
+        vector store in one call.
+        
+        Parameters:
+        -----------
+        queries : list of str
+            The search queries.
+        n_results : int, optional
+            Number of top results to retrieve per query (default: 10).
+        
+        Returns:
+        --------
+        list of dict
+            One lexical_retrieve result per query.
+        """
+        with tracing.span("search.bm25", queries=len(queries)):
+            hits_list = [self.lexical_index.search(query, n_results=n_results) for query in queries]
+        ids = list({doc_id for hits in hits_list for doc_id, _ in hits})
+        with tracing.span("search.fetch_chunks", ids=len(ids)):
+            records = self.db.get(ids=ids, include=['documents', 'metadatas']) if ids else {'ids': []}
+        by_id = {doc_id: i for i, doc_id in enumerate(records['ids'])}
+        results = []
+        for hits in hits_list:
+            found = [(doc_id, score) for doc_id, score in hits if doc_id in by_id]
+            results.append({
+                "ids": [[doc_id for doc_id, _ in found]],
+                "documents": [[records['documents'][by_id[doc_id]] for doc_id, _ in found]],
+                "metadatas": [[records['metadatas'][by_id[doc_id]] for doc_id, _ in found]],
+                "scores": [[score for _, score in found]],
+            })
+        return results
+
+    def hybrid_retrieve(self, query, n_results=10, k=10, weights=None, title_first=False):
+        """
+        Retrieves documents with the vector and BM25 rankers in parallel and fuses them with RRF.
+        
+        Without a lexical index this falls back to semantic retrieval only.
+        
+        Parameters:
+        -----------
+        query : str
+            The search query.
+        n_results : int, optional
+            Number of documents retrieved by each ranker (default: 10).
+        k : int, optional
+            Number of fused documents to return (default: 10).
+        weights : list of float, optional
+            RRF weights of the semantic and lexical rankers (default: equal weights).
+        title_first : bool, optional
+            Use title_first_retrieve as the semantic ranker (needs a keyword collection).
+        
+        Returns:
+        --------
+        dict
+            'documents', 'ids', 'scores' and 'provenance' of the top k fused chunks (see rrf_ids),
+            'semantic' and 'lexical': the results of each ranker.
+        """
+        lexical_future = None
+        if self.lexical_index is not None:
+            lexical_future = _pool.submit(tracing.wrap(self.lexical_retrieve), query, n_results)
+        if title_first and self.keyword_db is not None:
+            semantic = self.title_first_retrieve(query, n_results=n_results)
+        else:
+            semantic = self.semantic_retrieve(query, n_results=n_results)
+        lexical = lexical_future.result() if lexical_future else None
+
+        rankers = [semantic] if lexical is None else [semantic, lexical]
+        if lexical is None and weights is not None:
+            weights = weights[:1]
+        fused = self._fuse(rankers, k=k, weights=weights)
+        fused.update({"semantic": semantic, "lexical": lexical})
+        return fused
+
+    def hybrid_retrieve_batch(self, queries, n_results=10, k=10, weights=None):
+        """
+        Hybrid retrieval for several independent queries (e.g. concurrent users), each fused
+        separately, with all queries embedded in one batch and sent to the vector store in a
+        single query call.
+
+        Parameters:
+        -----------
+        queries : list of str
+            The search queries.
+        n_results : int, optional
+            Number of documents retrieved by each ranker per query (default: 10).
+        k : int, optional
+            Number of fused documents to return per query (default: 10).
+        weights : list of float, optional
+            RRF weights of the semantic and lexical rankers (default: equal weights).
+
+        Returns:
+        --------
+        list of dict
+            One hybrid_retrieve result per query, in the order of `queries`.
+        """
+        queries = list(queries)
+        lexical_future = None
+        if self.lexical_index is not None:
+            lexical_future = _pool.submit(tracing.wrap(self.lexical_retrieve_batch), queries, n_results)
+        results = self.semantic_retrieve(queries, n_results=n_results)
+        lexical = lexical_future.result() if lexical_future else [None] * len(queries)
+        if lexical_future is None and weights is not None:
+            weights = weights[:1]
+
+        fused_results = []
+        for i, query_lexical in enumerate(lexical):
+            semantic = {key: [results[key][i]] if results.get(key) is not None else None
+                        for key in ("ids", "documents", "metadatas", "distances")}
+            rankers = [semantic] if query_lexical is None else [semantic, query_lexical]
+            fused = self._fuse(rankers, k=k, weights=weights)
+            fused.update({"semantic": semantic, "lexical": query_lexical})
+            fused_results.append(fused)
+        return fused_results
+
+    def multi_retrieve(self, queries, n_results=10, k=10, web_query=None):
+        """
+        Retrieves documents for several queries at once and fuses them with RRF.
+        
+        All queries are embedded in one batch and sent to the vector store in a single
+        query call, while the BM25 rankings (if a lexical index is set) and the optional
+        DuckDuckGo search run concurrently in worker threads.
+        
+        Parameters:
+        -----------
+        queries : list of str
+            The search queries, e.g. rewritten versions of the user question.
+        n_results : int, optional
+            Number of documents retrieved per query (default: 10).
+        k : int, optional
+            Number of fused documents to return (default: 10).
+        web_query : str, optional
+            Query for the concurrent DuckDuckGo search; skipped if None.
+        
+        Returns:
+        --------
+        dict
+            'documents', 'ids', 'scores' and 'provenance' of the top k chunks fused by RRF
+            (see rrf_ids), 'results': the raw vector store results (one list per query),
+            'web': the DuckDuckGo results or None.
+        """
+        queries = list(queries)
+        web_future = _pool.submit(tracing.wrap(self.duckduckgo_retrieve), web_query) if web_query else None
+        lexical_future = None
+        if self.lexical_index is not None:
+            lexical_future = _pool.submit(tracing.wrap(self.lexical_retrieve_batch), queries, n_results)
+        results = self.semantic_retrieve(queries, n_results=n_results)
+        # One ranker per query; each inner list is already ranked best first, as RRF expects.
+        rankers = [{"ids": [ids], "documents": [docs]} for ids, docs in zip(results['ids'], results['documents'])]
+        if lexical_future is not None:
+            rankers.extend(lexical_future.result())
+        fused = self._fuse(rankers, k=k)
+        fused.update({"results": results, "web": web_future.result() if web_future else None})
+        return fused
+
+    def _fuse(self, rankers, k=10, weights=None):
+        """Fuse single-query results on their chunk IDs and attach the fused documents."""
+        texts = {}
+        for ranker in rankers:
+            texts.update(zip(ranker['ids'][0], ranker['documents'][0]))
+        with tracing.span("search.rrf", rankers=len(rankers)):
+            fused = self.rrf_ids([ranker['ids'][0] for ranker in rankers], k=k, weights=weights)
+        fused["documents"] = [texts[doc_id] for doc_id in fused["ids"]]
+        return fused
+
     def duckduckgo_retrieve(self, query):
         """
         Retrieves search results from DuckDuckGo for the given query.
@@ -58,7 +370,9 @@ class Search:
         list
             A list of search results from DuckDuckGo.
                 """
-        results = DDGS().text(query, max_results=3)
+        from duckduckgo_search import DDGS
+        with tracing.span("search.web"):
+            results = DDGS().text(query, max_results=3)
         ans = []
         for i in results:
             ans.append(f"[{i['title']}],{i['body']}")
@@ -98,3 +412,64 @@ class Search:
         
         # Return the top k ranked documents
         return [doc[0] for doc in sorted_results[:k]]
+
+    def rrf_ids(self, ids_list, k=10, c=60, weights=None):
+        """
+        Weighted Reciprocal Rank Fusion over chunk IDs, vectorized with NumPy.
+        
+        Unlike rrf, documents are identified by their IDs, so identical chunks of different
+        articles stay separate, and all rankers are scored in one pass instead of a Python
+        dict update per document.
+        
+        Parameters:
+        -----------
+        ids_list : list of lists
+            One list of document IDs per ranker, ranked best first.
+        k : int, optional
+            Number of top results to return (default: 10).
+        c : int, optional
+            Constant to prevent division by small numbers, typically 60 (default: 60).
+        weights : list of float, optional
+            Weight of each ranker's contribution (default: 1 for every ranker).
+        
+        Returns:
+        --------
+        dict
+            'ids': top k IDs ranked by their combined RRF scores (ties keep the order of first
+            appearance), 'scores': their scores, 'provenance': for each ID a dict mapping the
+            index of every ranker that returned it to its (0-based) rank there.
+        """
+        lengths = np.array([len(ids) for ids in ids_list], dtype=np.int64)
+        if not lengths.sum():
+            return {"ids": [], "scores": [], "provenance": []}
+        if weights is None:
+            weights = np.ones(len(ids_list))
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            if len(weights) != len(ids_list):
+                raise ValueError(f"Expected {len(ids_list)} weights, got {len(weights)}")
+
+        # Flatten all rankings into one entry per (ranker, rank, id). IDs are coded in order of
+        # first appearance, so a stable sort on the scores breaks ties like the dict-based version.
+        total = int(lengths.sum())
+        codes_by_id = {}
+        codes = np.fromiter((codes_by_id.setdefault(doc_id, len(codes_by_id)) for ids in ids_list for doc_id in ids),
+                            dtype=np.intp, count=total)
+        rankers = np.repeat(np.arange(len(ids_list)), lengths)
+        ranks = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        scores = np.bincount(codes, weights=weights[rankers] / (ranks + c), minlength=len(codes_by_id))
+
+        top = np.argsort(-scores, kind='stable')[:k]
+        selected = np.zeros(len(scores), dtype=bool)
+        selected[top] = True
+        entries = np.flatnonzero(selected[codes])
+        top = top.tolist()
+        provenance = {code: {} for code in top}
+        for code, ranker, rank in zip(codes[entries].tolist(), rankers[entries].tolist(), ranks[entries].tolist()):
+            provenance[code].setdefault(ranker, rank)
+        unique_ids = list(codes_by_id)
+        return {
+            "ids": [unique_ids[code] for code in top],
+            "scores": scores[top].tolist(),
+            "provenance": [provenance[code] for code in top],
+        }
@@ -0,0 +1,53 @@
+import pytest
+from answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache(chroma_client, embedding_function):
+    return AnswerCache(chroma_client, embedding_function=embedding_function, threshold=0.99)
+
+
+def test_lookup_hits_same_question(cache):
+    cache.store("Dove si sono svolte le Olimpiadi del 1960?", "A Roma.", ["Roma 1960"], index_version="c:1")
+
+    hit = cache.lookup("Dove si sono svolte le Olimpiadi del 1960?", index_version="c:1")
+
+    assert hit["answer"] == "A Roma."
+    assert hit["sources"] == ["Roma 1960"]
+    assert cache.hits == 1
+
+
+def test_lookup_ignores_other_index_versions(cache):
+    cache.store("Chi ha acceso la fiaccola?", "Un atleta.", [], index_version="c:1")
+
+    assert cache.lookup("Chi ha acceso la fiaccola?", index_version="c:2") is None
+    assert cache.lookup("Chi ha acceso la fiaccola?", index_version="c:1") is not None
+    assert cache.misses == 1
+
+
+def test_lookup_ignores_expired_entries(cache):
+    cache.ttl = -1
+    cache.store("Quante medaglie?", "Molte.", [], index_version="c:1")
+
+    assert cache.lookup("Quante medaglie?", index_version="c:1") is None
+
+
+def test_purge_drops_other_versions(cache):
+    cache.store("Prima domanda", "Uno.", [], index_version="c:1")
+    cache.store("Seconda domanda", "Due.", [], index_version="c:2")
+
+    cache.purge(index_version="c:2")
+
+    assert cache.collection.get()["documents"] == ["Seconda domanda"]
+
+
+def test_store_purges_every_n_stores(chroma_client, embedding_function):
+    cache = AnswerCache(chroma_client, embedding_function=embedding_function, max_entries=4, purge_every=3)
+
+    for i in range(5):
+        cache.store(f"Domanda numero {i}", "Risposta.", [], index_version="c:1")
+    # The 3rd store purged under the capacity, the 4th and 5th did not purge.
+    assert cache.collection.count() == 5
+    # The 6th store evicts the least recently used entries, down to 90% of the capacity.
+    cache.store("Domanda numero 5", "Risposta.", [], index_version="c:1")
+    assert cache.collection.count() == int(cache.max_entries * 0.9)
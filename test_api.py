@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from api import MicroBatcher, create_app
+from rag_pipeline import IngestionBusy
+
+
+class StubLLM:
+    def close(self):
+        pass
+
+
+class StubPipeline:
+    """The RAGPipeline interface used by the service, answering from canned results."""
+
+    def __init__(self):
+        self.ready = True
+        self.llm = StubLLM()
+        self.batches = []
+        self.fail_answer = False
+        self.ingesting = threading.Lock()
+
+    def warm_up(self):
+        pass
+
+    def index_version(self):
+        return "c1:3"
+
+    def retrieve_batch(self, questions, n_results=10, k=10):
+        self.batches.append(list(questions))
+        return [{"ids": [f"{question}-0"], "documents": [question], "scores": [1.0],
+                 "provenance": [["semantic"]], "results": None} for question in questions]
+
+    def retrieve(self, question, n_results=10, k=10):
+        return self.retrieve_batch([question], n_results=n_results, k=k)[0]
+
+    def answer(self, question, on_text=None, on_fallback=None, retrieve=None):
+        results = retrieve(question)
+        if self.fail_answer:
+            raise RuntimeError("model unreachable")
+        if on_text is not None:
+            on_text("Roma")
+            on_text("Roma 1960")
+        return {"answer": "Roma 1960", "sources": results["documents"], "from_cache": False,
+                "fallback": False, "ttft": 0.1, "error": None}
+
+    def ingest_dump(self):
+        if not self.ingesting.acquire(blocking=False):
+            raise IngestionBusy("An ingestion is already running")
+        self.ingesting.release()
+        return "c1:4"
+
+
+@pytest.fixture
+def pipeline():
+    return StubPipeline()
+
+
+@pytest.fixture
+def client(pipeline):
+    with TestClient(create_app(pipeline, max_wait_ms=100, warm_up=False)) as client:
+        yield client
+
+
+def test_micro_batcher_batches_concurrent_items():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=20)
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(6))), batcher.batch_sizes
+        finally:
+            batcher.close()
+
+    results, batch_sizes = asyncio.run(main())
+
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert calls == [[0, 1, 2, 3], [4, 5]]
+    assert batch_sizes == [4, 2]
+
+
+def test_micro_batcher_fails_every_item_of_a_failed_batch():
+    def fail(items):
+        raise ValueError("embedding service down")
+
+    async def main():
+        batcher = MicroBatcher(fail, max_wait_ms=20)
+        try:
+            return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        finally:
+            batcher.close()
+
+    assert [str(e) for e in asyncio.run(main())] == ["embedding service down"] * 2
+
+
+def test_search_batches_default_sizes(client, pipeline):
+    threads = [threading.Thread(target=client.post, args=("/search",), kwargs={"json": {"query": f"q{i}"}})
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    response = client.post("/search", json={"query": "stadio", "n_results": 5})
+
+    assert response.status_code == 200
+    assert response.json() == {"ids": ["stadio-0"], "documents": ["stadio"], "scores": [1.0],
+                               "provenance": [["semantic"]]}
+    # The concurrent default-size searches share batches; the other one runs alone.
+    assert sorted(q for batch in pipeline.batches[:-1] for q in batch) == ["q0", "q1", "q2", "q3"]
+    assert len(pipeline.batches) < 5
+    assert pipeline.batches[-1] == ["stadio"]
+
+
+def test_answer(client):
+    response = client.post("/answer", json={"question": "Dove si tennero i giochi del 1960?"})
+
+    assert response.status_code == 200
+    assert response.json()["answer"] == "Roma 1960"
+
+
+def test_answer_stream(client, pipeline):
+    response = client.post("/answer", json={"question": "stadio", "stream": True})
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [event["event"] for event in events] == ["text", "text", "done"]
+    assert events[1]["text"] == "Roma 1960"
+    assert events[2]["sources"] == ["stadio"]
+
+    pipeline.fail_answer = True
+    response = client.post("/answer", json={"question": "stadio", "stream": True})
+
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"event": "error", "error": "model unreachable"}
+    ]
+
+
+def test_ingest_conflict(client, pipeline):
+    assert client.post("/ingest").json() == {"index_version": "c1:4"}
+
+    with pipeline.ingesting:
+        response = client.post("/ingest")
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "An ingestion is already running"
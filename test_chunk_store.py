@@ -0,0 +1,76 @@
+import pandas as pd
+from chunk_store import ChunkStore, convert_csv
+
+ARTICLES = [
+    {"id": "1", "revid": "10", "title": "Roma 1960", "text": "Città olimpica.", "chunked_text": ["Città", "olimpica."]},
+    {"id": "2", "revid": "20", "title": "Vuoto", "text": "", "chunked_text": []},
+    {"id": "3", "revid": "30", "title": "Torino 2006", "text": "Giochi invernali.", "chunked_text": ["Giochi invernali."]},
+]
+
+
+def test_round_trip_keeps_articles_and_chunk_offsets(tmp_path):
+    store = ChunkStore(str(tmp_path / "store"))
+
+    assert store.write(ARTICLES, rows_per_file=2, row_group_size=1) == 3
+
+    assert len(store.files()) == 2
+    assert len(store) == 3
+    assert store.n_chunks() == 3
+    df = store.read()
+    assert df["title"].tolist() == [article["title"] for article in ARTICLES]
+    assert [list(chunks) for chunks in df["chunked_text"]] == [article["chunked_text"] for article in ARTICLES]
+    assert df["n_chunks"].tolist() == [2, 0, 1]
+    assert df["chunk_start"].tolist() == [0, 2, 2]
+    assert list(store.iter_chunks()) == [("1", 0, "Città"), ("1", 1, "olimpica."), ("3", 0, "Giochi invernali.")]
+
+
+def test_windows_read_only_the_requested_columns(tmp_path):
+    store = ChunkStore(str(tmp_path / "store"))
+    store.write(pd.DataFrame(ARTICLES))
+
+    windows = list(store.iter_windows(window_size=2, columns=["id", "title", "chunked_text"]))
+
+    assert [len(window) for window in windows] == [2, 1]
+    assert windows[0][0] == {"id": "1", "title": "Roma 1960", "chunked_text": ["Città", "olimpica."]}
+
+
+def test_write_replaces_the_previous_content(tmp_path):
+    store = ChunkStore(str(tmp_path / "store"))
+    store.write(ARTICLES)
+
+    store.write(ARTICLES[:1])
+
+    assert store.read(columns=["id"])["id"].tolist() == ["1"]
+    assert not (tmp_path / "store.tmp").exists()
+
+
+def test_failed_write_keeps_the_previous_content(tmp_path):
+    store = ChunkStore(str(tmp_path / "store"))
+    store.write(ARTICLES)
+
+    try:
+        with store.writer() as writer:
+            writer.write(ARTICLES[:1])
+            raise RuntimeError("interrupted")
+    except RuntimeError:
+        pass
+
+    assert len(store) == 3
+
+
+def test_empty_store(tmp_path):
+    store = ChunkStore(str(tmp_path / "missing"))
+
+    assert not store.exists()
+    assert len(store.read(columns=["id", "title"])) == 0
+
+
+def test_convert_csv(tmp_path):
+    csv_path = str(tmp_path / "Wikipedia.csv")
+    pd.DataFrame(ARTICLES).to_csv(csv_path)
+
+    assert convert_csv(csv_path, str(tmp_path / "store"), chunksize=2) == 3
+
+    df = ChunkStore(str(tmp_path / "store")).read()
+    assert [list(chunks) for chunks in df["chunked_text"]] == [article["chunked_text"] for article in ARTICLES]
+    assert df["id"].tolist() == ["1", "2", "3"]
@@ -0,0 +1,60 @@
+from context_builder import ContextBuilder, merge_overlapping
+
+# Two consecutive chunks of article 1, overlapping on "allo stadio olimpico di Roma".
+FIRST = "La fiaccola arrivò allo stadio olimpico di Roma"
+SECOND = "allo stadio olimpico di Roma il 25 agosto 1960."
+
+
+def test_merge_overlapping():
+    assert merge_overlapping(FIRST, SECOND) == "La fiaccola arrivò allo stadio olimpico di Roma il 25 agosto 1960."
+    assert merge_overlapping(FIRST, "stadio olimpico") == FIRST
+    assert merge_overlapping(FIRST, "Torino ospitò i giochi invernali.") is None
+
+
+def test_passages_merge_chunks_and_drop_duplicates():
+    builder = ContextBuilder()
+
+    passages = builder.passages(["2-0", "1-1", "3-0", "1-0", "1-1"],
+                                ["Torino 2006.", SECOND, "Torino 2006.", FIRST, SECOND])
+
+    # Ordered by the rank of their best chunk; the copy of 2-0 in article 3 is dropped.
+    assert [passage["ids"] for passage in passages] == [["2-0"], ["1-0", "1-1"]]
+    assert passages[1]["text"] == merge_overlapping(FIRST, SECOND)
+    assert passages[1]["rank"] == 1
+
+
+def test_build_orders_sources_best_first_and_context_best_last():
+    builder = ContextBuilder()
+
+    packed = builder.build(["5-0", "6-0", "7-0"], ["Primo passaggio.", "Secondo passaggio.", "Terzo passaggio."],
+                           preamble="Risultati web.")
+
+    assert packed["passages"] == ["Primo passaggio.", "Secondo passaggio.", "Terzo passaggio."]
+    assert packed["ids"] == [["5-0"], ["6-0"], ["7-0"]]
+    # The most relevant passage sits last, next to the question; the preamble comes first.
+    assert packed["context"] == "Risultati web.\n\nTerzo passaggio.\n\nSecondo passaggio.\n\nPrimo passaggio."
+
+
+def test_build_stays_within_the_token_budget():
+    builder = ContextBuilder(max_context_tokens=300, reserve_tokens=100, min_passage_tokens=8)
+    documents = [" ".join(f"parola{i}{j}" for j in range(60)) for i in range(5)]
+    question, prompt = "Quale passaggio?", "Rispondi usando il contesto."
+
+    packed = builder.build([f"{i}-0" for i in range(5)], documents, question=question, prompt=prompt)
+
+    budget = builder.budget(question, prompt)
+    assert packed["tokens"] <= budget
+    # Whole passages first, then the start of the next one fills the rest of the budget.
+    assert packed["passages"][:-1] == documents[:len(packed["passages"]) - 1]
+    assert documents[len(packed["passages"]) - 1].startswith(packed["passages"][-1])
+    assert packed["passages"][-1] != documents[len(packed["passages"]) - 1]
+    assert budget - packed["tokens"] < builder.min_passage_tokens + builder.count_tokens(builder.separator)
+
+
+def test_build_skips_a_remainder_smaller_than_min_passage_tokens():
+    builder = ContextBuilder(max_context_tokens=40, reserve_tokens=0, min_passage_tokens=30)
+    first = "a" * 100
+
+    packed = builder.build(["1-0", "2-0"], [first, "b" * 400])
+
+    assert packed["passages"] == [first]
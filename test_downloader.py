@@ -0,0 +1,102 @@
+import json
+import os
+import pytest
+from bench_download import DATE, WIKI, write_series
+from downloader import Downloader, dump_series, file_digest
+from stubs import file_server
+
+SIZE = 256 * 1024
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    root = str(tmp_path / "dumps")
+    write_series(root, SIZE)
+    with open(os.path.join(root, WIKI, DATE, "dumpstatus.json")) as f:
+        files = json.load(f)["jobs"]["articlesmultistreamdump"]["files"]
+    name = min(name for name in files if "-index" not in name)
+    return root, files[name]
+
+
+def downloader(**kwargs):
+    return Downloader(part_size=64 * 1024, buffer_size=16 * 1024, progress=False, backoff_base=0.01, **kwargs)
+
+
+def test_download_resumes_an_interrupted_download(tmp_path, dumps):
+    root, dump = dumps
+    out = str(tmp_path / "dump.bz2")
+    with file_server(root, drop_every=1) as server:
+        d = downloader(connections=1, max_retries=0)
+        with pytest.raises(RuntimeError):
+            d.download(server.url + dump["url"], out, sha1=dump["sha1"])
+        d.close()
+
+    # The first part was dropped halfway: its written bytes are recorded with the partial file.
+    with open(out + ".part.json") as f:
+        done = json.load(f)["done"]
+    assert done[0] == 32 * 1024
+    assert not os.path.exists(out)
+
+    with file_server(root) as server:
+        d = downloader(connections=2)
+        d.download(server.url + dump["url"], out, sha1=dump["sha1"])
+        d.close()
+
+    assert file_digest(out) == dump["sha1"]
+    assert server.counter["bytes"] == SIZE - sum(done)
+    assert not os.path.exists(out + ".part") and not os.path.exists(out + ".part.json")
+
+
+def test_download_retries_dropped_connections(tmp_path, dumps):
+    root, dump = dumps
+    out = str(tmp_path / "dump.bz2")
+    with file_server(root, drop_every=3) as server:
+        d = downloader(connections=2)
+        d.download(server.url + dump["url"], out, md5=dump["md5"])
+        d.close()
+
+    assert server.counter["dropped"] > 0
+    assert file_digest(out, "md5") == dump["md5"]
+
+
+@pytest.mark.parametrize("checksum", ["sha1", "md5"])
+def test_download_rejects_a_checksum_mismatch(tmp_path, dumps, checksum):
+    root, dump = dumps
+    out = str(tmp_path / "dump.bz2")
+    with file_server(root) as server:
+        d = downloader()
+        with pytest.raises(ValueError, match=f"{checksum} mismatch"):
+            d.download(server.url + dump["url"], out, **{checksum: "0" * len(dump[checksum])})
+        d.close()
+
+    # Nothing is kept, so the next call downloads the file again.
+    assert os.listdir(tmp_path) == ["dumps"]
+
+
+def test_download_without_range_support(tmp_path, dumps):
+    root, dump = dumps
+    out = str(tmp_path / "dump.bz2")
+    with file_server(root, ranges=False) as server:
+        d = downloader(connections=2)
+        d.download(server.url + dump["url"], out, sha1=dump["sha1"])
+        d.close()
+
+    assert file_digest(out) == dump["sha1"]
+    assert server.counter["gets"] == 1
+
+
+def test_dump_series(dumps):
+    root, _ = dumps
+    with file_server(root) as server:
+        series = dump_series(WIKI, base_url=server.url + "/")
+        second = dump_series(WIKI, DATE, parts=[2], base_url=server.url + "/")
+        with pytest.raises(ValueError, match=r"no dump parts \[3\]"):
+            dump_series(WIKI, DATE, parts=[2, 3], base_url=server.url + "/")
+
+    assert [(dump["name"], index["name"]) for dump, index in series] == [
+        (f"{WIKI}-{DATE}-pages-articles-multistream{n}.xml-p{n}p{n * 1000}.bz2",
+         f"{WIKI}-{DATE}-pages-articles-multistream-index{n}.txt-p{n}p{n * 1000}.bz2")
+        for n in (1, 2)
+    ]
+    assert second == series[1:]
+    assert series[0][0]["url"] == f"{server.url}/{WIKI}/{DATE}/{series[0][0]['name']}"
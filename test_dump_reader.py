@@ -0,0 +1,77 @@
+import bz2
+import glob
+import json
+import os
+import sys
+from xml.sax.saxutils import escape
+import pytest
+import dump_reader
+from synthetic import SITEINFO, write_synthetic_dump
+
+try:
+    from wikiextractor import WikiExtractor
+except Exception as e:  # The released wikiextractor does not import on every Python version.
+    pytest.skip(f"WikiExtractor is not importable: {e}", allow_module_level=True)
+
+
+def extract_with_wikiextractor(dump_path, output_dir, monkeypatch):
+    """
+    Articles of a dump as written by `WikiExtractor --json --no-templates`, without the empty
+    ones: WikiExtractor writes redirects of the main namespace as articles without text,
+    which dump_reader skips and chunking would drop.
+    """
+    reduce_process = WikiExtractor.reduce_process
+
+    def flushing_reduce_process(output_queue, output):
+        # The output process exits without closing its file, losing the last buffered articles.
+        reduce_process(output_queue, output)
+        output.close()
+
+    monkeypatch.setattr(WikiExtractor, "reduce_process", flushing_reduce_process)
+    monkeypatch.setattr(sys, "argv", ["WikiExtractor.py", dump_path, "--json", "--no-templates", "--quiet",
+                                      "--processes", "1", "--output", output_dir])
+    WikiExtractor.main()
+    articles = []
+    for path in sorted(glob.glob(os.path.join(output_dir, "*", "wiki_*"))):
+        with open(path, encoding="utf-8") as f:
+            articles.extend(json.loads(line) for line in f)
+    return [article for article in articles if article["text"]]
+
+
+def extract_with_dump_reader(dump_path, index_path=None):
+    siteinfo = dump_reader.read_siteinfo(dump_path)
+    return [article for part in dump_reader.iter_dump_parts(dump_path, siteinfo, index_path=index_path, batch_bytes=1)
+            for article in dump_reader.extract_part(dump_path, part, siteinfo)]
+
+
+@pytest.mark.parametrize("multistream", [True, False])
+def test_same_articles_as_wikiextractor(tmp_path, monkeypatch, multistream):
+    dump_path, index_path = str(tmp_path / "dump.xml.bz2"), str(tmp_path / "index.txt.bz2")
+    # Includes redirects and templates, which both readers skip.
+    expected_ids = write_synthetic_dump(dump_path, 120, index_path=index_path if multistream else None,
+                                        pages_per_stream=25, multistream=multistream)
+
+    articles = extract_with_dump_reader(dump_path, index_path if multistream else None)
+
+    assert [article["id"] for article in articles] == expected_ids
+    assert articles == extract_with_wikiextractor(dump_path, str(tmp_path / "extracted"), monkeypatch)
+
+
+def test_lines_split_like_wikiextractor(tmp_path, monkeypatch):
+    # Vertical tab, form feed, NEL and U+2028/U+2029 are not line ends for WikiExtractor; \r\n and \r read as \n.
+    text = ("'''Roma''' ospitò i Giochi\x0b del 1960.\x0c\n"
+            "Una riga\x85 con <ref>note  e</ref> separatori  Unicode.\r\n"
+            "== Storia ==\nLa fiaccola\r arrivò <b>allo stadio</b>.")
+    page = ("  <page>\n    <title>Roma 1960</title>\n    <ns>0</ns>\n    <id>7</id>\n"
+            f"    <revision>\n      <id>70</id>\n      <text xml:space=\"preserve\">{escape(text)}</text>\n"
+            "    </revision>\n  </page>\n")
+    dump_path = str(tmp_path / "dump.xml.bz2")
+    with open(dump_path, "wb") as f:
+        f.write(bz2.compress(SITEINFO.encode("utf-8")))
+        f.write(bz2.compress(page.encode("utf-8")))
+        f.write(bz2.compress(b"</mediawiki>\n"))
+
+    articles = extract_with_dump_reader(dump_path)
+
+    assert [article["id"] for article in articles] == ["7"]
+    assert articles == extract_with_wikiextractor(dump_path, str(tmp_path / "extracted"), monkeypatch)
@@ -0,0 +1,60 @@
+import itertools
+import numpy as np
+import pytest
+import embedding_cache
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock, so the least recently used entry is well defined.
+    ticks = itertools.count()
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_embed_computes_only_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    cache.embed(["uno", "tre"], "model", embed)
+    embeddings = cache.embed(["tre", "quattro", "uno", "quattro"], "model", embed)
+
+    # Duplicates are embedded once, and the results come back in input order.
+    assert calls == [["uno", "tre"], ["quattro"]]
+    np.testing.assert_array_equal(embeddings, [[3, 1], [7, 1], [3, 1], [7, 1]])
+    assert cache.stats()["hits"] == 2
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]], "model")
+    cache.get_many(["a"], "model")
+
+    cache.put_many(["d"], [[4.0]], "model")
+
+    # Evicted down to 90% of the capacity: b and c were used least recently.
+    assert [e is not None for e in cache.get_many(["a", "b", "c", "d"], "model")] == [True, False, False, True]
+    assert cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_cached_embedding_function_skips_the_wrapped_function(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    def embedding_function(texts):
+        calls.append(list(texts))
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+    function = CachedEmbeddingFunction(embedding_function, cache, "model")
+    first = function(["Roma", "Torino"])
+    second = function(["Torino", "Roma"])
+
+    assert calls == [["Roma", "Torino"]]
+    np.testing.assert_array_equal(second, [first[1], first[0]])
+    cache.close()
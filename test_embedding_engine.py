@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from embedding_engine import EmbeddingEngine
+from stubs import embedding_server, fake_embedding
+
+
+def test_embed_splits_batches_and_keeps_order():
+    texts = [f"frammento {i}" for i in range(10)]
+    with embedding_server(dim=4, latency=0) as server:
+        engine = EmbeddingEngine(api_key="test", api_base=f"{server.url}/v1", batch_size=3, max_in_flight=2)
+
+        embeddings = engine.embed(texts)
+
+    np.testing.assert_allclose(embeddings, [fake_embedding(text, 4) for text in texts])
+    assert server.counter["requests"] == 4
+    assert engine.stats["chunks"] == 10
+
+
+def test_embed_retries_rate_limited_requests():
+    texts = [f"frammento {i}" for i in range(4)]
+    with embedding_server(dim=4, latency=0, rate_limit_every=2) as server:
+        engine = EmbeddingEngine(api_key="test", api_base=f"{server.url}/v1", batch_size=1, max_in_flight=1)
+
+        embeddings = engine.embed(texts)
+
+    np.testing.assert_allclose(embeddings, [fake_embedding(text, 4) for text in texts])
+    # Every second request was answered with a 429 and sent again.
+    assert engine.stats["retries"] == 3
+    assert server.counter["requests"] == 7
+
+
+def test_embed_gives_up_after_max_retries():
+    with embedding_server(dim=4, latency=0, rate_limit_every=1) as server:
+        engine = EmbeddingEngine(api_key="test", api_base=f"{server.url}/v1", max_retries=2)
+
+        with pytest.raises(Exception, match="after 2 retries"):
+            engine.embed(["frammento"])
+
+    assert server.counter["requests"] == 3
@@ -0,0 +1,98 @@
+import os
+import pytest
+from lexical_index import BM25Index, tokenize
+
+CHUNKS = {
+    "1-0": "Lo stadio olimpico di Roma ospitò la cerimonia.",
+    "1-1": "La fiaccola olimpica arrivò allo stadio.",
+    "2-0": "Torino organizzò i giochi olimpici invernali.",
+    "3-0": "Abebe Bikila vinse la maratona.",
+}
+
+
+def scores(index, query):
+    return {doc_id: pytest.approx(score) for doc_id, score in index.search(query, n_results=10)}
+
+
+def test_tokenize_strips_accents_stopwords_and_endings():
+    assert tokenize("L'atleta arrivò allo stadio olimpico") == ["atlet", "arriv", "stadi", "olimpic"]
+
+
+def test_remove_excludes_chunks_and_their_document_frequency(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    index.flush()
+
+    index.remove(["1-1"])
+
+    live = BM25Index()
+    live.add(["1-0", "2-0", "3-0"], [CHUNKS["1-0"], CHUNKS["2-0"], CHUNKS["3-0"]])
+    assert len(index) == 3
+    # Scored as if 1-1 had never been indexed, before any merge.
+    assert scores(index, "stadio olimpico") == scores(live, "stadio olimpico")
+    assert index.search("fiaccola") == []
+
+
+def test_add_replaces_a_chunk(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+
+    index.add(["3-0"], ["Bikila corse scalzo."])
+
+    assert index.search("maratona") == []
+    assert [doc_id for doc_id, _ in index.search("scalzo")] == ["3-0"]
+
+
+def test_optimize_merges_segments_and_drops_tombstones(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    for doc_id, text in CHUNKS.items():
+        index.add([doc_id], [text])
+        index.flush()
+    index.remove(["2-0"])
+    before = scores(index, "stadio olimpico giochi")
+
+    index.optimize()
+
+    assert len(index.segments) == 1
+    assert index.deleted == set()
+    assert index.doc_ids == ["1-0", "1-1", "3-0"]
+    assert scores(index, "stadio olimpico giochi") == before
+    assert sorted(os.listdir(tmp_path / "bm25")) == ["seg-000005", "segments.json"]
+
+
+def test_reload_keeps_flushed_segments_and_tombstones(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    index.flush()
+    index.remove(["1-0"])
+    index.add(["4-0"], ["Il villaggio olimpico ospitò gli atleti."])
+    index.flush()
+    # Not flushed: lost on reload.
+    index.add(["5-0"], ["Stadio del nuoto."])
+
+    reloaded = BM25Index(str(tmp_path / "bm25"))
+
+    live = BM25Index()
+    live.add(["1-1", "2-0", "3-0", "4-0"], [CHUNKS["1-1"], CHUNKS["2-0"], CHUNKS["3-0"],
+                                           "Il villaggio olimpico ospitò gli atleti."])
+    assert len(reloaded) == 4
+    assert scores(reloaded, "stadio olimpico villaggio") == scores(live, "stadio olimpico villaggio")
+    assert reloaded.search("nuoto") == []
+
+
+def test_maybe_optimize_merges_only_past_the_thresholds(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    for doc_id, text in CHUNKS.items():
+        index.add([doc_id], [text])
+        assert not index.maybe_optimize(max_segments=4)
+    assert len(index.segments) == 4
+
+    index.add(["5-0"], ["Stadio del nuoto."])
+    assert index.maybe_optimize(max_segments=4)
+    assert len(index.segments) == 1
+
+    index.remove(["1-0"])
+    assert not index.maybe_optimize(max_deleted_ratio=0.25)
+    index.remove(["1-1"])
+    assert index.maybe_optimize(max_deleted_ratio=0.25)
+    assert index.deleted == set()
@@ -0,0 +1,49 @@
+import pytest
+from ModelQuery import ModelQuery
+from stubs import chat_server
+
+
+@pytest.fixture
+def server():
+    with chat_server(ttft=0, token_delay=0, answer_tokens=6, refuse_every=2) as server:
+        yield server
+
+
+@pytest.fixture
+def llm(server):
+    llm = ModelQuery(server.url + "/v1/chat/completions", "stub", max_retries=0)
+    yield llm
+    llm.close()
+
+
+def test_stream_decodes_utf8_events_without_charset(server, llm):
+    # The stub sends text/event-stream without a charset and raw UTF-8 accented words.
+    deltas = list(llm.stream_local_model("Chi ha vinto?", None, "Rispondi."))
+
+    assert server.counter["streamed"] == 1
+    assert "".join(deltas).startswith("Città è più")
+    assert len(deltas) == 6
+
+
+def test_stream_decodes_characters_split_across_chunks():
+    # Each accented word arrives in two chunks, cut between the bytes of its first accented letter.
+    with chat_server(ttft=0, token_delay=0, answer_tokens=3, split_utf8=True) as server:
+        llm = ModelQuery(server.url + "/v1/chat/completions", "stub", max_retries=0)
+        try:
+            deltas = list(llm.stream_local_model("Chi ha vinto?", None, "Rispondi."))
+        finally:
+            llm.close()
+
+    assert deltas == ["Città", " è", " più"]
+
+
+def test_stream_query_stops_on_refusal(llm):
+    first = llm.stream_query_local_model("Prima domanda", None, "Rispondi.", stop_text="Non posso rispondere.")
+    # Every 2nd streamed request is refused: the prefix is held back and the stop text returned.
+    texts = []
+    second = llm.stream_query_local_model("Seconda domanda", None, "Rispondi.", on_text=texts.append,
+                                          stop_text="Non posso rispondere.")
+
+    assert first.startswith("Città")
+    assert second == "Non posso rispondere."
+    assert texts == []
@@ -0,0 +1,95 @@
+import threading
+import pytest
+from lexical_index import BM25Index
+from search import Search
+from stubs import BagOfWordsEmbeddingFunction, stub_duckduckgo
+
+CHUNKS = {
+    "1-0": "Lo stadio olimpico di Roma ospitò la cerimonia di apertura.",
+    "1-1": "La fiaccola arrivò allo stadio dopo un lungo viaggio.",
+    "2-0": "Torino organizzò i giochi invernali del 2006.",
+    "3-0": "Abebe Bikila vinse la maratona correndo scalzo.",
+}
+
+
+@pytest.fixture
+def search(chroma_client):
+    collection = chroma_client.create_collection("docs", embedding_function=BagOfWordsEmbeddingFunction(dim=64))
+    collection.add(ids=list(CHUNKS), documents=list(CHUNKS.values()))
+    lexical_index = BM25Index()
+    lexical_index.add(list(CHUNKS), list(CHUNKS.values()))
+    return Search(collection, lexical_index=lexical_index)
+
+
+def test_multi_retrieve_fuses_every_query_and_ranker(search):
+    with stub_duckduckgo(latency=0) as web:
+        fused = search.multi_retrieve(["stadio olimpico", "maratona scalzo"], n_results=2, k=3, web_query="Roma 1960")
+
+    # One semantic ranker per query, then one BM25 ranker per query.
+    assert fused["results"]["ids"] == [["1-0", "1-1"], ["3-0", "1-1"]]
+    # 1-1 is second in three rankings (3/62), ahead of chunks first in two of them (2/61).
+    assert fused["ids"] == ["1-1", "1-0", "3-0"]
+    assert fused["provenance"] == [{0: 1, 1: 1, 2: 1}, {0: 0, 2: 0}, {1: 0, 3: 0}]
+    assert fused["documents"] == [CHUNKS[doc_id] for doc_id in fused["ids"]]
+    assert web.calls == 1
+    assert fused["web"].startswith("[Roma 1960 (1)]")
+
+
+def test_multi_retrieve_without_lexical_index_or_web(search):
+    search.lexical_index = None
+
+    fused = search.multi_retrieve(["giochi invernali"], n_results=1, k=1)
+
+    assert fused["ids"] == ["2-0"]
+    assert fused["web"] is None
+
+
+def test_searches_share_one_thread_pool(search):
+    search.multi_retrieve(["stadio"], n_results=1)
+    threads = threading.active_count()
+
+    for _ in range(10):
+        Search(search.db, lexical_index=search.lexical_index).multi_retrieve(["stadio"], n_results=1)
+
+    assert threading.active_count() == threads
+
+
+@pytest.fixture
+def fusion():
+    return Search(None)
+
+
+def test_rrf_sums_reciprocal_ranks(fusion):
+    # b: 1/61 + 1/60, a: 1/60 + 1/62, c: 1/62 + 1/61, d: 1/63
+    fused = fusion.rrf([["a", "b", "c"], ["b", "c", "a", "d"]], k=10)
+
+    assert fused == ["b", "a", "c", "d"]
+    assert fusion.rrf([["a", "b", "c"], ["b", "c", "a", "d"]], k=2) == ["b", "a"]
+
+
+def test_rrf_ids_matches_rrf(fusion):
+    rankings = [["1-0", "2-3", "7-1", "4-0"], ["2-3", "4-0", "9-9"], ["7-1", "1-0"]]
+
+    fused = fusion.rrf_ids(rankings, k=10)
+
+    assert fused["ids"] == fusion.rrf(rankings, k=10)
+    assert fused["scores"][0] == pytest.approx(1 / 61 + 1 / 60)
+    assert fused["scores"] == sorted(fused["scores"], reverse=True)
+
+
+def test_rrf_ids_ties_keep_first_appearance(fusion):
+    assert fusion.rrf_ids([["a", "b"], ["b", "a"]], k=2)["ids"] == ["a", "b"]
+
+
+def test_rrf_ids_weights_and_provenance(fusion):
+    fused = fusion.rrf_ids([["a", "b"], ["b", "c"]], k=3, weights=[1.0, 3.0])
+
+    assert fused["ids"] == ["b", "c", "a"]
+    assert fused["scores"][0] == pytest.approx(1 / 61 + 3 / 60)
+    assert fused["provenance"] == [{0: 1, 1: 0}, {1: 1}, {0: 0}]
+
+
+def test_rrf_ids_edge_cases(fusion):
+    assert fusion.rrf_ids([[], []]) == {"ids": [], "scores": [], "provenance": []}
+    with pytest.raises(ValueError):
+        fusion.rrf_ids([["a"], ["b"]], weights=[1.0])
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+import rag_pipeline
+from vector_index import QuantizedVectorIndex
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    # Clustered, like sentence embeddings, so neighbours are close and quantization errors matter.
+    centers = rng.normal(size=(20, 32)).astype(np.float32)
+    return (centers[rng.integers(0, 20, 2000)] + 0.3 * rng.normal(size=(2000, 32))).astype(np.float32)
+
+
+@pytest.fixture
+def collection(chroma_client, vectors):
+    collection = chroma_client.create_collection("docs", embedding_function=None)
+    collection.add(ids=[f"{i}-0" for i in range(len(vectors))], embeddings=vectors)
+    return collection
+
+
+def exact_neighbours(vectors, queries, k):
+    distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    return [[f"{i}-0" for i in np.argsort(row, kind="stable")[:k]] for row in distances]
+
+
+def recall(index, vectors, queries, k=10):
+    truth = exact_neighbours(vectors, queries, k)
+    found = index.query(queries, n_results=k)["ids"]
+    return np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)])
+
+
+@pytest.mark.parametrize("mode", QuantizedVectorIndex.MODES)
+def test_build_load_and_search(tmp_path, collection, vectors, mode):
+    path = str(tmp_path / "index")
+
+    built = QuantizedVectorIndex.build(collection, path, mode=mode, page_size=300, index_version="c:1")
+    index = QuantizedVectorIndex(path)
+
+    assert len(index) == len(built) == 2000
+    assert index.meta["index_version"] == "c:1" and index.mode == mode
+    ids, distances = index.search(vectors[7], k=3)
+    assert ids[0] == "7-0"
+    assert distances[0] == pytest.approx(0, abs=1e-6)
+    # Rescored with the float32 vectors: the distances are exact.
+    assert distances == pytest.approx(((vectors[[int(i.split("-")[0]) for i in ids]] - vectors[7]) ** 2).sum(axis=1), rel=1e-5)
+
+
+def test_rescoring_recovers_the_exact_neighbours(tmp_path, collection, vectors):
+    queries = vectors[:50] + 0.05 * np.random.default_rng(1).normal(size=(50, 32)).astype(np.float32)
+
+    rescored = QuantizedVectorIndex.build(collection, str(tmp_path / "full"), mode="int8")
+    codes_only = QuantizedVectorIndex.build(collection, str(tmp_path / "codes"), mode="int8", store_full=False)
+
+    assert recall(rescored, vectors, queries) == 1.0
+    assert 0.8 < recall(codes_only, vectors, queries) <= 1.0
+    assert codes_only.vectors is None
+
+
+def test_build_switches_versioned_directories(tmp_path, collection):
+    path = str(tmp_path / "index")
+    first = QuantizedVectorIndex.build(collection, path)
+    second = QuantizedVectorIndex.build(collection, path)
+    # A build still being written, e.g. by another process, started after the second one.
+    pending = tmp_path / f"index.v{int(os.path.basename(second.path).rpartition('.v')[2]) + 1}"
+    pending.mkdir()
+
+    third = QuantizedVectorIndex.build(collection, path)
+
+    assert os.path.realpath(path) == third.path
+    # The previous build is kept for the processes still loading it, older ones are removed.
+    assert os.path.isdir(second.path) and not os.path.exists(first.path)
+    assert pending.is_dir()
+    assert len(QuantizedVectorIndex(path)) == 2000
+
+
+def test_load_vector_index_does_not_build(tmp_path, monkeypatch, collection):
+    class Store:
+        def index_version(self):
+            return "c:2"
+
+        def build_vector_index(self, *args, **kwargs):
+            raise AssertionError("serving processes must not build the index")
+
+    path = str(tmp_path / "index")
+    monkeypatch.setattr(rag_pipeline, "VECTOR_INDEX_MODE", "int8")
+    monkeypatch.setattr(rag_pipeline, "VECTOR_INDEX_PATH", path)
+
+    assert rag_pipeline.load_vector_index(Store()) is None
+    QuantizedVectorIndex.build(collection, path, index_version="c:1")
+    assert rag_pipeline.load_vector_index(Store()) is None
+    QuantizedVectorIndex.build(collection, path, index_version="c:2")
+    assert len(rag_pipeline.load_vector_index(Store())) == 2000
@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+from chunk_store import ChunkStore
+from index_manifest import IndexManifest, content_hash
+from VectorStore import VectorStore
+
+
+@pytest.fixture
+def vs(tmp_path, chroma_client, embedding_function):
+    return VectorStore("wikipedia_docs", "wikipedia_keywords", chroma_client=chroma_client,
+                       embedding_function=embedding_function, lexical_index_path=str(tmp_path / "bm25"),
+                       chunk_index_path=str(tmp_path / "chunk_index.sqlite3"))
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite3"))
+    yield manifest
+    manifest.close()
+
+
+def article(article_id, title, chunks):
+    return {"id": article_id, "title": title, "content_hash": content_hash(" ".join(chunks)), "chunked_text": chunks}
+
+
+def documents(collection):
+    records = collection.get(include=["documents"])
+    return dict(zip(records["ids"], records["documents"]))
+
+
+def test_incremental_ingest_updates_and_deletes(vs, manifest):
+    first = vs.ingest_incremental([[article("1", "Roma", ["stadio olimpico", "fiaccola accesa", "cerimonia finale"]),
+                                    article("2", "Pisa", ["torre pendente"])]], manifest, source="dump-1")
+    version = vs.index_version()
+    # Article 1 shrinks and changes its first chunk, 2 is gone from the source, 3 is new.
+    second = vs.ingest_incremental([[article("1", "Roma", ["stadio rinnovato", "fiaccola accesa"]),
+                                     article("3", "Torino", ["giochi invernali"])]], manifest, source="dump-2")
+
+    assert first == {"added": 2, "updated": 0, "unchanged": 0, "deleted": 0}
+    assert second == {"added": 1, "updated": 1, "unchanged": 0, "deleted": 1}
+    assert documents(vs.doc_collection) == {"1-0": "stadio rinnovato", "1-1": "fiaccola accesa", "3-0": "giochi invernali"}
+    assert sorted(vs.keyword_collection.get()["ids"]) == ["1", "3"]
+    assert vs.keyword_collection.get(ids=["1"])["metadatas"][0]["n_chunks"] == 2
+    assert [doc_id for doc_id, _ in vs.lexical_index.search("stadio")] == ["1-0"]
+    assert vs.lexical_index.search("cerimonia") == []
+    assert vs.lexical_index.search("torre") == []
+    assert manifest.get_article("2") is None
+    assert manifest.get_article("1")["chunk_ids"] == ["1-0", "1-1"]
+    assert vs.index_version() != version
+
+
+def test_incremental_ingest_skips_unchanged_articles(vs, manifest):
+    vs.ingest_incremental([[article("1", "Roma", ["stadio olimpico"])]], manifest, source="dump-1")
+    version = vs.index_version()
+
+    stats = vs.ingest_incremental([[{"id": "1", "title": "Roma", "content_hash": None, "chunked_text": None}]],
+                                  manifest, source="dump-2")
+
+    assert stats == {"added": 0, "updated": 0, "unchanged": 1, "deleted": 0}
+    assert documents(vs.doc_collection) == {"1-0": "stadio olimpico"}
+    assert vs.index_version() == version
+
+
+def test_incremental_ingest_without_articles_deletes_nothing(vs, manifest):
+    vs.ingest_incremental([[article("1", "Roma", ["stadio olimpico"])]], manifest, source="dump-1")
+
+    # E.g. no dump part selected: the run must not take every indexed article for deleted.
+    with pytest.raises(ValueError):
+        vs.ingest_incremental([], manifest, source="dump-2")
+
+    assert documents(vs.doc_collection) == {"1-0": "stadio olimpico"}
+    assert manifest.get_article("1") is not None
+
+
+def test_process_all_overwrites_reingested_articles(vs):
+    vs.process_all(pd.DataFrame([{"id": 1, "title": "Roma", "chunked_text": ["vecchio uno", "vecchio due", "vecchio tre"]},
+                                 {"id": 2, "title": "Pisa", "chunked_text": ["torre"]}]))
+
+    vs.process_all(pd.DataFrame([{"id": 1, "title": "Roma", "chunked_text": ["nuovo uno"]}]))
+
+    assert documents(vs.doc_collection) == {"1-0": "nuovo uno", "2-0": "torre"}
+    assert vs.keyword_collection.get(ids=["1"])["metadatas"][0]["n_chunks"] == 1
+    assert vs.lexical_index.search("vecchio") == []
+    assert [doc_id for doc_id, _ in vs.lexical_index.search("nuovo")] == ["1-0"]
+
+
+def test_reopen_sees_vectors_added_by_another_process(tmp_path, vs):
+    vs.doc_collection.add(ids=["1-0"], documents=["stadio olimpico"])
+    # Loads the collection's HNSW index in this process.
+    assert vs.doc_collection.query(query_texts=["stadio olimpico"], n_results=1)["ids"] == [["1-0"]]
+
+    subprocess.run([sys.executable, "-c", (
+        "import chromadb\n"
+        "from conftest import HashEmbedding\n"
+        f"client = chromadb.PersistentClient(path={str(tmp_path / 'chroma')!r})\n"
+        "collection = client.get_collection('wikipedia_docs', embedding_function=HashEmbedding())\n"
+        "collection.add(ids=['2-0'], documents=['torre pendente'])\n"
+    )], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    vs.reopen()
+
+    assert vs.doc_collection.query(query_texts=["torre pendente"], n_results=1)["ids"] == [["2-0"]]
+
+
+def test_process_all_streams_a_chunk_store(tmp_path, chroma_client, embedding_function):
+    store_path = str(tmp_path / "chunk_store")
+    ChunkStore(store_path).write([{"id": str(i), "title": f"Articolo {i}", "chunked_text": [f"testo {i}"] * (i % 3 + 1)}
+                                  for i in range(10)])
+    vs = VectorStore("wikipedia_docs", "wikipedia_keywords", data_path=store_path, chroma_client=chroma_client,
+                     embedding_function=embedding_function)
+
+    assert vs.process_all() == (10, 19)
+    assert vs.doc_collection.count() == 19
+    assert vs.keyword_collection.count() == 10
+    # Streamed window by window: the store is never loaded as a DataFrame.
+    assert vs._df is None
+
+
+def test_process_all_leaves_unchunked_articles(vs):
+    vs.process_all(pd.DataFrame([article("1", "Roma", ["stadio olimpico"])]))
+
+    # Article 1 unchanged (skipped by a manifest), article 2 new.
+    df = vs.process_all(pd.DataFrame([{"id": "1", "title": "Roma", "content_hash": None, "chunked_text": None},
+                                      article("2", "Pisa", ["torre pendente"])]))
+
+    assert df["article_id"].tolist() == ["2"]
+    assert documents(vs.doc_collection) == {"1-0": "stadio olimpico", "2-0": "torre pendente"}
+    assert sorted(vs.keyword_collection.get()["ids"]) == ["1", "2"]
@@ -0,0 +1,67 @@
+import json
+import pandas as pd
+from chunk_store import ChunkStore
+from index_manifest import IndexManifest, content_hash
+from wikipedia_dump_processor import WikipediaDumpProcessor
+
+
+def write_extracted_files(base_dir, n_files=5, per_file=4):
+    """Writes WikiExtractor-style JSON files (AA/wiki_NN), one article per line."""
+    directory = base_dir / "AA"
+    directory.mkdir(parents=True)
+    articles = []
+    for i in range(n_files):
+        with open(directory / f"wiki_{i:02d}", "w", encoding="utf-8") as f:
+            for j in range(per_file):
+                n = i * per_file + j
+                article = {"id": str(n), "title": f"Articolo {n}", "text": f"Testo dell'articolo {n}. " * (n % 3 + 1)}
+                f.write(json.dumps(article) + "\n")
+                articles.append(article)
+    return articles
+
+
+def test_parallel_chunking_keeps_file_order(tmp_path):
+    articles = write_extracted_files(tmp_path / "extracted")
+    processor = WikipediaDumpProcessor(None, None, str(tmp_path), str(tmp_path / "extracted"))
+
+    sequential = list(processor.iter_chunked_articles(workers=1))
+    parallel = list(processor.iter_chunked_articles(workers=2))
+
+    assert [article["id"] for article in parallel] == [article["id"] for article in articles]
+    assert parallel == sequential
+
+
+def test_parallel_chunking_skips_unchanged_articles(tmp_path):
+    articles = write_extracted_files(tmp_path / "extracted")
+    processor = WikipediaDumpProcessor(None, None, str(tmp_path), str(tmp_path / "extracted"))
+    manifest_path = str(tmp_path / "manifest.sqlite3")
+    manifest = IndexManifest(manifest_path)
+    manifest.put_articles([{"article_id": "3", "title": "Articolo 3", "keyword_id": "3", "chunk_ids": ["3-0"],
+                            "chunk_hashes": [], "content_hash": content_hash(f"Articolo 3\n{articles[3]['text']}")}],
+                          run_id=1)
+    manifest.commit()
+    # The workers only read the manifest, so they do not wait for the parent's open write transaction.
+    manifest.touch(["3"], run_id=2)
+
+    chunked = list(processor.iter_chunked_articles(workers=2, manifest_path=manifest_path))
+    manifest.close()
+
+    assert [article["id"] for article in chunked] == [article["id"] for article in articles]
+    assert [article["id"] for article in chunked if article["chunked_text"] is None] == ["3"]
+
+
+def test_chunk_dataframe_text_writes_a_store_only_when_asked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor = WikipediaDumpProcessor(None, None, str(tmp_path), str(tmp_path))
+    df = pd.DataFrame([{"id": "1", "title": "Roma", "text": "Città olimpica."},
+                       {"id": "2", "title": "Vuoto", "text": None}])
+
+    chunked = processor.chunk_dataframe_text(df.copy(), "text")
+
+    assert chunked["id"].tolist() == ["1"]
+    assert chunked["chunked_text"].tolist() == [["Città olimpica."]]
+    assert list(tmp_path.iterdir()) == []
+
+    processor.chunk_dataframe_text(df.copy(), "text", store_path=str(tmp_path / "store"))
+
+    assert ChunkStore(str(tmp_path / "store")).read(columns=["id"])["id"].tolist() == ["1"]
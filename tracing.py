@@ -0,0 +1,260 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Upper bounds (seconds) of the latency histogram buckets, from a cache lookup to a long generation.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Traces (e.g. answers) taking at least this long are written, with all their spans, to the slow-query log.
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "5"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "Data/slow_queries.jsonl")
+
+_current = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_histograms = {}
+_errors = {}
+_slow_queries = 0
+
+
+class Histogram:
+    """Thread-safe latency histogram with fixed buckets, in the Prometheus layout."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, including +Inf, sum, count)."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the largest bucket bound for +Inf)."""
+        cumulative, _, count = self.snapshot()
+        if not count:
+            return None
+        index = bisect.bisect_left(cumulative, q * count)
+        return self.buckets[min(index, len(self.buckets) - 1)]
+
+
+class Span:
+    """One timed stage of a request, with its attributes and nested stages."""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attributes):
+        """Attach attributes, e.g. result sizes, to the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": round(1000 * self.duration, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def histogram(name):
+    """Return the latency histogram of a stage, creating it on first use."""
+    try:
+        return _histograms[name]
+    except KeyError:
+        with _lock:
+            return _histograms.setdefault(name, Histogram())
+
+
+def observe(name, seconds):
+    """Record a latency measured elsewhere (e.g. time to first token) in the histogram of `name`."""
+    histogram(name).observe(seconds)
+
+
+@lru_cache(maxsize=None)
+def _otel_tracer():
+    """
+    The OpenTelemetry tracer spans are mirrored to, or None. Only set up when an OTLP endpoint is
+    configured (OTEL_EXPORTER_OTLP_ENDPOINT, standard OpenTelemetry variables apply), so the SDK
+    is not imported otherwise.
+    """
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OpenTelemetry SDK not installed, spans are only recorded in the metrics.")
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "wiki-rag")}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider.get_tracer("wiki-rag")
+
+
+def otel_enabled():
+    return _otel_tracer() is not None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage of the current request. The duration is recorded in the stage's histogram,
+    and the span is nested in the enclosing one, so a trace holds the breakdown of a request.
+
+    Args:
+        name (str): Stage name, e.g. "search.vector_search".
+        **attributes: Values describing the call, e.g. the number of queries.
+
+    Yields:
+        Span: The span, to attach attributes computed inside the stage.
+    """
+    parent = _current.get()
+    current = Span(name, attributes)
+    token = _current.set(current)
+    tracer = _otel_tracer()
+    otel_span = tracer.start_as_current_span(name, attributes=_otel_attributes(attributes)) if tracer else None
+    if otel_span is not None:
+        otel = otel_span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        with _lock:
+            _errors[name] = _errors.get(name, 0) + 1
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current.reset(token)
+        histogram(name).observe(current.duration)
+        if parent is not None:
+            parent.children.append(current)
+        if otel_span is not None:
+            otel.set_attributes(_otel_attributes(current.attributes))
+            otel_span.__exit__(None, None, None)
+
+
+def _otel_attributes(attributes):
+    return {key: value if isinstance(value, (bool, int, float, str)) else str(value)
+            for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Like span, for the root of a request (an answer, a search): when it takes at least
+    SLOW_QUERY_SECONDS, the whole span tree is appended to the slow-query log.
+    """
+    root = None
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        # The duration is only known once the span is closed, also when the request failed.
+        if root is not None and root.duration >= SLOW_QUERY_SECONDS:
+            _log_slow_query(root)
+
+
+def _log_slow_query(root):
+    global _slow_queries
+    stages = ", ".join(f"{child.name} {child.duration:.2f}s" for child in root.children)
+    print(f"Slow {root.name} ({root.duration:.2f}s): {stages}")
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(root.start)), **root.to_dict()}
+    with _lock:
+        _slow_queries += 1
+        try:
+            if os.path.dirname(SLOW_QUERY_LOG):
+                os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+            with open(SLOW_QUERY_LOG, "a") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"Cannot write the slow-query log {SLOW_QUERY_LOG}: {e}")
+
+
+def wrap(function):
+    """
+    Bind `function` to the current trace, for running it in another thread (e.g. a pool
+    submit): its spans are then nested in the current span. Each wrapped function is
+    meant to be called once.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+def summary():
+    """
+    Return the recorded stages with 'count', 'mean_ms', 'p50_ms' and 'p95_ms' (the upper
+    bounds of the buckets holding those quantiles) and 'errors'.
+    """
+    stages = {}
+    for name, hist in sorted(list(_histograms.items())):
+        _, total, count = hist.snapshot()
+        if not count:
+            continue
+        stages[name] = {
+            "count": count,
+            "mean_ms": 1000 * total / count,
+            "p50_ms": 1000 * hist.quantile(0.5),
+            "p95_ms": 1000 * hist.quantile(0.95),
+            "errors": _errors.get(name, 0),
+        }
+    return stages
+
+
+def reset():
+    """Drop all recorded metrics."""
+    global _slow_queries
+    with _lock:
+        _histograms.clear()
+        _errors.clear()
+        _slow_queries = 0
+
+
+def metrics_text():
+    """Return the stage histograms, error counts and slow-query count in the Prometheus text format."""
+    lines = [
+        "# HELP rag_stage_duration_seconds Latency of each stage of the query and ingestion paths.",
+        "# TYPE rag_stage_duration_seconds histogram",
+    ]
+    for name, hist in sorted(list(_histograms.items())):
+        cumulative, total, count = hist.snapshot()
+        for bound, n in zip(list(hist.buckets) + ["+Inf"], cumulative):
+            lines.append(f'rag_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {n}')
+        lines.append(f'rag_stage_duration_seconds_sum{{stage="{name}"}} {total}')
+        lines.append(f'rag_stage_duration_seconds_count{{stage="{name}"}} {count}')
+    lines += [
+        "# HELP rag_stage_errors_total Stages that raised an exception.",
+        "# TYPE rag_stage_errors_total counter",
+    ]
+    lines += [f'rag_stage_errors_total{{stage="{name}"}} {n}' for name, n in sorted(list(_errors.items()))]
+    lines += [
+        "# HELP rag_slow_queries_total Traces written to the slow-query log.",
+        "# TYPE rag_slow_queries_total counter",
+        f"rag_slow_queries_total {_slow_queries}",
+    ]
+    return "\n".join(lines) + "\n"
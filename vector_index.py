@@ -0,0 +1,672 @@
+import argparse
+import bisect
+import json
+import os
+import shutil
+import time
+from array import array
+import numpy as np
+
+
+def _save(path, name, array):
+    """
+    Save an array as `name` in `path` through a temporary file and an atomic rename, so
+    processes that have the previous file memory-mapped keep reading a consistent copy.
+    """
+    target = os.path.join(path, name)
+    with open(target + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(target + ".tmp", target)
+
+
+def _save_json(path, name, value):
+    target = os.path.join(path, name)
+    with open(target + ".tmp", "w") as f:
+        json.dump(value, f)
+    os.replace(target + ".tmp", target)
+
+
+def _open_array(path, name, dtype, shape):
+    """
+    Create `name` in `path` as a writable memory-mapped array, under a temporary name until
+    `_commit` renames it, like `_save` does.
+    """
+    return np.lib.format.open_memmap(os.path.join(path, name + ".tmp"), mode="w+", dtype=dtype, shape=shape)
+
+
+def _commit(path, name, array):
+    """Flush an array created by `_open_array` and move it into place."""
+    array.flush()
+    os.replace(os.path.join(path, name + ".tmp"), os.path.join(path, name))
+
+
+def _stage_embeddings(collection, path, page_size, on_page=None, include=()):
+    """
+    Read the embeddings of a Chroma collection page by page into a memory-mapped float32
+    `vectors.npy.tmp` in `path`, so they are never all held in RAM, passing each page (with
+    the `include` fields) to `on_page`.
+
+    Returns:
+        tuple: (ids, vectors) with the staged vectors memory-mapped.
+    """
+    count = collection.count()
+    ids, vectors = [], None
+    while True:
+        page = collection.get(include=['embeddings', *include], limit=page_size, offset=len(ids))
+        if not page['ids']:
+            break
+        embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+        if vectors is None:
+            vectors = _open_array(path, "vectors.npy", np.float32, (count, embeddings.shape[1]))
+        if len(ids) + len(embeddings) > count:
+            raise RuntimeError(f"Collection {collection.name} changed during the export")
+        vectors[len(ids):len(ids) + len(embeddings)] = embeddings
+        ids.extend(page['ids'])
+        if on_page is not None:
+            on_page(page)
+    if vectors is None:
+        vectors = _open_array(path, "vectors.npy", np.float32, (0, 0))
+    if len(ids) != len(vectors):
+        raise RuntimeError(f"Collection {collection.name} changed during the export")
+    return ids, vectors
+
+
+def _new_version(path):
+    """Create and return a new `<path>.v<timestamp>` directory, to be written and then switched to."""
+    directory = f"{path}.v{time.time_ns()}"
+    os.makedirs(directory)
+    return directory
+
+
+def _switch(path, directory):
+    """
+    Point the symbolic link `path` to the `directory` written for it (see `_new_version`) with
+    one atomic rename, then remove the directories older than the previous one, which processes
+    may still be opening. Newer ones, e.g. still being written by another process, are kept.
+    """
+    # Unique, so processes switching the same path at once do not share the temporary link.
+    link = f"{directory}.link"
+    os.symlink(os.path.basename(directory), link)
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Written in place, before the directories were versioned.
+        shutil.rmtree(path)
+    os.replace(link, path)
+    parent, prefix = os.path.split(path)
+    prefix += ".v"
+    keep = min(_version_of(directory), _version_of(previous) if previous else _version_of(directory))
+    for name in os.listdir(parent or "."):
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and int(name[len(prefix):]) < keep:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def _version_of(directory):
+    """Return the timestamp of a `<path>.v<timestamp>` directory, or -1 for any other directory."""
+    suffix = directory.rpartition(".v")[2]
+    return int(suffix) if suffix.isdigit() else -1
+
+
+def _finish_vectors(path, store_full):
+    """Move the staged float32 vectors into place, or drop them (and a previous copy) if they are not kept."""
+    full_path = os.path.join(path, "vectors.npy")
+    if store_full:
+        os.replace(full_path + ".tmp", full_path)
+        return
+    for stale_path in (full_path + ".tmp", full_path):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+
+class QuantizedVectorIndex:
+    """
+    Compressed, brute-force vector tier kept beside a Chroma collection.
+
+    Vectors are held in RAM as float16 or int8 codes (per-dimension scalar quantization) and
+    every query scans all of them in blocks: this is not an approximate nearest-neighbour
+    index, its cost grows linearly with the collection. The best `n_candidates` are then
+    rescored with the full-precision vectors, which stay on disk in a memory-mapped float32
+    file, so only the candidates' pages are read. Distances are squared L2, like Chroma's
+    default space.
+    """
+    MODES = ("float16", "int8")
+    BLOCK_SIZE = 4096
+
+    def __init__(self, path, mmap=False):
+        """
+        Load an index written by `build`.
+
+        Args:
+            path (str): Directory of the index, or the link to it written by `build`.
+            mmap (bool): Memory-map the codes instead of reading them into RAM, so processes
+                loading the same index share one page-cached copy.
+        """
+        # Resolved once, so every file is read from the same build even if the link is switched meanwhile.
+        path = os.path.realpath(path)
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.ids = self._load_ids(path)
+        self.mode = self.meta["mode"]
+        mmap_mode = "r" if mmap else None
+        self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode)
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode=mmap_mode)
+        if self.mode == "int8":
+            self.scale = np.load(os.path.join(path, "scale.npy"))
+            self.minimum = np.load(os.path.join(path, "minimum.npy"))
+        full_path = os.path.join(path, "vectors.npy")
+        self.vectors = np.load(full_path, mmap_mode="r") if os.path.exists(full_path) else None
+
+    @staticmethod
+    def _load_ids(path):
+        with open(os.path.join(path, "ids.json")) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_ids(path, ids):
+        _save_json(path, "ids.json", list(ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, collection, path, mode="int8", store_full=True, page_size=5000, index_version=None):
+        """
+        Export the embeddings of a Chroma collection into a compressed index.
+
+        Args:
+            collection: Chroma collection to export.
+            path (str): Path of the index: a symbolic link switched atomically to a new
+                `<path>.v<timestamp>` directory once it is complete (see MappedCollection.export),
+                so concurrent builds never write the same files and readers never load a
+                partial index.
+            mode (str): "float16" or "int8".
+            store_full (bool): Also write the float32 vectors to disk for rescoring.
+            page_size (int): Number of records read from the collection at a time.
+            index_version (str, optional): Version of the collection (see VectorStore.index_version),
+                stored so stale indexes can be detected.
+
+        Returns:
+            QuantizedVectorIndex: The loaded index.
+        """
+        if mode not in cls.MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}. Use one of {cls.MODES}")
+        directory = _new_version(path)
+        try:
+            ids, vectors = _stage_embeddings(collection, directory, page_size)
+            cls._write_codes(directory, vectors, mode)
+            shape = vectors.shape
+            del vectors
+            _finish_vectors(directory, store_full)
+            cls._write_meta(directory, ids, shape, mode, index_version)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        _switch(path, directory)
+        return cls(path)
+
+    @classmethod
+    def write(cls, path, ids, vectors, mode="int8", store_full=True, index_version=None, **meta):
+        """
+        Quantize float32 `vectors` (one row per ID) and write the index files to `path`.
+        Extra keyword arguments are stored in meta.json.
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        cls._write_codes(path, vectors, mode)
+        full_path = os.path.join(path, "vectors.npy")
+        if store_full:
+            _save(path, "vectors.npy", vectors)
+        elif os.path.exists(full_path):
+            os.remove(full_path)
+        cls._write_meta(path, ids, vectors.shape, mode, index_version, **meta)
+
+    @classmethod
+    def _write_codes(cls, path, vectors, mode):
+        """
+        Write the codes, norms and quantization parameters of `vectors` (e.g. memory-mapped),
+        reading and writing one block of rows at a time: a first pass finds the range of
+        every dimension for int8, a second one quantizes.
+        """
+        n, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+        if mode == "int8":
+            minimum = np.zeros(dim, dtype=np.float32)
+            scale = np.ones(dim, dtype=np.float32)
+            if n:
+                minimum = np.full(dim, np.inf, dtype=np.float32)
+                maximum = np.full(dim, -np.inf, dtype=np.float32)
+                for start in range(0, n, cls.BLOCK_SIZE):
+                    block = vectors[start:start + cls.BLOCK_SIZE]
+                    np.minimum(minimum, block.min(axis=0), out=minimum)
+                    np.maximum(maximum, block.max(axis=0), out=maximum)
+                scale = (maximum - minimum) / 255
+                scale[scale == 0] = 1.0
+            _save(path, "scale.npy", scale)
+            _save(path, "minimum.npy", minimum)
+        codes = _open_array(path, "codes.npy", np.float16 if mode == "float16" else np.int8, (n, dim))
+        norms = _open_array(path, "norms.npy", np.float32, (n,))
+        for start in range(0, n, cls.BLOCK_SIZE):
+            block = np.asarray(vectors[start:start + cls.BLOCK_SIZE], dtype=np.float32)
+            norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+            if mode == "float16":
+                codes[start:start + len(block)] = block
+            else:
+                codes[start:start + len(block)] = np.rint((block - minimum) / scale) - 128
+        _commit(path, "codes.npy", codes)
+        _commit(path, "norms.npy", norms)
+
+    @classmethod
+    def _write_meta(cls, path, ids, shape, mode, index_version, **meta):
+        cls._write_ids(path, ids)
+        # meta.json is written last, so a partially written index is never loaded as complete.
+        _save_json(path, "meta.json", {
+            "mode": mode, "count": len(ids), "dim": int(shape[1]) if len(shape) == 2 else 0,
+            "index_version": index_version, "created_at": time.time(), **meta
+        })
+
+    def memory_bytes(self):
+        """Return the bytes held in RAM (codes, norms and quantization parameters)."""
+        total = self.codes.nbytes + self.norms.nbytes
+        if self.mode == "int8":
+            total += self.scale.nbytes + self.minimum.nbytes
+        return total
+
+    def _approximate_scores(self, queries):
+        """
+        Return 2 x.q - |x|^2 for every vector x and query q (higher is closer), computed from
+        the codes. Each block of codes is decoded once for all the queries.
+        """
+        if self.mode == "int8":
+            # x = minimum + (code + 128) * scale, so x.q = code.(scale*q) + a constant shared by all x.
+            weights = queries * self.scale
+            constant = queries @ self.minimum + 128 * weights.sum(axis=1)
+        else:
+            weights, constant = queries, np.zeros(len(queries), dtype=np.float32)
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.BLOCK_SIZE):
+            block = self.codes[start:start + self.BLOCK_SIZE].astype(np.float32)
+            scores[:, start:start + self.BLOCK_SIZE] = weights @ block.T
+        return 2 * (scores + constant[:, None]) - self.norms
+
+    def _rescore(self, query, scores, k, n_candidates):
+        """Return the positions and squared L2 distances of the k nearest candidates, closest first."""
+        n_candidates = min(len(scores), max(k, n_candidates or 10 * k))
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        if self.vectors is not None:
+            # Sorted positions keep the reads from the memory-mapped file sequential.
+            candidates = np.sort(candidates)
+            difference = self.vectors[candidates] - query
+            distances = np.einsum("ij,ij->i", difference, difference)
+        else:
+            distances = float(query @ query) - scores[candidates]
+        order = np.argsort(distances, kind="stable")[:k]
+        return candidates[order], distances[order]
+
+    def search(self, query_embedding, k=10, n_candidates=None):
+        """
+        Find the nearest vectors of a query.
+
+        Args:
+            query_embedding: Query vector.
+            k (int): Number of results.
+            n_candidates (int, optional): Candidates rescored with full precision (default: 10 * k).
+
+        Returns:
+            tuple: (ids, distances) of the k nearest vectors, closest first (squared L2).
+        """
+        ids, distances = self.query([query_embedding], n_results=k, n_candidates=n_candidates).values()
+        return ids[0], distances[0]
+
+    def query(self, query_embeddings, n_results=10, n_candidates=None):
+        """Search several queries in one scan, returning Chroma-shaped 'ids' and 'distances' lists."""
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        if not len(self.ids):
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries]}
+        results = self._nearest(queries, n_results, n_candidates)
+        return {
+            "ids": [[self.ids[i] for i in positions] for positions, _ in results],
+            "distances": [distances.tolist() for _, distances in results],
+        }
+
+    def _nearest(self, queries, k, n_candidates=None):
+        scores = self._approximate_scores(queries)
+        return [self._rescore(query, row, k, n_candidates) for query, row in zip(queries, scores)]
+
+
+class StringTable:
+    """
+    Read-only, memory-mapped list of strings: the UTF-8 bytes of all strings back to back in
+    `<name>.npy` and their start offsets (plus the end) in `<name>_offsets.npy`.
+    """
+
+    def __init__(self, path, name):
+        self.offsets = np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode="r")
+        # An empty array cannot be memory-mapped.
+        self.data = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") if self.offsets[-1] else b""
+
+    @staticmethod
+    def write(path, name, strings):
+        """Write `strings` as a string table named `name` in `path`."""
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        _save(path, f"{name}.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        _save(path, f"{name}_offsets.npy", offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+class _StringTableWriter:
+    """
+    Appends strings to a StringTable without holding them in RAM: their bytes are staged in a
+    temporary file and copied into `<name>.npy` by `close`.
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.offsets = array("q", [0])
+        self._data_path = os.path.join(path, f"{name}.bin.tmp")
+        self._file = open(self._data_path, "wb")
+
+    def extend(self, strings):
+        for string in strings:
+            data = string.encode("utf-8")
+            self._file.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self._file.close()
+        data = _open_array(self.path, f"{self.name}.npy", np.uint8, (self.offsets[-1],))
+        with open(self._data_path, "rb") as f:
+            position = 0
+            while chunk := f.read(1 << 24):
+                data[position:position + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+                position += len(chunk)
+        _commit(self.path, f"{self.name}.npy", data)
+        os.remove(self._data_path)
+        _save(self.path, f"{self.name}_offsets.npy", np.frombuffer(self.offsets, dtype=np.int64))
+
+
+class _SortedView:
+    """The strings of a table in sorted order, for binary search."""
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.table[self.order[i]]
+
+
+class MappedCollection(QuantizedVectorIndex):
+    """
+    Standalone, read-only copy of a Chroma collection in memory-mapped files: the vector
+    index (quantized codes, norms and optionally the float32 vectors), the IDs, documents and
+    JSON metadatas as string tables, a sorted order of the IDs for lookups, and selected
+    metadata fields as columns for `where` filters.
+
+    Nothing is read into the heap when it is opened, so worker processes serving the same
+    export share one page-cached copy and start without loading an HNSW index. It answers
+    `query`, `get` and `count` like a Chroma collection, so `Search` can use it in place of
+    the document or keyword collection.
+    """
+    ALL_INCLUDE = ("documents", "metadatas", "distances", "embeddings", "uris")
+
+    def __init__(self, path, embedding_function=None):
+        """
+        Open an export written by `export`.
+
+        Args:
+            path (str): Directory of the export, or the link to it written by `export`.
+            embedding_function (callable, optional): Embeds `query_texts`; must be the model the
+                collection was embedded with.
+        """
+        # Resolved once, so every file is read from the same export even if the link is switched meanwhile.
+        path = os.path.realpath(path)
+        super().__init__(path, mmap=True)
+        self.embedding_function = embedding_function
+        self.name = self.meta.get("name")
+        self.metadata = self.meta.get("collection_metadata")
+        self.documents = StringTable(path, "documents")
+        self.metadatas = StringTable(path, "metadatas")
+        self._id_order = np.load(os.path.join(path, "id_order.npy"), mmap_mode="r")
+        self.columns = {
+            field: np.load(os.path.join(path, f"field_{field}.npy"), mmap_mode="r")
+            for field in self.meta.get("fields", [])
+        }
+
+    @staticmethod
+    def _load_ids(path):
+        return StringTable(path, "ids")
+
+    @staticmethod
+    def _write_ids(path, ids):
+        ids = list(ids)
+        StringTable.write(path, "ids", ids)
+        _save(path, "id_order.npy", np.array(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.int64))
+
+    @classmethod
+    def export(cls, collection, path, mode="int8", store_full=True, page_size=5000, index_version=None,
+               fields=("article_id",)):
+        """
+        Export a Chroma collection (embeddings, IDs, documents and metadatas).
+
+        Args:
+            collection: Chroma collection to export.
+            path (str): Path of the export: a symbolic link switched atomically to a new
+                `<path>.v<timestamp>` directory once it is complete, so readers never open a
+                partial or mixed export. The previous directory is kept for the processes still
+                opening it, older ones are removed.
+            mode (str): "float16" or "int8" codes for the scan.
+            store_full (bool): Also write the float32 vectors, to rescore the candidates and
+                compute exact distances for filtered queries.
+            page_size (int): Number of records read from the collection at a time.
+            index_version (str, optional): Version of the collection (see VectorStore.index_version).
+            fields (tuple): Metadata fields stored as fixed-width integer or string columns for fast
+                `where` filters.
+
+        Returns:
+            MappedCollection: The opened export.
+        """
+        if mode not in cls.MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}. Use one of {cls.MODES}")
+        directory = _new_version(path)
+        # Only the IDs and the filter fields are kept in RAM; the vectors and texts are streamed to disk.
+        documents = _StringTableWriter(directory, "documents")
+        metadatas = _StringTableWriter(directory, "metadatas")
+        values = {field: [] for field in fields}
+
+        def on_page(page):
+            page_metadatas = [metadata or {} for metadata in page['metadatas']]
+            documents.extend(document or "" for document in page['documents'])
+            metadatas.extend(json.dumps(metadata, ensure_ascii=False) for metadata in page_metadatas)
+            for field in fields:
+                values[field].extend(metadata.get(field) for metadata in page_metadatas)
+
+        try:
+            ids, vectors = _stage_embeddings(collection, directory, page_size, on_page, include=('documents', 'metadatas'))
+            documents.close()
+            metadatas.close()
+            columns = []
+            for field in fields:
+                field_values = values.pop(field)
+                # Only fields present in every record, all integers or all strings, can be stored as a column.
+                if field_values and all(isinstance(value, int) and not isinstance(value, bool) for value in field_values):
+                    _save(directory, f"field_{field}.npy", np.array(field_values, dtype=np.int64))
+                    columns.append(field)
+                elif field_values and all(isinstance(value, str) for value in field_values):
+                    _save(directory, f"field_{field}.npy", np.array(field_values, dtype=np.str_))
+                    columns.append(field)
+            cls._write_codes(directory, vectors, mode)
+            shape = vectors.shape
+            del vectors
+            _finish_vectors(directory, store_full)
+            cls._write_meta(directory, ids, shape, mode, index_version,
+                            name=collection.name, collection_metadata=collection.metadata, fields=columns)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        _switch(path, directory)
+        return cls(path)
+
+    def count(self):
+        return len(self)
+
+    def _positions_of(self, ids):
+        """Return the positions of the given IDs (binary search on the sorted order), skipping unknown IDs."""
+        view = _SortedView(self.ids, self._id_order)
+        positions = []
+        for doc_id in ids:
+            i = bisect.bisect_left(view, doc_id)
+            if i < len(view) and view[i] == doc_id:
+                positions.append(int(self._id_order[i]))
+        return np.array(positions, dtype=np.int64)
+
+    def _filter(self, where, positions=None):
+        """
+        Return the positions of the records matching a Chroma `where` filter (equality, $eq,
+        $ne, $in, $nin and $and). Column fields are matched on their memory-mapped column,
+        other fields by decoding the metadatas.
+        """
+        if positions is None:
+            positions = np.arange(len(self), dtype=np.int64)
+        for field, condition in where.items():
+            if field == "$and":
+                for clause in condition:
+                    positions = self._filter(clause, positions)
+                continue
+            operator, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            if operator not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unsupported where operator for a mapped collection: {operator}")
+            values = value if operator in ("$in", "$nin") else [value]
+            if field in self.columns:
+                matches = np.isin(self.columns[field][positions], np.asarray(values))
+            else:
+                matches = np.array([json.loads(self.metadatas[i]).get(field) in values for i in positions], dtype=bool)
+            positions = positions[~matches if operator in ("$ne", "$nin") else matches]
+        return positions
+
+    def _records(self, positions, include, distances=None):
+        records = {"ids": [self.ids[i] for i in positions]}
+        if "documents" in include:
+            records["documents"] = [self.documents[i] for i in positions]
+        if "metadatas" in include:
+            records["metadatas"] = [json.loads(self.metadatas[i]) for i in positions]
+        if "embeddings" in include:
+            if self.vectors is None:
+                raise ValueError("Embeddings are not stored in this export (store_full=False)")
+            records["embeddings"] = [self.vectors[i] for i in positions]
+        if "uris" in include:
+            records["uris"] = [None] * len(positions)
+        if distances is not None and "distances" in include:
+            records["distances"] = distances.tolist()
+        return records
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=('metadatas', 'documents')):
+        """Return records by ID and/or `where` filter, shaped like Chroma's `Collection.get`."""
+        if ids is not None:
+            positions = self._positions_of([ids] if isinstance(ids, str) else ids)
+        else:
+            positions = np.arange(len(self), dtype=np.int64)
+        if where:
+            positions = self._filter(where, positions)
+        positions = positions[offset or 0:]
+        if limit is not None:
+            positions = positions[:limit]
+        records = self._records(positions, include)
+        return {key: records.get(key) for key in ("ids", "embeddings", "documents", "uris", "metadatas")}
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None,
+              include=('metadatas', 'documents', 'distances'), n_candidates=None):
+        """
+        Find the nearest records of each query, shaped like Chroma's `Collection.query`.
+        Queries without a filter scan the quantized codes and rescore the candidates; filtered
+        queries compute exact distances over the matching records only.
+        """
+        if query_embeddings is None:
+            if self.embedding_function is None:
+                raise ValueError("query_texts needs the collection's embedding_function")
+            query_embeddings = self.embedding_function([query_texts] if isinstance(query_texts, str) else query_texts)
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        if where:
+            nearest = [self._exact_nearest(query, self._filter(where), n_results) for query in queries]
+        elif len(self):
+            nearest = self._nearest(queries, n_results, n_candidates)
+        else:
+            nearest = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        results = {key: [] for key in ("ids",) + tuple(key for key in self.ALL_INCLUDE if key in include)}
+        for positions, distances in nearest:
+            records = self._records(positions, include, distances)
+            for key in results:
+                results[key].append(records[key])
+        return {key: results.get(key) for key in ("ids",) + self.ALL_INCLUDE}
+
+    def _exact_nearest(self, query, positions, k):
+        if not len(positions):
+            return positions, np.zeros(0, dtype=np.float32)
+        if self.vectors is not None:
+            vectors = self.vectors[positions]
+        elif self.mode == "int8":
+            vectors = self.minimum + (self.codes[positions].astype(np.float32) + 128) * self.scale
+        else:
+            vectors = self.codes[positions].astype(np.float32)
+        difference = vectors - query
+        distances = np.einsum("ij,ij->i", difference, difference)
+        order = np.argsort(distances, kind="stable")[:k]
+        return positions[order], distances[order]
+
+
+def collection_version(collection):
+    """Return the index version of a Chroma collection, as VectorStore.index_version does."""
+    return f"{collection.id}:{(collection.metadata or {}).get('index_version', 0)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Chroma collections into memory-mapped standalone indexes "
+                                                 "or a compressed vector index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the compressed vector index of the document collection.")
+    build.add_argument("--chroma-path", default="chroma")
+    build.add_argument("--doc-collection", default="wikipedia_docs")
+    build.add_argument("--out", default="Data/doc_vector_index")
+    build.add_argument("--mode", choices=QuantizedVectorIndex.MODES, default="int8")
+    build.add_argument("--no-full", action="store_true", help="Do not store the float32 vectors for rescoring.")
+    export = subparsers.add_parser("export", help="Export collections to <out>/<collection name>.")
+    export.add_argument("collections", nargs="*", default=["wikipedia_docs", "wikipedia_keywords"])
+    export.add_argument("--chroma-path", default="chroma")
+    export.add_argument("--doc-collection", default="wikipedia_docs",
+                        help="Collection whose index version tags the exports (the app compares it with its own).")
+    export.add_argument("--out", default="Data/mapped_index")
+    export.add_argument("--mode", choices=QuantizedVectorIndex.MODES, default="int8")
+    export.add_argument("--no-full", action="store_true", help="Do not store the float32 vectors for rescoring.")
+    args = parser.parse_args()
+
+    import chromadb
+    client = chromadb.PersistentClient(path=args.chroma_path)
+    # The document collection's version tags every export, so they all go stale together.
+    version = collection_version(client.get_collection(args.doc_collection))
+    if args.command == "build":
+        start = time.perf_counter()
+        index = QuantizedVectorIndex.build(client.get_collection(args.doc_collection), args.out, mode=args.mode,
+                                           store_full=not args.no_full, page_size=client.get_max_batch_size(),
+                                           index_version=version)
+        print(f"Built {args.mode} vector index over {len(index)} chunks in {time.perf_counter() - start:.1f}s.")
+        return
+    for name in args.collections:
+        start = time.perf_counter()
+        collection = client.get_collection(name)
+        mapped = MappedCollection.export(collection, os.path.join(args.out, name), mode=args.mode,
+                                         store_full=not args.no_full, page_size=client.get_max_batch_size(),
+                                         index_version=version)
+        print(f"Exported {name}: {len(mapped)} records in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
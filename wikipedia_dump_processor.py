@@ -1,12 +1,15 @@
 import os
-import sys
 import json
 import pandas as pd
-from wikiextractor.WikiExtractor import main as wiki_extractor
-import requests
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List 
+from typing import Iterator, List
+from index_manifest import IndexManifest, content_hash
+import dump_reader
+from downloader import Downloader
+from chunk_store import ChunkStore
 
 class WikipediaDumpProcessor:
     max_chunk_size: int = 256
@@ -14,83 +17,230 @@ class WikipediaDumpProcessor:
     headers_to_split_on: List[str] = None
     excluded_sections: List[str] = None
 
-    def __init__(self, dump_url, dump_file, output_dir, base_dir):
+    def __init__(self, dump_url, dump_file, output_dir, base_dir, index_url=None, index_file=None,
+                 dump_sha1=None, index_sha1=None):
         self.dump_url = dump_url
         self.dump_file = dump_file
         self.output_dir = output_dir
         self.base_dir = base_dir
-
-
+        # Stream index of a multistream dump, used to split it for parallel decompression.
+        self.index_url = index_url
+        self.index_file = index_file
+        # Published checksums (dumpstatus.json or sha1sums.txt), verified after the download.
+        self.dump_sha1 = dump_sha1
+        self.index_sha1 = index_sha1
+        self.siteinfo = None
 
         # Initialize the text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.max_chunk_size, chunk_overlap=self.chunk_overlap
         )
 
-    def download_dump(self):
-        """Downloads the Wikipedia dump file from the specified URL."""
-        if not os.path.exists(self.dump_file):
-            print(f"Downloading dump from {self.dump_url}...")
-            response = requests.get(self.dump_url, stream=True)
-            with open(self.dump_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-            print(f"Dump downloaded to {self.dump_file}.")
-        else:
-            print(f"Dump file already exists at {self.dump_file}.")
-
-    def extract_dump(self):
-        """Extracts the Wikipedia dump into JSON files using WikiExtractor."""
-        print(f"Extracting dump file {self.dump_file}...")
-        sys.argv = [
-            "WikiExtractor.py",  # Dummy script name
-            self.dump_file,       # Path to Wikipedia dump
-            "--json",            # Output in JSON format (optional)
-            "--no-templates",    # Skip template content (optional)
-            "--output", self.output_dir  # Output directory
-        ]
-        wiki_extractor()
-        print(f"Extraction completed. Extracted files are in {self.output_dir}.")
+    def download_dump(self, connections=2):
+        """
+        Downloads the Wikipedia dump file (and its stream index, if any) from the specified URLs,
+        with Range requests over `connections` connections. An interrupted download resumes
+        on the next call, and the files are verified against their SHA-1 checksums, if known.
+        """
+        downloader = Downloader(connections=connections)
+        try:
+            downloader.download(self.dump_url, self.dump_file, sha1=self.dump_sha1)
+            if self.index_url:
+                downloader.download(self.index_url, self.index_file, sha1=self.index_sha1)
+        finally:
+            downloader.close()
+
+    def iter_extracted_files(self):
+        """Yields the paths of the WikiExtractor output files (wiki_NN) under the base directory in a stable order."""
+        for root, dirs, files in os.walk(self.base_dir):
+            dirs.sort()
+            for file in sorted(files):
+                if file.startswith('wiki_'):
+                    yield os.path.join(root, file)
+
+    def iter_file_articles(self, file_path):
+        """Yields the articles of a single extracted JSON file, reading it line by line."""
+        try:
+            with open(file_path, 'r') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        print(f"Error decoding JSON in file: {file_path}")
+                        print(f"Error: {e}")
+        except Exception as e:
+            print(f"Error reading file: {file_path}")
+            print(f"Error: {e}")
+
+    def iter_articles(self):
+        """Yields the extracted articles one at a time, reading the JSON files line by line."""
+        for file_path in self.iter_extracted_files():
+            yield from self.iter_file_articles(file_path)
 
     def parse_extracted_files(self):
         """Parses the extracted JSON files and converts them into a Pandas DataFrame."""
         print(f"Parsing extracted files from {self.base_dir}...")
-        all_json_objects = []
-
-        for root, _, files in os.walk(self.base_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r') as f:
-                        for line in f:
-                            try:
-                                all_json_objects.append(json.loads(line))
-                            except json.JSONDecodeError as e:
-                                print(f"Error decoding JSON in file: {file_path}")
-                                print(f"Error: {e}")
-                except Exception as e:
-                    print(f"Error reading file: {file_path}")
-                    print(f"Error: {e}")
-
-        df = pd.DataFrame(all_json_objects)
+        df = pd.DataFrame(self.iter_articles())
         print("Parsing completed. Returning DataFrame.")
         return df
 
+    def iter_dump_parts(self):
+        """
+        Yields the parts of the dump that are decompressed and parsed independently: ranges of
+        bz2 streams of a multistream dump, or batches of raw pages of a single-stream dump.
+        """
+        if self.siteinfo is None:
+            self.siteinfo = dump_reader.read_siteinfo(self.dump_file)
+        index_file = self.index_file if self.index_file and os.path.exists(self.index_file) else None
+        return dump_reader.iter_dump_parts(self.dump_file, self.siteinfo, index_path=index_file)
+
+    def chunk_file(self, file_path: str, text_column: str = 'text', manifest: IndexManifest = None) -> List[dict]:
+        """Chunks every article of a single extracted file (see chunk_articles)."""
+        return self.chunk_articles(self.iter_file_articles(file_path), text_column, manifest)
+
+    def chunk_dump_part(self, part, text_column: str = 'text', manifest: IndexManifest = None) -> List[dict]:
+        """Decompresses, parses and cleans one part of the dump (see iter_dump_parts) and chunks its articles."""
+        articles = dump_reader.extract_part(self.dump_file, part, self.siteinfo)
+        return self.chunk_articles(articles, text_column, manifest)
+
+    def chunk_articles(self, articles, text_column: str = 'text', manifest: IndexManifest = None) -> List[dict]:
+        """
+        Chunks articles, dropping articles without any chunk.
+
+        With a manifest, each article gets a 'content_hash'. Articles whose hash matches the
+        manifest are returned unchunked, with 'chunked_text' set to None, so they can be
+        marked as seen without being re-chunked or re-embedded.
+        """
+        chunked = []
+        for article in articles:
+            text = article.get(text_column)
+            if manifest is not None:
+                article['content_hash'] = content_hash(f"{article.get('title', '')}\n{text or ''}")
+                if manifest.get_hash(article.get('id')) == article['content_hash']:
+                    article.pop(text_column, None)
+                    article['chunked_text'] = None
+                    chunked.append(article)
+                    continue
+            article['chunked_text'] = self.chunk_text(text) if isinstance(text, str) else []
+            # Keep empty articles when tracking a manifest, so their previous chunks get removed.
+            if article['chunked_text'] or manifest is not None:
+                chunked.append(article)
+        return chunked
+
+    def iter_chunked_articles(self, text_column: str = 'text', workers: int = 1,
+                              manifest_path: str = None, from_dump: bool = False) -> Iterator[dict]:
+        """
+        Yields the extracted articles with a 'chunked_text' field, in file order.
+
+        With from_dump, the articles are read from the dump file itself instead of the
+        WikiExtractor output: each part of the dump is decompressed, parsed, cleaned and
+        chunked in one step, without the intermediate JSON files (see iter_dump_parts).
+
+        With workers > 1 the extracted files (or dump parts) are sharded across a process
+        pool. They are submitted in order and at most 2 * workers of them are in flight, so
+        article order is deterministic and memory stays bounded. With a manifest path,
+        unchanged articles are skipped before chunking (see chunk_articles).
+        """
+        if from_dump:
+            parts, chunk_part = self.iter_dump_parts(), 'chunk_dump_part'
+        else:
+            parts, chunk_part = self.iter_extracted_files(), 'chunk_file'
+        if workers <= 1:
+            manifest = IndexManifest(manifest_path) if manifest_path else None
+            try:
+                for part in parts:
+                    yield from getattr(self, chunk_part)(part, text_column, manifest)
+            finally:
+                if manifest is not None:
+                    manifest.close()
+            return
+
+        if manifest_path and not os.path.exists(manifest_path):
+            # Create the manifest, so the workers can open it read-only.
+            IndexManifest(manifest_path).close()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                                 initargs=(self, manifest_path)) as pool:
+            pending = deque()
+            for part in parts:
+                pending.append(pool.submit(_chunk_part_worker, chunk_part, part, text_column))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def iter_chunked_windows(self, window_size: int = 1000, text_column: str = 'text',
+                             workers: int = 1, manifest_path: str = None,
+                             from_dump: bool = False) -> Iterator[List[dict]]:
+        """Streams the extracted articles in windows of `window_size` chunked articles, so memory stays bounded."""
+        window = []
+        for article in self.iter_chunked_articles(text_column, workers, manifest_path, from_dump):
+            window.append(article)
+            if len(window) >= window_size:
+                yield window
+                window = []
+        if window:
+            yield window
+
     def chunk_text(self, text: str) -> List[str]:
         """Splits text into smaller chunks based on the specified chunk size."""
         text = re.sub(r'\s+', ' ', text).strip()
         text = re.sub(r'\[[\d+]\]', '', text)
         return self.text_splitter.split_text(text)
 
-    def chunk_dataframe_text(self, df: pd.DataFrame, text_column: str) -> pd.DataFrame:
-        """Chunks the text in a specified column of a DataFrame and creates a new column with chunked text."""
+    def write_chunk_store(self, store_path: str, text_column: str = 'text', workers: int = 1,
+                          from_dump: bool = False, keep_text: bool = False) -> int:
+        """
+        Chunks the articles (see iter_chunked_articles) into a ChunkStore, one window of
+        articles per row group, without holding the corpus in memory. The article text is
+        dropped unless `keep_text`, the chunks hold it. Returns the number of articles.
+        """
+        def windows():
+            for window in self.iter_chunked_windows(window_size=1000, text_column=text_column,
+                                                    workers=workers, from_dump=from_dump):
+                if not keep_text:
+                    for article in window:
+                        article.pop(text_column, None)
+                yield window
+        n_articles = ChunkStore(store_path).write(windows())
+        print(f"Wrote {n_articles} chunked articles to {store_path}.")
+        return n_articles
+
+    def chunk_dataframe_text(self, df: pd.DataFrame, text_column: str, workers: int = 1,
+                             store_path: str = None) -> pd.DataFrame:
+        """
+        Chunks the text in a specified column of a DataFrame and creates a new column with chunked text.
+        Articles without any chunk are dropped. With `store_path` (e.g. 'Data/chunk_store'),
+        the result is also saved to a ChunkStore, with the chunk lists as list columns.
+        """
         print(f"Chunking text in DataFrame column '{text_column}'...")
-        df['chunked_text'] = df[text_column].apply(lambda x: self.chunk_text(x) if isinstance(x, str) else [])
-        df[df['chunked_text'].map(len) > 0]
-        df.to_csv('Data/Wikipedia.csv')
+        if workers > 1:
+            texts = [x if isinstance(x, str) else '' for x in df[text_column]]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker, initargs=(self, None)) as pool:
+                df['chunked_text'] = list(pool.map(_chunk_text_worker, texts, chunksize=max(1, len(texts) // (workers * 8))))
+        else:
+            df['chunked_text'] = df[text_column].apply(lambda x: self.chunk_text(x) if isinstance(x, str) else [])
+        df = df[df['chunked_text'].map(len) > 0]
+        if store_path:
+            ChunkStore(store_path).write(df)
         print("Chunking completed. Returning updated DataFrame.")
-        return df.head(1)
+        return df
+
+
+# Process pool workers: each worker receives a copy of the processor once, at start-up,
+# and opens the index manifest read-only if one is used: the parent process writes it.
+_worker_processor = None
+_worker_manifest = None
+
+
+def _init_chunk_worker(processor, manifest_path):
+    global _worker_processor, _worker_manifest
+    _worker_processor = processor
+    _worker_manifest = IndexManifest(manifest_path, read_only=True) if manifest_path else None
+
 
+def _chunk_part_worker(chunk_part, part, text_column):
+    return getattr(_worker_processor, chunk_part)(part, text_column, _worker_manifest)
 
 
+def _chunk_text_worker(text):
+    return _worker_processor.chunk_text(text) if text else []